@@ -0,0 +1,81 @@
+from collections import Counter, defaultdict
+
+class AgregadosTablero:
+    """Contadores por columna (servicio o habitación) mantenidos de forma incremental.
+
+    Cada alta, movimiento o atención actualiza los contadores en O(1), de modo
+    que la leyenda, los encabezados de columna y el resumen los leen sin
+    recorrer el tablero. Los pacientes se cuentan por ``estado`` y el personal
+    por ``rol``. ``version`` cambia cada vez que cambia el contenido de una
+    columna y sirve como clave de caché para su renderizado.
+    """
+
+    def __init__(self):
+        self.por_estado = defaultdict(Counter)
+        self.por_rol = defaultdict(Counter)
+        self.atenciones = Counter()
+        self.total_atenciones = 0
+        self.total_estado = Counter()
+        self.total_rol = Counter()
+        self.pacientes = Counter()
+        self.enfermeras = Counter()
+        self.version = Counter()
+
+    @classmethod
+    def desde_columnas(cls, columnas):
+        """Construye los contadores a partir de {columna: [personas]}"""
+        agregados = cls()
+        for columna, personas in columnas.items():
+            agregados.pacientes[columna] += 0
+            agregados.enfermeras[columna] += 0
+            for persona in personas:
+                agregados.agregar(columna, persona)
+        return agregados
+
+    def _ajustar(self, columna, persona, delta):
+        self.version[columna] += 1
+        if persona.get("tipo") == "paciente":
+            estado = persona.get("estado")
+            self.por_estado[columna][estado] += delta
+            self.total_estado[estado] += delta
+            self.pacientes[columna] += delta
+        else:
+            rol = persona.get("rol")
+            self.por_rol[columna][rol] += delta
+            self.total_rol[rol] += delta
+            self.enfermeras[columna] += delta
+
+    def agregar(self, columna, persona):
+        """Registra a una persona nueva en la columna"""
+        self._ajustar(columna, persona, 1)
+
+    def quitar(self, columna, persona):
+        """Retira a una persona de la columna"""
+        self._ajustar(columna, persona, -1)
+
+    def mover(self, persona, origen, destino):
+        """Traslada a una persona entre columnas"""
+        self._ajustar(origen, persona, -1)
+        self._ajustar(destino, persona, 1)
+
+    def registrar_atencion(self, columna):
+        """Cuenta una atención realizada en la columna"""
+        self.atenciones[columna] += 1
+        self.total_atenciones += 1
+
+    @property
+    def total_pacientes(self):
+        """Pacientes en todo el tablero"""
+        return sum(self.total_estado.values())
+
+    @property
+    def total_enfermeras(self):
+        """Personal de enfermería en todo el tablero"""
+        return sum(self.total_rol.values())
+
+    def ratio_enfermera_paciente(self, columna):
+        """Enfermeras por paciente en la columna; None si no hay pacientes"""
+        pacientes = self.pacientes[columna]
+        if not pacientes:
+            return None
+        return self.enfermeras[columna] / pacientes
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import tempfile
+
+TAMANO_BLOQUE = 1024 * 1024
+
+def copiar_bloques(entrada, escribir):
+    """Copia el resto de ``entrada`` en bloques de TAMANO_BLOQUE"""
+    while True:
+        bloque = entrada.read(TAMANO_BLOQUE)
+        if not bloque:
+            return
+        escribir(bloque)
+
+def guardar_por_contenido(directorio, archivo, ruta, copiar=copiar_bloques):
+    """Guarda un archivo subido bajo el SHA-256 de lo que se escribe; devuelve (hash, tamaño, ruta).
+
+    ``copiar(entrada, escribir)`` pasa el contenido por bloques a un temporal
+    en ``directorio`` mientras se calcula el hash; después el temporal se mueve
+    a ``ruta(hash)``. Si ese contenido ya estaba guardado se descarta la copia.
+    """
+    resumen = hashlib.sha256()
+    tamano = 0
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix=".parte")
+    try:
+        with os.fdopen(descriptor, "wb") as salida:
+            def escribir(bloque):
+                nonlocal tamano
+                salida.write(bloque)
+                resumen.update(bloque)
+                tamano += len(bloque)
+
+            archivo.seek(0)
+            copiar(archivo, escribir)
+
+        hash_contenido = resumen.hexdigest()
+        destino = ruta(hash_contenido)
+        if os.path.exists(destino):
+            os.remove(temporal)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(temporal, destino)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return hash_contenido, tamano, destino
@@ -0,0 +1,281 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import date, datetime, time
+
+import pandas as pd
+import streamlit as st
+
+import duplicados
+import indicadores
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_REPORTES = os.environ.get(
+    "REPORTES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "reportes")
+)
+
+def _a_json(valor):
+    """Serializa valores del borrador conservando fechas, horas y binarios"""
+    def convertir(v):
+        if isinstance(v, datetime):
+            return {"__datetime__": v.isoformat()}
+        if isinstance(v, date):
+            return {"__date__": v.isoformat()}
+        if isinstance(v, time):
+            return {"__time__": v.isoformat()}
+        if isinstance(v, bytes):
+            return {"__bytes__": base64.b64encode(v).decode()}
+        raise TypeError(f"Tipo no serializable: {type(v).__name__}")
+    return json.dumps(valor, ensure_ascii=False, default=convertir)
+
+def _desde_json(texto):
+    def convertir(d):
+        if "__datetime__" in d:
+            return datetime.fromisoformat(d["__datetime__"])
+        if "__date__" in d:
+            return date.fromisoformat(d["__date__"])
+        if "__time__" in d:
+            return time.fromisoformat(d["__time__"])
+        if "__bytes__" in d:
+            return base64.b64decode(d["__bytes__"])
+        return d
+    return json.loads(texto, object_hook=convertir)
+
+def enviar_a_backend(codigo, reporte):
+    """Sustituto local del sistema institucional: anexa el reporte a un archivo JSONL"""
+    with open(os.path.join(DIRECTORIO_REPORTES, "backend.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"codigo": codigo, **reporte}, ensure_ascii=False, default=str) + "\n")
+
+class AlmacenReportes:
+    """Almacén local de borradores y cola de envío sobre SQLite.
+
+    Los borradores se guardan campo a campo, de modo que cada autoguardado
+    escribe solo lo que cambió. Los reportes enviados quedan en una cola que
+    un hilo en segundo plano vacía hacia el backend con reintentos; el
+    formulario nunca espera a la red.
+    """
+
+    REINTENTO_SEGUNDOS = 30
+    # Intentos de envío de un reporte antes de apartarlo como 'error'
+    MAX_INTENTOS = 10
+
+    def __init__(self, ruta, enviar=enviar_a_backend):
+        self.ruta = ruta
+        self.enviar = enviar
+        self.despertar = threading.Event()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS borradores (
+                    borrador TEXT NOT NULL,
+                    campo TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    actualizado TEXT NOT NULL,
+                    PRIMARY KEY (borrador, campo)
+                )""")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS cola_envio (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    codigo TEXT NOT NULL UNIQUE,
+                    reporte TEXT NOT NULL,
+                    creado TEXT NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'pendiente',
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_error TEXT,
+                    enviado TEXT
+                )""")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_cola_estado ON cola_envio (estado, id)")
+            conexion.execute("CREATE TABLE IF NOT EXISTS secuencias (nombre TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+            conexion.execute("INSERT OR IGNORE INTO secuencias (nombre, valor) VALUES ('reportes', 0)")
+            indicadores.crear_tablas(conexion)
+            duplicados.crear_tablas(conexion)
+            version = conexion.execute("SELECT valor FROM secuencias WHERE nombre = 'indice_duplicados'").fetchone()
+            if version is None or version[0] != duplicados.VERSION_INDICE:
+                duplicados.vaciar(conexion)
+                conexion.execute(
+                    "INSERT OR REPLACE INTO secuencias (nombre, valor) VALUES ('indice_duplicados', ?)",
+                    (duplicados.VERSION_INDICE,)
+                )
+            # Reportes encolados antes de existir el índice de duplicados (o de su versión actual)
+            for codigo, reporte in conexion.execute(
+                "SELECT codigo, reporte FROM cola_envio WHERE codigo NOT IN (SELECT codigo FROM firmas)"
+            ).fetchall():
+                duplicados.indexar(conexion, codigo, json.loads(reporte))
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=5)
+
+    def guardar_campos(self, borrador, campos):
+        """Inserta o actualiza solo los campos indicados del borrador"""
+        ahora = datetime.now().isoformat()
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.executemany(
+                "INSERT INTO borradores (borrador, campo, valor, actualizado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (borrador, campo) DO UPDATE SET valor = excluded.valor, actualizado = excluded.actualizado",
+                [(borrador, campo, _a_json(valor), ahora) for campo, valor in campos.items()]
+            )
+
+    def cargar_campos(self, borrador):
+        """Campos guardados de un borrador ({} si no existe)"""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute("SELECT campo, valor FROM borradores WHERE borrador = ?", (borrador,)).fetchall()
+        return {campo: _desde_json(valor) for campo, valor in filas}
+
+    def descartar_borrador(self, borrador):
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute("DELETE FROM borradores WHERE borrador = ?", (borrador,))
+
+    def encolar(self, reporte, borrador=None):
+        """Registra el reporte para su envío y devuelve su código.
+
+        En una sola transacción se asigna el código con la secuencia (nunca se
+        repite, aunque dos reportes lleguen en el mismo segundo), se suman sus
+        indicadores, se indexa para detectar duplicados y se descarta su borrador.
+        """
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute("UPDATE secuencias SET valor = valor + 1 WHERE nombre = 'reportes'")
+            numero = conexion.execute("SELECT valor FROM secuencias WHERE nombre = 'reportes'").fetchone()[0]
+            # Siete dígitos: no puede coincidir con los códigos antiguos con hora (HHMMSS)
+            codigo = f"CARD-{datetime.now().strftime('%Y%m%d')}-{numero:07d}"
+            conexion.execute(
+                "INSERT INTO cola_envio (codigo, reporte, creado) VALUES (?, ?, ?)",
+                (codigo, json.dumps(reporte, ensure_ascii=False, default=str), datetime.now().isoformat())
+            )
+            indicadores.sumar(conexion, reporte)
+            duplicados.indexar(conexion, codigo, reporte)
+            if borrador is not None:
+                conexion.execute("DELETE FROM borradores WHERE borrador = ?", (borrador,))
+        self.despertar.set()
+        return codigo
+
+    def posibles_duplicados(self, reporte):
+        """Reportes registrados que probablemente describen el mismo evento: [(código, similitud)]"""
+        with closing(self._conectar()) as conexion:
+            return duplicados.candidatos(conexion, reporte)
+
+    def agrupar_duplicados(self, desde):
+        """Grupos de reportes desde la fecha indicada que parecen el mismo evento"""
+        with closing(self._conectar()) as conexion:
+            return duplicados.agrupar(conexion, desde)
+
+    def pendientes(self):
+        """Número de reportes en cola todavía sin enviar"""
+        with closing(self._conectar()) as conexion:
+            return conexion.execute("SELECT COUNT(*) FROM cola_envio WHERE estado = 'pendiente'").fetchone()[0]
+
+    def con_error(self):
+        """Número de reportes que agotaron sus intentos de envío"""
+        with closing(self._conectar()) as conexion:
+            return conexion.execute("SELECT COUNT(*) FROM cola_envio WHERE estado = 'error'").fetchone()[0]
+
+    def vaciar_cola(self):
+        """Envía los reportes pendientes en orden; devuelve True si se enviaron todos.
+
+        Un reporte que falla no detiene a los siguientes. Al llegar a
+        MAX_INTENTOS queda en estado 'error' y deja de reintentarse.
+        """
+        enviados = True
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT id, codigo, reporte FROM cola_envio WHERE estado = 'pendiente' ORDER BY id"
+            ).fetchall()
+            for id_fila, codigo, reporte in filas:
+                try:
+                    self.enviar(codigo, json.loads(reporte))
+                except Exception as e:
+                    logger.warning(f"Envío de {codigo} fallido: {str(e)}")
+                    with conexion:
+                        conexion.execute(
+                            "UPDATE cola_envio SET intentos = intentos + 1, ultimo_error = ?, "
+                            "estado = CASE WHEN intentos + 1 >= ? THEN 'error' ELSE estado END WHERE id = ?",
+                            (str(e), self.MAX_INTENTOS, id_fila)
+                        )
+                    enviados = False
+                    continue
+                with conexion:
+                    conexion.execute(
+                        "UPDATE cola_envio SET estado = 'enviado', intentos = intentos + 1, enviado = ? WHERE id = ?",
+                        (datetime.now().isoformat(), id_fila)
+                    )
+        return enviados
+
+    def indicadores(self, hoy=None):
+        """Indicadores de la ventana móvil y totales históricos, leídos de los contadores"""
+        with closing(self._conectar()) as conexion:
+            resumen, serie = indicadores.ventana(conexion, hoy)
+            return resumen, serie, indicadores.totales(conexion)
+
+    def extraer(self, campo, desde):
+        """Un campo de los reportes con evento desde la fecha indicada, sin leer el resto"""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT json_extract(reporte, ?) FROM cola_envio "
+                "WHERE json_extract(reporte, '$.fecha_evento') >= ?",
+                (f"$.{campo}", desde.isoformat())
+            ).fetchall()
+        return [json.loads(valor) for valor, in filas if valor]
+
+    def reportes(self, mes=None):
+        """(código, creado, reporte) de todos los reportes o de los de un mes AAAA-MM del evento"""
+        consulta = "SELECT codigo, creado, reporte FROM cola_envio"
+        parametros = ()
+        if mes:
+            consulta += " WHERE substr(json_extract(reporte, '$.fecha_evento'), 1, 7) = ?"
+            parametros = (mes,)
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(consulta + " ORDER BY id", parametros).fetchall()
+        return [(codigo, creado, json.loads(reporte)) for codigo, creado, reporte in filas]
+
+    def meses(self):
+        """Meses (AAAA-MM) con reportes, del más reciente al más antiguo"""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT DISTINCT substr(json_extract(reporte, '$.fecha_evento'), 1, 7) AS mes FROM cola_envio ORDER BY mes DESC"
+            ).fetchall()
+        return [mes for mes, in filas if mes]
+
+    def recalcular_indicadores(self, historico=None):
+        """Rehace los contadores desde la cola local y el histórico exportado.
+
+        ``historico`` trae las columnas ``codigo`` e indicadores.COLUMNAS de la
+        tabla de hechos; de ella solo se suman los reportes que ya no están en
+        la cola, así que un extracto parcial o atrasado no quita casos ni los
+        cuenta dos veces. Devuelve el número de reportes contados.
+        """
+        columnas = ", ".join(f"json_extract(reporte, '$.{c}')" for c in indicadores.COLUMNAS)
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(f"SELECT codigo, {columnas} FROM cola_envio").fetchall()
+        df = pd.DataFrame(filas, columns=["codigo", *indicadores.COLUMNAS])
+        if historico is not None and not historico.empty:
+            df = pd.concat([df, historico[~historico["codigo"].isin(df["codigo"])]], ignore_index=True)
+        with closing(self._conectar()) as conexion, conexion:
+            return indicadores.recalcular(conexion, df)
+
+    def iniciar_envio(self):
+        """Lanza el hilo que vacía la cola al encolar y periódicamente tras un fallo"""
+        def bucle():
+            while True:
+                self.despertar.wait(self.REINTENTO_SEGUNDOS)
+                self.despertar.clear()
+                try:
+                    self.vaciar_cola()
+                except Exception as e:
+                    logger.error(f"Error en el envío de reportes: {str(e)}")
+
+        threading.Thread(target=bucle, name="envio-reportes", daemon=True).start()
+        # Reportes que quedaron en cola antes de un reinicio
+        self.despertar.set()
+
+@st.cache_resource(show_spinner=False)
+def abrir_almacen():
+    """Almacén compartido por todas las sesiones, con su hilo de envío"""
+    almacen = AlmacenReportes(os.path.join(DIRECTORIO_REPORTES, "reportes.db"))
+    almacen.iniciar_envio()
+    return almacen
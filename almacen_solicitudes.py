@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import streamlit as st
+
+import matriculas
+
+DIRECTORIO_SOLICITUDES = os.environ.get(
+    "SOLICITUDES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "solicitudes")
+)
+
+ESTADOS = {
+    "recibida": "Recibida",
+    "en_revision": "En revisión",
+    "documentos_pendientes": "Documentos pendientes",
+    "aceptada": "Aceptada",
+    "rechazada": "Rechazada"
+}
+
+# Estado -> estados a los que el personal puede moverla
+TRANSICIONES = {
+    "recibida": ("en_revision",),
+    "en_revision": ("documentos_pendientes", "aceptada", "rechazada"),
+    "documentos_pendientes": ("en_revision",),
+    "aceptada": (),
+    "rechazada": ()
+}
+
+TAMANO_PAGINA = 25
+
+COLUMNAS_COLA = ("id", "matricula", "nombre", "programa", "email", "fecha", "estado")
+
+def normalizar_email(email):
+    return email.strip().lower()
+
+class AlmacenSolicitudes:
+    """Solicitudes de inscripción y su revisión por el personal, sobre SQLite.
+
+    La matrícula es única y el correo, el programa y la fecha están indexados,
+    así que buscar una solicitud es una consulta por índice aunque haya decenas
+    de miles en el ciclo. La cola de revisión se pagina por cursor (fecha, id)
+    en lugar de OFFSET, de modo que la página 200 cuesta lo mismo que la primera.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS solicitudes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    matricula TEXT NOT NULL UNIQUE,
+                    programa TEXT NOT NULL,
+                    nombre TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    fecha TEXT NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'recibida',
+                    datos TEXT NOT NULL,
+                    actualizado TEXT NOT NULL
+                )""")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_solicitudes_email ON solicitudes (email)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_solicitudes_programa ON solicitudes (programa, fecha, id)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_solicitudes_fecha ON solicitudes (fecha, id)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_solicitudes_estado ON solicitudes (estado, fecha, id)")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS historial_estados (
+                    solicitud INTEGER NOT NULL REFERENCES solicitudes (id),
+                    anterior TEXT,
+                    nuevo TEXT NOT NULL,
+                    revisor TEXT NOT NULL,
+                    nota TEXT NOT NULL DEFAULT '',
+                    fecha TEXT NOT NULL
+                )""")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_historial_solicitud ON historial_estados (solicitud, fecha)")
+            matriculas.crear_tablas(conexion)
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta, timeout=5)
+        conexion.row_factory = sqlite3.Row
+        return conexion
+
+    def registrar(self, inscripcion):
+        """Guarda la solicitud enviada y devuelve su matrícula.
+
+        La matrícula se asigna aquí, en la misma transacción que el alta, así
+        que ver el formulario no consume números. Reenviar con la matrícula ya
+        asignada actualiza los datos mientras la solicitud no esté resuelta;
+        su estado no cambia. Una matrícula que no está en la tabla no se
+        conserva (viene de una sesión vieja o del cliente): se asigna otra de
+        la secuencia. Una con formato o dígito verificador inválido se rechaza.
+        """
+        ahora = datetime.now().isoformat(timespec="seconds")
+        fecha = inscripcion.get('fecha_inscripcion') or ahora
+        solicitada = (inscripcion.get('matricula') or "").strip().upper()
+        if solicitada and not matriculas.es_valida(solicitada):
+            raise ValueError(f"La matrícula {solicitada} no es válida")
+        with closing(self._conectar()) as conexion, conexion:
+            existente = None
+            if solicitada:
+                existente = conexion.execute(
+                    "SELECT id, estado FROM solicitudes WHERE matricula = ?", (solicitada,)
+                ).fetchone()
+            if existente is not None and not TRANSICIONES[existente['estado']]:
+                raise ValueError(f"La solicitud {solicitada} ya fue {ESTADOS[existente['estado']].lower()}")
+
+            matricula = solicitada if existente is not None else matriculas.asignar(conexion, int(fecha[:4]))
+            campos = (
+                inscripcion['programa'],
+                inscripcion['nombre_completo'],
+                normalizar_email(inscripcion['email']),
+                json.dumps({**inscripcion, 'matricula': matricula}, ensure_ascii=False, default=str),
+                ahora
+            )
+            if existente is not None:
+                conexion.execute(
+                    "UPDATE solicitudes SET programa = ?, nombre = ?, email = ?, datos = ?, actualizado = ? WHERE id = ?",
+                    (*campos, existente['id'])
+                )
+                return matricula
+
+            cursor = conexion.execute(
+                "INSERT INTO solicitudes (programa, nombre, email, datos, actualizado, matricula, fecha) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*campos, matricula, fecha)
+            )
+            conexion.execute(
+                "INSERT INTO historial_estados (solicitud, anterior, nuevo, revisor, fecha) VALUES (?, NULL, 'recibida', 'solicitante', ?)",
+                (cursor.lastrowid, ahora)
+            )
+            return matricula
+
+    def _solicitud(self, fila):
+        return None if fila is None else {**dict(fila), "datos": json.loads(fila['datos'])}
+
+    def por_matricula(self, matricula):
+        with closing(self._conectar()) as conexion:
+            return self._solicitud(conexion.execute(
+                "SELECT * FROM solicitudes WHERE matricula = ?", (matricula.strip(),)
+            ).fetchone())
+
+    def por_email(self, email):
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT * FROM solicitudes WHERE email = ? ORDER BY fecha DESC", (normalizar_email(email),)
+            ).fetchall()
+        return [self._solicitud(f) for f in filas]
+
+    def cola(self, estado=None, programa=None, despues=None, limite=TAMANO_PAGINA):
+        """Una página de la cola de revisión, de la más antigua a la más reciente.
+
+        ``despues`` es el cursor (fecha, id) de la última fila de la página
+        anterior. Devuelve (filas, cursor de la página siguiente o None).
+        """
+        condiciones, parametros = [], []
+        if estado:
+            condiciones.append("estado = ?")
+            parametros.append(estado)
+        if programa:
+            condiciones.append("programa = ?")
+            parametros.append(programa)
+        if despues:
+            condiciones.append("(fecha, id) > (?, ?)")
+            parametros.extend(despues)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                f"SELECT {', '.join(COLUMNAS_COLA)} FROM solicitudes {donde} ORDER BY fecha, id LIMIT ?",
+                (*parametros, limite + 1)
+            ).fetchall()
+        siguiente = (filas[limite - 1]['fecha'], filas[limite - 1]['id']) if len(filas) > limite else None
+        return [dict(f) for f in filas[:limite]], siguiente
+
+    def conteo_estados(self):
+        """Solicitudes por estado (incluye los estados sin solicitudes)"""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute("SELECT estado, COUNT(*) FROM solicitudes GROUP BY estado").fetchall()
+        return {**{estado: 0 for estado in ESTADOS}, **{estado: n for estado, n in filas}}
+
+    def programas(self):
+        with closing(self._conectar()) as conexion:
+            return [p for p, in conexion.execute("SELECT DISTINCT programa FROM solicitudes ORDER BY programa")]
+
+    def historial(self, solicitud):
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT anterior, nuevo, revisor, nota, fecha FROM historial_estados WHERE solicitud = ? ORDER BY fecha, rowid",
+                (solicitud,)
+            ).fetchall()
+        return [dict(f) for f in filas]
+
+    def cambiar_estado(self, solicitud, anterior, nuevo, revisor, nota=""):
+        """Mueve la solicitud de ``anterior`` a ``nuevo`` y lo anota en el historial.
+
+        Falla si la transición no está permitida o si otra persona ya cambió
+        el estado desde que se mostró la cola.
+        """
+        if nuevo not in TRANSICIONES.get(anterior, ()):
+            raise ValueError(f"No se puede pasar de {ESTADOS.get(anterior, anterior)} a {ESTADOS.get(nuevo, nuevo)}")
+        ahora = datetime.now().isoformat(timespec="seconds")
+        with closing(self._conectar()) as conexion, conexion:
+            cambiadas = conexion.execute(
+                "UPDATE solicitudes SET estado = ?, actualizado = ? WHERE id = ? AND estado = ?",
+                (nuevo, ahora, solicitud, anterior)
+            ).rowcount
+            if not cambiadas:
+                raise ValueError("La solicitud cambió de estado mientras se revisaba; actualiza la cola")
+            conexion.execute(
+                "INSERT INTO historial_estados (solicitud, anterior, nuevo, revisor, nota, fecha) VALUES (?, ?, ?, ?, ?, ?)",
+                (solicitud, anterior, nuevo, revisor, nota, ahora)
+            )
+
+@st.cache_resource(show_spinner=False)
+def abrir_almacen_solicitudes():
+    """Almacén de solicitudes compartido por todas las sesiones"""
+    return AlmacenSolicitudes(os.path.join(DIRECTORIO_SOLICITUDES, "solicitudes.db"))
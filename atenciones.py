@@ -0,0 +1,115 @@
+from collections import Counter
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+class RegistroAtenciones:
+    """Almacén columnar de atenciones, solo de anexado.
+
+    Cada atención se guarda como una fila repartida en listas por columna, con
+    marca de tiempo completa. Al anexar se actualizan los acumulados por
+    habitación/hora y por diagnóstico y la última atención de cada paciente,
+    de modo que el widget de pendientes cuesta O(pacientes) y no O(eventos).
+    """
+
+    COLUMNAS = ("marca", "id_paciente", "paciente", "habitacion", "diagnostico", "tipo", "realizado_por")
+
+    def __init__(self):
+        self.columnas = {c: [] for c in self.COLUMNAS}
+        self.por_habitacion_hora = Counter()
+        self.por_diagnostico = Counter()
+        self.ultima_atencion = {}
+        # Atenciones que solo constan en los acumulados (ver desde_acumulados)
+        self.previas = 0
+        self._df = None
+
+    @classmethod
+    def desde_acumulados(cls, ultima_atencion, atenciones_hora, diagnosticos):
+        """Registro que parte de los acumulados de la proyección del diario.
+
+        Las atenciones anteriores cuentan en los acumulados y en ``len`` pero
+        no tienen filas; las columnas solo reciben las que se anexen después.
+        """
+        registro = cls()
+        registro.ultima_atencion = {i: datetime.fromisoformat(m) for i, m in ultima_atencion.items()}
+        registro.por_habitacion_hora = Counter({
+            (habitacion, datetime.fromisoformat(hora)): n
+            for habitacion, horas in atenciones_hora.items()
+            for hora, n in horas.items()
+        })
+        registro.por_diagnostico = Counter(diagnosticos)
+        registro.previas = sum(registro.por_diagnostico.values())
+        return registro
+
+    def __len__(self):
+        return self.previas + len(self.columnas["marca"])
+
+    def anexar(self, id_paciente, paciente, habitacion, diagnostico, tipo, realizado_por, marca=None):
+        """Registra una atención y actualiza los acumulados"""
+        marca = marca or datetime.now()
+        fila = (marca, id_paciente, paciente, habitacion, diagnostico, tipo, realizado_por)
+        for columna, valor in zip(self.COLUMNAS, fila):
+            self.columnas[columna].append(valor)
+
+        self.por_habitacion_hora[(habitacion, marca.replace(minute=0, second=0, microsecond=0))] += 1
+        self.por_diagnostico[diagnostico] += 1
+        self.ultima_atencion[id_paciente] = marca
+        self._df = None
+
+    def a_dataframe(self):
+        """Vista pandas de los eventos; se reconstruye solo si hubo anexados"""
+        if self._df is None:
+            df = pd.DataFrame(self.columnas)
+            df["marca"] = pd.to_datetime(df["marca"])
+            self._df = df
+        return self._df
+
+    def rollup_habitacion_hora(self):
+        """Atenciones por habitación y hora a partir de los acumulados"""
+        filas = [
+            {"habitacion": habitacion, "hora": hora, "atenciones": n}
+            for (habitacion, hora), n in self.por_habitacion_hora.items()
+        ]
+        return pd.DataFrame(filas, columns=["habitacion", "hora", "atenciones"])
+
+    def recalcular_rollups(self):
+        """Recalcula los acumulados de forma vectorizada desde las columnas"""
+        df = self.a_dataframe()
+        horas = df["marca"].dt.floor("h")
+        por_hora = df.groupby([df["habitacion"], horas]).size()
+        self.por_habitacion_hora = Counter({(h, t.to_pydatetime()): int(n) for (h, t), n in por_hora.items()})
+        self.por_diagnostico = Counter(df["diagnostico"].value_counts().to_dict())
+        ultimas = df.groupby("id_paciente")["marca"].max()
+        self.ultima_atencion = {i: t.to_pydatetime() for i, t in ultimas.items()}
+
+    def minutos_desde_ultima(self, ids_pacientes, ahora=None):
+        """Minutos desde la última atención de cada paciente (NaN si nunca)"""
+        ahora = np.datetime64(ahora or datetime.now(), "s")
+        ultimas = np.array(
+            [self.ultima_atencion.get(i, np.datetime64("NaT")) for i in ids_pacientes],
+            dtype="datetime64[s]"
+        )
+        return (ahora - ultimas) / np.timedelta64(1, "m")
+
+    def pendientes(self, pacientes, umbral_minutos, ahora=None):
+        """Pacientes sin atención o cuya última atención supera el umbral.
+
+        ``pacientes`` es una lista de (id, nombre, habitacion); devuelve un
+        DataFrame ordenado de más a menos atrasado.
+        """
+        columnas = ["paciente", "habitacion", "minutos"]
+        if not pacientes:
+            return pd.DataFrame(columns=columnas)
+        ids, nombres, habitaciones = zip(*pacientes)
+        minutos = self.minutos_desde_ultima(ids, ahora)
+        atrasado = np.isnan(minutos) | (minutos >= umbral_minutos)
+        df = pd.DataFrame({"paciente": nombres, "habitacion": habitaciones, "minutos": minutos})[atrasado]
+        return df.sort_values("minutos", ascending=False, na_position="first")
+
+    def a_parquet(self):
+        """Exporta los eventos a Parquet para el análisis posterior al turno"""
+        buffer = BytesIO()
+        self.a_dataframe().to_parquet(buffer, index=False)
+        return buffer.getvalue()
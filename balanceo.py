@@ -0,0 +1,102 @@
+import numpy as np
+
+# Carga asistencial que aporta cada paciente según su estado
+PESOS_ESTADO = {
+    "crítico": 3.0,
+    "observación": 2.0,
+    "mejorando": 1.5,
+    "estable": 1.0,
+    "alta pendiente": 0.5
+}
+
+# Carga que puede absorber cada enfermera según su rol
+CAPACIDAD_ROL = {
+    "Especialista": 4.0,
+    "General A": 3.0,
+    "General B": 3.0,
+    "General C": 2.0,
+    "Camillero": 0.0
+}
+
+# Solo se sugieren traslados que reducen la suma de cuadrados del déficit en al
+# menos lo que supone cubrir a un paciente crítico sin atención (3²), y como
+# mucho MAX_MOVIMIENTOS por propuesta: más cambios a la vez no son aplicables en un turno
+GANANCIA_MINIMA = 9.0
+MAX_MOVIMIENTOS = 10
+
+def calcular_cargas(habitaciones, pesos_estado=PESOS_ESTADO, capacidad_rol=CAPACIDAD_ROL):
+    """Devuelve (nombres, demanda, capacidad) por habitación como arreglos"""
+    nombres = list(habitaciones)
+    demanda = np.array([
+        sum(pesos_estado.get(p.get("estado"), 1.0) for p in habitaciones[h]["pacientes"])
+        for h in nombres
+    ], dtype=float)
+    capacidad = np.array([
+        sum(capacidad_rol.get(e.get("rol"), 0.0) for e in habitaciones[h]["enfermeras"])
+        for h in nombres
+    ], dtype=float)
+    return nombres, demanda, capacidad
+
+def proponer_reasignaciones(habitaciones, pesos_estado=PESOS_ESTADO, capacidad_rol=CAPACIDAD_ROL,
+                            max_movimientos=MAX_MOVIMIENTOS, ganancia_minima=GANANCIA_MINIMA):
+    """Propone el menor número de traslados de enfermeras que equilibra la carga.
+
+    Heurística voraz: en cada paso evalúa de forma vectorizada todos los pares
+    (enfermera, habitación destino) y aplica el traslado que más reduce la suma
+    de cuadrados de la demanda no cubierta. Cada enfermera se mueve como mucho
+    una vez y el proceso termina cuando ningún traslado mejora el equilibrio en
+    al menos ``ganancia_minima`` o al llegar a ``max_movimientos`` (None: sin tope).
+    Los pacientes no se mueven.
+    """
+    nombres, demanda, capacidad = calcular_cargas(habitaciones, pesos_estado, capacidad_rol)
+    enfermeras = [
+        (e, i)
+        for i, h in enumerate(nombres)
+        for e in habitaciones[h]["enfermeras"]
+    ]
+    if not enfermeras or len(nombres) < 2:
+        return []
+
+    cap_enf = np.array([capacidad_rol.get(e.get("rol"), 0.0) for e, _ in enfermeras])
+    hab_enf = np.array([i for _, i in enfermeras])
+    disponible = cap_enf > 0
+    limite = max_movimientos if max_movimientos is not None else len(enfermeras)
+
+    movimientos = []
+    while len(movimientos) < limite and disponible.any():
+        deficit = np.maximum(demanda - capacidad, 0.0)
+        costo_actual = deficit ** 2
+
+        # Costo en el origen tras retirar a cada enfermera
+        origen_despues = np.maximum(demanda[hab_enf] - capacidad[hab_enf] + cap_enf, 0.0) ** 2
+        perdida_origen = origen_despues - costo_actual[hab_enf]
+
+        # Costo en cada destino tras recibirla (matriz enfermeras x habitaciones)
+        destino_despues = np.maximum(demanda[None, :] - capacidad[None, :] - cap_enf[:, None], 0.0) ** 2
+        ganancia_destino = costo_actual[None, :] - destino_despues
+
+        ganancia = ganancia_destino - perdida_origen[:, None]
+        ganancia[~disponible, :] = -np.inf
+        ganancia[np.arange(len(enfermeras)), hab_enf] = -np.inf
+
+        n, j = np.unravel_index(np.argmax(ganancia), ganancia.shape)
+        if ganancia[n, j] < ganancia_minima:
+            break
+
+        origen = hab_enf[n]
+        capacidad[origen] -= cap_enf[n]
+        capacidad[j] += cap_enf[n]
+        hab_enf[n] = j
+        disponible[n] = False
+
+        enfermera = enfermeras[n][0]
+        movimientos.append({
+            "id": enfermera["id"],
+            "nombre": enfermera["nombre"],
+            "rol": enfermera["rol"],
+            "desde": nombres[origen],
+            "hacia": nombres[j],
+            "ganancia": float(ganancia[n, j])
+        })
+
+    return movimientos
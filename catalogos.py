@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import sys
+from types import MappingProxyType
+
+import streamlit as st
+
+from evaluacion_lab import ReglasLaboratorio
+from verificacion_medicamentos import VerificadorMedicamentos
+
+logger = logging.getLogger(__name__)
+
+RUTA_CATALOGOS = os.environ.get(
+    "CATALOGOS_EVENTOS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogos", "eventos2.json")
+)
+
+# Listas simples del archivo que se exponen como tuplas
+LISTAS = (
+    "turnos", "ubicaciones", "procedimientos", "categorias", "escalas_grace",
+    "momentos_deteccion", "edades", "imcs", "riesgos", "medicamentos",
+    "dosis_genericas", "unidades", "vias", "tipos_error", "acciones",
+    "seguimiento", "causas_muerte", "roles_reporte"
+)
+
+def _tupla(valores):
+    return tuple(sys.intern(v) for v in valores)
+
+def _congelar(valor):
+    if isinstance(valor, dict):
+        return MappingProxyType({k: _congelar(v) for k, v in valor.items()})
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, str):
+        return sys.intern(valor)
+    return valor
+
+class Catalogos:
+    """Vocabularios del formulario de eventos, inmutables y compartidos por todas las sesiones.
+
+    Se construyen una vez por versión del archivo: las listas son tuplas de
+    cadenas internadas y los mapas (subcategorías, dosis, laboratorios) son de
+    solo lectura, así que el formulario los consulta sin volver a crearlos.
+    """
+
+    def __init__(self, datos):
+        self.version = datos["version"]
+        for nombre in LISTAS:
+            setattr(self, nombre, _tupla(datos[nombre]))
+        self.subcategorias = MappingProxyType({
+            categoria: ("",) + _tupla(opciones) for categoria, opciones in datos["subcategorias"].items()
+        })
+        self.dosis_por_medicamento = MappingProxyType({
+            medicamento: _tupla(dosis) for medicamento, dosis in datos["dosis_por_medicamento"].items()
+        })
+        # Examen -> (título del grupo, ((clave, etiqueta, valor inicial, parámetros del number_input), ...))
+        self.laboratorios = MappingProxyType({
+            sys.intern(examen["examen"]): (
+                examen["titulo"],
+                tuple((c["clave"], c["etiqueta"], c["inicial"], _congelar(c["parametros"])) for c in examen["campos"])
+            )
+            for examen in datos["laboratorios"]
+        })
+        self.examenes = tuple(self.laboratorios)
+        self.reglas_laboratorio = ReglasLaboratorio(datos["laboratorios"])
+        self.verificador_medicamentos = VerificadorMedicamentos(
+            datos["unidades_canonicas"], datos["dosis_maximas"], datos["interacciones"]
+        )
+
+    def dosis(self, medicamento):
+        """Dosis sugeridas para un medicamento; las genéricas si no tiene catálogo propio"""
+        return self.dosis_por_medicamento.get(medicamento, self.dosis_genericas)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _cargar(ruta, marca):
+    with open(ruta, encoding="utf-8") as f:
+        catalogos = Catalogos(json.load(f))
+    logger.info(f"Catálogos {catalogos.version} cargados de {ruta}")
+    return catalogos
+
+_vigentes = {}
+
+def cargar_catalogos(ruta=RUTA_CATALOGOS):
+    """Catálogos vigentes; se recargan solos cuando el archivo cambia en disco.
+
+    Así farmacia puede actualizar dosis sin redesplegar. Si la nueva versión
+    no se puede leer se sigue usando la última válida.
+    """
+    try:
+        estado = os.stat(ruta)
+        _vigentes[ruta] = _cargar(ruta, (estado.st_mtime_ns, estado.st_size))
+    except Exception as e:
+        if ruta not in _vigentes:
+            raise
+        logger.error(f"No se pudieron recargar los catálogos de {ruta}: {str(e)}")
+    return _vigentes[ruta]
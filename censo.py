@@ -0,0 +1,123 @@
+import os
+import uuid
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# Una fila por persona; una fila sin tipo declara una habitación vacía
+COLUMNAS_CENSO = ["habitacion", "tipo", "nombre", "diagnostico", "estado", "rol"]
+
+COLORES_ESTADO = {
+    "crítico": "#ff5252",
+    "observación": "#ff9800",
+    "mejorando": "#2196f3",
+    "estable": "#4caf50",
+    "alta pendiente": "#9c27b0"
+}
+
+COLORES_ROL = {
+    "Especialista": "#9c27b0",
+    "General A": "#2196f3",
+    "General B": "#ff9800",
+    "General C": "#4caf50",
+    "Camillero": "#607d8b"
+}
+
+def leer_censo(archivo, nombre_archivo):
+    """Lee un censo CSV o Parquet como DataFrame de texto"""
+    if nombre_archivo.lower().endswith(".parquet"):
+        df = pd.read_parquet(archivo)
+    else:
+        df = pd.read_csv(archivo, dtype=str, keep_default_na=False)
+    df.columns = df.columns.str.strip().str.lower()
+    for columna in COLUMNAS_CENSO:
+        if columna not in df.columns:
+            df[columna] = ""
+    return df[COLUMNAS_CENSO].fillna("").astype(str).apply(lambda c: c.str.strip())
+
+def validar_censo(df):
+    """Devuelve la lista de errores del censo (vacía si es válido)"""
+    errores = []
+    filas = lambda mascara: ", ".join(str(i + 2) for i in np.flatnonzero(mascara.to_numpy())[:10])
+
+    sin_habitacion = df["habitacion"] == ""
+    if sin_habitacion.any():
+        errores.append(f"Filas sin habitación: {filas(sin_habitacion)}")
+
+    tipo_invalido = ~df["tipo"].isin(["", "paciente", "enfermera"])
+    if tipo_invalido.any():
+        errores.append(f"Tipo no reconocido (paciente/enfermera): filas {filas(tipo_invalido)}")
+
+    sin_nombre = (df["tipo"] != "") & (df["nombre"] == "")
+    if sin_nombre.any():
+        errores.append(f"Filas sin nombre: {filas(sin_nombre)}")
+
+    pacientes = df["tipo"] == "paciente"
+    estado_invalido = pacientes & (df["estado"] != "") & ~df["estado"].isin(list(COLORES_ESTADO))
+    if estado_invalido.any():
+        errores.append(f"Estado no reconocido: filas {filas(estado_invalido)}")
+
+    enfermeras = df["tipo"] == "enfermera"
+    rol_invalido = enfermeras & (df["rol"] != "") & ~df["rol"].isin(list(COLORES_ROL))
+    if rol_invalido.any():
+        errores.append(f"Rol no reconocido: filas {filas(rol_invalido)}")
+
+    return errores
+
+def generar_uuids(n):
+    """Genera n uuid4 a partir de un único bloque de bytes aleatorios"""
+    crudos = np.frombuffer(os.urandom(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    crudos[:, 6] = (crudos[:, 6] & 0x0F) | 0x40
+    crudos[:, 8] = (crudos[:, 8] & 0x3F) | 0x80
+    return [str(uuid.UUID(bytes=fila.tobytes())) for fila in crudos]
+
+def construir_habitaciones(df):
+    """Convierte un censo validado en la estructura de habitaciones del tablero"""
+    personas = df[df["tipo"] != ""].copy()
+    pacientes = personas["tipo"] == "paciente"
+
+    personas["estado"] = personas["estado"].where(personas["estado"] != "", "estable")
+    personas["rol"] = personas["rol"].where(personas["rol"] != "", "General A")
+    personas["diagnostico"] = personas["diagnostico"].where(personas["diagnostico"] != "", "Diagnóstico por definir")
+    personas["id"] = generar_uuids(len(personas))
+    personas["nombre"] = np.where(pacientes, "Pas: ", "Enf: ") + personas["nombre"]
+    personas["color"] = np.where(
+        pacientes,
+        personas["estado"].map(COLORES_ESTADO),
+        personas["rol"].map(COLORES_ROL)
+    )
+
+    habitaciones = {h: {"pacientes": [], "enfermeras": []} for h in df["habitacion"].unique()}
+    columnas_paciente = ["id", "tipo", "nombre", "diagnostico", "estado", "color"]
+    columnas_enfermera = ["id", "tipo", "nombre", "rol", "color"]
+    for habitacion, grupo in personas.groupby("habitacion", sort=False):
+        es_paciente = grupo["tipo"] == "paciente"
+        habitaciones[habitacion]["pacientes"] = grupo.loc[es_paciente, columnas_paciente].to_dict("records")
+        habitaciones[habitacion]["enfermeras"] = grupo.loc[~es_paciente, columnas_enfermera].to_dict("records")
+    return habitaciones
+
+def exportar_censo(habitaciones, formato="csv"):
+    """Exporta el tablero al formato de censo (csv o parquet) para la entrega de turno"""
+    filas = []
+    for habitacion, datos in habitaciones.items():
+        personas = datos["pacientes"] + datos["enfermeras"]
+        if not personas:
+            filas.append({"habitacion": habitacion})
+        for p in personas:
+            filas.append({
+                "habitacion": habitacion,
+                "tipo": p["tipo"],
+                "nombre": p["nombre"].split(": ", 1)[-1],
+                "diagnostico": p.get("diagnostico", ""),
+                "estado": p.get("estado", ""),
+                "rol": p.get("rol", "")
+            })
+    df = pd.DataFrame(filas, columns=COLUMNAS_CENSO).fillna("")
+
+    buffer = BytesIO()
+    if formato == "parquet":
+        df.to_parquet(buffer, index=False)
+    else:
+        df.to_csv(buffer, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime
+
+import streamlit as st
+
+DIRECTORIO_DIARIOS = os.environ.get(
+    "DIARIOS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "diarios")
+)
+
+def leer_lineas(ruta):
+    """Objetos JSON de un archivo de líneas; recorta en disco una cola rota.
+
+    Una escritura interrumpida deja la última línea incompleta (sin salto de
+    línea o con JSON inválido). Se trunca el archivo tras la última línea
+    buena para que el siguiente anexado no quede pegado a ella.
+    """
+    objetos = []
+    if not os.path.exists(ruta):
+        return objetos
+    with open(ruta, "rb+") as f:
+        bueno = 0
+        for linea in f:
+            try:
+                if not linea.endswith(b"\n"):
+                    raise ValueError("línea incompleta")
+                objetos.append(json.loads(linea))
+            except ValueError:
+                f.truncate(bueno)
+                f.flush()
+                os.fsync(f.fileno())
+                break
+            bueno += len(linea)
+    return objetos
+
+# Traslados recientes que guarda la proyección para el historial de movimientos
+ULTIMOS_TRASLADOS = 20
+
+def estado_vacio():
+    return {
+        "columnas": {}, "atenciones": {},
+        "ultima_atencion": {}, "atenciones_hora": {}, "diagnosticos": {},
+        "traslados": 0, "ultimos_traslados": []
+    }
+
+def copiar_estado(estado):
+    """Copia de la proyección; las personas y los eventos no se modifican, basta copiar los contenedores"""
+    return {
+        "columnas": {c: dict(personas) for c, personas in estado["columnas"].items()},
+        "atenciones": dict(estado["atenciones"]),
+        "ultima_atencion": dict(estado["ultima_atencion"]),
+        "atenciones_hora": {c: dict(horas) for c, horas in estado["atenciones_hora"].items()},
+        "diagnosticos": dict(estado["diagnosticos"]),
+        "traslados": estado["traslados"],
+        "ultimos_traslados": list(estado["ultimos_traslados"])
+    }
+
+def aplicar(estado, evento):
+    """Aplica un evento a la proyección.
+
+    Además de {columnas: {columna: {id: persona}}} y las atenciones por
+    columna, acumula lo que el tablero muestra del historial: la última
+    atención de cada paciente, las atenciones por columna y hora y por
+    diagnóstico, y el número de traslados con los más recientes. Así una
+    sesión nueva parte de la proyección sin reproducir el diario entero.
+    """
+    columnas = estado["columnas"]
+    tipo = evento["evento"]
+    if tipo == "inicio":
+        estado["columnas"] = {c: {p["id"]: p for p in ps} for c, ps in evento["columnas"].items()}
+        estado["atenciones"] = {}
+    elif tipo == "apertura":
+        columnas.setdefault(evento["columna"], {})
+    elif tipo == "alta":
+        columnas.setdefault(evento["columna"], {})[evento["persona"]["id"]] = evento["persona"]
+    elif tipo == "traslado":
+        persona = columnas.get(evento["origen"], {}).pop(evento["id"], None)
+        if persona is not None:
+            columnas.setdefault(evento["destino"], {})[evento["id"]] = persona
+            estado["traslados"] += 1
+            estado["ultimos_traslados"] = estado["ultimos_traslados"][-(ULTIMOS_TRASLADOS - 1):] + [evento]
+    elif tipo == "atencion":
+        columna = evento["columna"]
+        estado["atenciones"][columna] = estado["atenciones"].get(columna, 0) + 1
+        estado["ultima_atencion"][evento["id"]] = evento["marca"]
+        hora = datetime.fromisoformat(evento["marca"]).replace(minute=0, second=0, microsecond=0).isoformat()
+        horas = estado["atenciones_hora"].setdefault(columna, {})
+        horas[hora] = horas.get(hora, 0) + 1
+        estado["diagnosticos"][evento["diagnostico"]] = estado["diagnosticos"].get(evento["diagnostico"], 0) + 1
+
+class Diario:
+    """Diario de eventos del tablero, solo de anexado.
+
+    Cada alta, traslado o atención es un evento inmutable con número de
+    secuencia y marca de tiempo completa, escrito como una línea JSON. El
+    tablero actual es la proyección de todos los eventos; cada
+    ``cada_instantanea`` eventos se guarda una instantánea de la proyección, de
+    modo que reabrir el diario o reconstruir el tablero en un instante pasado
+    solo reproduce los eventos posteriores a la instantánea más cercana.
+    """
+
+    def __init__(self, ruta, cada_instantanea=500):
+        self.ruta = ruta
+        self.ruta_instantaneas = os.path.splitext(ruta)[0] + ".instantaneas.jsonl"
+        self.cada_instantanea = cada_instantanea
+        self.eventos = []
+        self.marcas = []
+        self.instantaneas = [(0, estado_vacio())]
+        self.estado = estado_vacio()
+        self.lock = threading.RLock()
+        self._cargar()
+
+    def __len__(self):
+        return len(self.eventos)
+
+    def _cargar(self):
+        """Relee el diario tras un reinicio partiendo de la última instantánea"""
+        for datos in leer_lineas(self.ruta_instantaneas):
+            if "traslados" not in datos:
+                # Instantánea anterior a los acumulados del historial: se reproduce desde la previa
+                continue
+            estado = {
+                **{c: datos[c] for c in estado_vacio()},
+                "columnas": {c: {p["id"]: p for p in ps} for c, ps in datos["columnas"].items()}
+            }
+            self.instantaneas.append((datos["seq"], estado))
+
+        for evento in leer_lineas(self.ruta):
+            self.eventos.append(evento)
+            self.marcas.append(evento["marca"])
+
+        # Una instantánea posterior al último evento legible no es válida
+        self.instantaneas = [(s, e) for s, e in self.instantaneas if s <= len(self.eventos)]
+        seq, estado = self.instantaneas[-1]
+        self.estado = copiar_estado(estado)
+        for evento in self.eventos[seq:]:
+            aplicar(self.estado, evento)
+
+    def registrar(self, eventos):
+        """Anexa eventos de forma atómica; devuelve los eventos con seq y marca"""
+        marca = datetime.now().isoformat()
+        with self.lock:
+            completos = []
+            for i, evento in enumerate(eventos, start=len(self.eventos)):
+                completos.append({"seq": i, "marca": marca, **evento})
+
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(self.ruta, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in completos))
+                f.flush()
+                os.fsync(f.fileno())
+
+            for evento in completos:
+                aplicar(self.estado, evento)
+                self.eventos.append(evento)
+                self.marcas.append(marca)
+                if len(self.eventos) % self.cada_instantanea == 0 or evento["evento"] == "inicio":
+                    self._guardar_instantanea()
+        return completos
+
+    def iniciar(self, columnas):
+        """Registra el tablero inicial {columna: [personas]} si el diario está vacío"""
+        with self.lock:
+            if not self.eventos:
+                self.registrar([{"evento": "inicio", "columnas": columnas}])
+
+    def _guardar_instantanea(self):
+        seq = len(self.eventos)
+        self.instantaneas.append((seq, copiar_estado(self.estado)))
+        datos = {
+            **self.estado,
+            "seq": seq,
+            "columnas": {c: list(ps.values()) for c, ps in self.estado["columnas"].items()}
+        }
+        with open(self.ruta_instantaneas, "a", encoding="utf-8") as f:
+            f.write(json.dumps(datos, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def eventos_desde(self, seq):
+        """Eventos con número de secuencia mayor o igual a ``seq``"""
+        with self.lock:
+            return self.eventos[seq:]
+
+    def estado_actual(self):
+        """Copia de la proyección actual y la secuencia que refleja"""
+        with self.lock:
+            return copiar_estado(self.estado), len(self.eventos)
+
+    def estado_en(self, instante):
+        """Proyección del tablero tal como estaba en ``instante``"""
+        with self.lock:
+            n = bisect_right(self.marcas, instante.isoformat())
+            idx = bisect_right([s for s, _ in self.instantaneas], n) - 1
+            seq, estado = self.instantaneas[idx]
+            estado = copiar_estado(estado)
+            for evento in self.eventos[seq:n]:
+                aplicar(estado, evento)
+        return estado
+
+@st.cache_resource(show_spinner=False)
+def abrir_diario(nombre):
+    """Diario compartido por todas las sesiones del proceso"""
+    return Diario(os.path.join(DIRECTORIO_DIARIOS, f"{nombre}.jsonl"))
@@ -0,0 +1,157 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+
+from almacen_contenido import guardar_por_contenido
+from validacion_pdf import analizar
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_DOCUMENTOS = os.environ.get(
+    "DOCUMENTOS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "documentos")
+)
+
+# Límites por archivo y por solicitante, en bytes
+LIMITE_ARCHIVO = 10 * 1024 * 1024
+LIMITE_SOLICITANTE = 25 * 1024 * 1024
+# Intentos de validación antes de dar el documento por no analizable
+MAX_INTENTOS = 3
+
+def megas(tamano):
+    return f"{tamano / (1024 * 1024):.1f} MB"
+
+def verificar_limites(tamano, ocupado):
+    """Mensaje de error si el archivo excede los límites; None si se puede guardar.
+
+    El límite por archivo lo aplica Streamlit antes de recibir la subida
+    (``server.maxUploadSize`` en .streamlit/config.toml); cuando esto se
+    ejecuta el archivo ya está en memoria, así que aquí solo se controla el
+    total por solicitante. El límite por archivo se repite por si la app se
+    lanza sin esa configuración.
+    """
+    if tamano > LIMITE_ARCHIVO:
+        return f"El archivo pesa {megas(tamano)}; el máximo por documento es {megas(LIMITE_ARCHIVO)}"
+    if ocupado + tamano > LIMITE_SOLICITANTE:
+        return f"Los documentos sumarían {megas(ocupado + tamano)}; el máximo por solicitante es {megas(LIMITE_SOLICITANTE)}"
+    return None
+
+class AlmacenDocumentos:
+    """Almacén en disco de los documentos de inscripción, direccionado por contenido.
+
+    El archivo subido se copia por bloques a un temporal mientras se calcula su
+    SHA-256 y después se mueve a ``<directorio>/<ab>/<hash>.pdf``; un mismo PDF
+    se guarda una sola vez. En la sesión solo queda la referencia.
+
+    Después de guardarlo, un proceso aparte valida su estructura y genera la
+    miniatura; el resultado se guarda junto al hash, así que volver a subir el
+    mismo archivo no repite el trabajo. Si el proceso de trabajo falla se
+    reintenta hasta MAX_INTENTOS veces y después también se guarda el fallo.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.directorio_validacion = os.path.join(directorio, "validacion")
+        os.makedirs(self.directorio_validacion, exist_ok=True)
+        self.trabajador = self._nuevo_trabajador()
+        self.validaciones = {}
+        self.intentos = {}
+        self.resultados = {}
+        # Las sesiones consultan y encargan validaciones desde hilos distintos
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _nuevo_trabajador():
+        # spawn: no se hereda el estado (hilos, sockets) del servidor de Streamlit
+        return ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+
+    def ruta(self, hash_contenido):
+        return os.path.join(self.directorio, hash_contenido[:2], f"{hash_contenido}.pdf")
+
+    def ruta_validacion(self, hash_contenido):
+        return os.path.join(self.directorio_validacion, f"{hash_contenido}.json")
+
+    def ruta_miniatura(self, hash_contenido):
+        return os.path.join(self.directorio_validacion, f"{hash_contenido}.jpg")
+
+    def guardar(self, archivo):
+        """Guarda un archivo subido y devuelve sus metadatos"""
+        hash_contenido, tamano, destino = guardar_por_contenido(self.directorio, archivo, self.ruta)
+        self.solicitar_validacion(hash_contenido)
+        return {"hash": hash_contenido, "tamano": tamano, "ruta": destino, "archivo": archivo.name}
+
+    def solicitar_validacion(self, hash_contenido):
+        """Encarga la validación al proceso de trabajo si no existe ni está en curso"""
+        with self.lock:
+            self._solicitar(hash_contenido)
+
+    def _solicitar(self, hash_contenido):
+        if hash_contenido in self.validaciones or os.path.exists(self.ruta_validacion(hash_contenido)):
+            return
+        tarea = (
+            analizar,
+            self.ruta(hash_contenido),
+            self.ruta_validacion(hash_contenido),
+            self.ruta_miniatura(hash_contenido),
+            LIMITE_ARCHIVO
+        )
+        try:
+            self.validaciones[hash_contenido] = self.trabajador.submit(*tarea)
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. sin memoria): el grupo ya no acepta tareas
+            logger.warning("Se reinicia el grupo de procesos de validación de documentos")
+            self.trabajador = self._nuevo_trabajador()
+            self.validaciones[hash_contenido] = self.trabajador.submit(*tarea)
+        self.intentos[hash_contenido] = self.intentos.get(hash_contenido, 0) + 1
+
+    def _guardar_fallo(self, hash_contenido):
+        """Guarda como resultado que el archivo no se pudo analizar, para no reintentarlo más"""
+        resultado = {
+            "valido": False, "version": None, "paginas": 0, "cifrado": False,
+            "problemas": ["No se pudo analizar el archivo"], "avisos": [], "miniatura": False
+        }
+        ruta = self.ruta_validacion(hash_contenido)
+        with open(ruta + ".parte", "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False)
+        os.replace(ruta + ".parte", ruta)
+        return resultado
+
+    def validacion(self, hash_contenido):
+        """Resultado de la validación; None mientras está en curso"""
+        with self.lock:
+            if hash_contenido in self.resultados:
+                return self.resultados[hash_contenido]
+
+            ruta = self.ruta_validacion(hash_contenido)
+            if os.path.exists(ruta):
+                with open(ruta, encoding="utf-8") as f:
+                    self.resultados[hash_contenido] = json.load(f)
+                return self.resultados[hash_contenido]
+
+            self._solicitar(hash_contenido)
+            futuro = self.validaciones[hash_contenido]
+            if not futuro.done():
+                return None
+            del self.validaciones[hash_contenido]
+            if futuro.exception() is None:
+                self.resultados[hash_contenido] = futuro.result()
+            else:
+                logger.warning(f"No se pudo validar el documento {hash_contenido}: {futuro.exception()}")
+                if self.intentos[hash_contenido] < MAX_INTENTOS:
+                    # Sigue en curso: se vuelve a encargar
+                    self._solicitar(hash_contenido)
+                    return None
+                self.resultados[hash_contenido] = self._guardar_fallo(hash_contenido)
+            self.intentos.pop(hash_contenido, None)
+            return self.resultados[hash_contenido]
+
+@st.cache_resource(show_spinner=False)
+def abrir_almacen_documentos():
+    """Almacén de documentos compartido por todas las sesiones"""
+    return AlmacenDocumentos(DIRECTORIO_DOCUMENTOS)
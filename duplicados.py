@@ -0,0 +1,214 @@
+import json
+import re
+import unicodedata
+import zlib
+from datetime import date, timedelta
+from itertools import combinations
+
+import numpy as np
+
+# Campos estructurados que se comparan entre reportes
+CAMPOS = ("ubicacion", "fecha_evento", "turno", "numero_cama", "subcategoria")
+UMBRAL = 0.75
+DIAS_VECINDAD = 3
+# Cambia cuando cambia lo que entra en las firmas; el almacén rehace el índice al abrirse
+VERSION_INDICE = 2
+
+PERMUTACIONES = 64
+FILAS_POR_BANDA = 4
+_PRIMO = (1 << 61) - 1
+_azar = np.random.default_rng(44)
+_A = _azar.integers(1, 1 << 31, PERMUTACIONES, dtype=np.uint64)
+_B = _azar.integers(0, 1 << 31, PERMUTACIONES, dtype=np.uint64)
+
+def normalizar(texto):
+    """Minúsculas sin acentos ni signos, para comparar textos capturados a mano"""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+def campos(reporte):
+    """Valores normalizados de CAMPOS ('' si faltan)"""
+    paciente = reporte.get("datos_paciente") or {}
+    valores = {c: reporte.get(c, "") for c in CAMPOS}
+    valores["numero_cama"] = paciente.get("numero_cama", "")
+    valores["fecha_evento"] = str(valores["fecha_evento"] or "")[:10]
+    return tuple(normalizar(valores[c]) if c != "fecha_evento" else valores[c] for c in CAMPOS)
+
+def texto_libre(reporte):
+    """Texto capturado a mano en el reporte: nombre del paciente y descripciones de la evidencia.
+
+    Los valores de catálogo (procedimiento, acción inmediata) no entran: dos
+    reportes de la misma categoría los comparten aunque sean eventos distintos.
+    """
+    partes = [
+        (reporte.get("datos_paciente") or {}).get("nombre_completo", ""),
+        *(e.get("descripcion", "") for e in (reporte.get("evidencia_multimedia") or {}).get("elementos", []))
+    ]
+    return normalizar(" ".join(p for p in partes if p))
+
+def firma(texto):
+    """Firma MinHash de los trigramas de caracteres; None si no hay texto"""
+    if len(texto) < 3:
+        return None
+    trigramas = {texto[i:i + 3] for i in range(len(texto) - 2)}
+    x = np.fromiter((zlib.crc32(t.encode()) for t in trigramas), dtype=np.uint64, count=len(trigramas))
+    return ((np.outer(x, _A) + _B) % _PRIMO).min(axis=0)
+
+def cubetas(firma_texto):
+    """(banda, cubeta) de la firma para el índice LSH"""
+    filas = firma_texto.reshape(-1, FILAS_POR_BANDA)
+    return [(banda, zlib.crc32(fila.tobytes())) for banda, fila in enumerate(filas)]
+
+def claves_bloqueo(valores):
+    """Claves de bloqueo: mismo lugar, fecha y turno, o misma cama y fecha"""
+    ubicacion, fecha, turno, cama, _ = valores
+    claves = [f"lugar|{ubicacion}|{fecha}|{turno}"]
+    if cama:
+        claves.append(f"cama|{cama}|{fecha}")
+    return claves
+
+def similitud(campos_a, campos_b, firma_a, firma_b):
+    """Coincidencia de campos y, si ambos tienen texto, similitud de Jaccard estimada.
+
+    La coincidencia se mide solo sobre los campos llenos en los dos reportes:
+    una cama o subcategoría sin capturar no cuenta como diferencia.
+    """
+    comparables = [(a, b) for a, b in zip(campos_a, campos_b) if a and b]
+    coincidencias = sum(a == b for a, b in comparables) / len(comparables) if comparables else 0.0
+    if firma_a is None or firma_b is None:
+        return coincidencias
+    return 0.6 * coincidencias + 0.4 * float(np.mean(firma_a == firma_b))
+
+def crear_tablas(conexion):
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS firmas (
+            codigo TEXT PRIMARY KEY,
+            fecha TEXT NOT NULL,
+            campos TEXT NOT NULL,
+            firma BLOB
+        )""")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_firmas_fecha ON firmas (fecha)")
+    # La fecha va en los índices: solo se comparan reportes de fechas cercanas
+    conexion.execute("CREATE TABLE IF NOT EXISTS bloques (clave TEXT NOT NULL, fecha TEXT NOT NULL, codigo TEXT NOT NULL)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_bloques_clave ON bloques (clave, fecha)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_bloques_fecha ON bloques (fecha)")
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS lsh (
+            banda INTEGER NOT NULL,
+            cubeta INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            codigo TEXT NOT NULL
+        )""")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_lsh_cubeta ON lsh (banda, cubeta, fecha)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_lsh_fecha ON lsh (fecha)")
+
+def vaciar(conexion):
+    """Borra el índice para volver a construirlo"""
+    for tabla in ("firmas", "bloques", "lsh"):
+        conexion.execute(f"DELETE FROM {tabla}")
+
+def _describir(reporte):
+    valores = campos(reporte)
+    return valores, firma(texto_libre(reporte))
+
+def indexar(conexion, codigo, reporte):
+    """Agrega el reporte al índice; se llama dentro de la transacción que lo encola"""
+    valores, firma_texto = _describir(reporte)
+    conexion.execute(
+        "INSERT OR REPLACE INTO firmas (codigo, fecha, campos, firma) VALUES (?, ?, ?, ?)",
+        (codigo, valores[1], json.dumps(valores, ensure_ascii=False), None if firma_texto is None else firma_texto.tobytes())
+    )
+    fecha = valores[1]
+    conexion.executemany("INSERT INTO bloques (clave, fecha, codigo) VALUES (?, ?, ?)",
+                         [(c, fecha, codigo) for c in claves_bloqueo(valores)])
+    if firma_texto is not None:
+        conexion.executemany("INSERT INTO lsh (banda, cubeta, fecha, codigo) VALUES (?, ?, ?, ?)",
+                             [(b, c, fecha, codigo) for b, c in cubetas(firma_texto)])
+
+def _firma_guardada(blob):
+    return None if blob is None else np.frombuffer(blob, dtype=np.uint64)
+
+def candidatos(conexion, reporte, umbral=UMBRAL):
+    """Reportes ya registrados que probablemente describen el mismo evento, del más parecido al menos"""
+    valores, firma_texto = _describir(reporte)
+    try:
+        fecha = date.fromisoformat(valores[1])
+    except ValueError:
+        fecha = date.today()
+    rango = [(fecha - timedelta(days=DIAS_VECINDAD)).isoformat(), (fecha + timedelta(days=DIAS_VECINDAD)).isoformat()]
+
+    claves = claves_bloqueo(valores)
+    consultas = ["SELECT codigo FROM bloques WHERE clave = ? AND fecha BETWEEN ? AND ?"] * len(claves)
+    parametros = [p for clave in claves for p in (clave, *rango)]
+    if firma_texto is not None:
+        for banda, cubeta in cubetas(firma_texto):
+            consultas.append("SELECT codigo FROM lsh WHERE banda = ? AND cubeta = ? AND fecha BETWEEN ? AND ?")
+            parametros += [banda, cubeta, *rango]
+    filas = conexion.execute(
+        f"SELECT codigo, campos, firma FROM firmas WHERE codigo IN ({' UNION '.join(consultas)})",
+        parametros
+    ).fetchall()
+
+    parecidos = []
+    for codigo, campos_guardados, blob in filas:
+        puntaje = similitud(valores, json.loads(campos_guardados), firma_texto, _firma_guardada(blob))
+        if puntaje >= umbral:
+            parecidos.append((codigo, round(puntaje, 2)))
+    return sorted(parecidos, key=lambda p: -p[1])
+
+def agrupar(conexion, desde, umbral=UMBRAL):
+    """Agrupa en lote los reportes desde una fecha que parecen el mismo evento.
+
+    Los pares candidatos salen de compartir clave de bloqueo o cubeta LSH; se
+    puntúan todos a la vez con NumPy y se unen en grupos (unión-búsqueda).
+    """
+    filas = conexion.execute("SELECT codigo, campos, firma FROM firmas WHERE fecha >= ?", (desde.isoformat(),)).fetchall()
+    if len(filas) < 2:
+        return []
+    codigos = [f[0] for f in filas]
+    posicion = {c: i for i, c in enumerate(codigos)}
+
+    cubetas_comunes = {}
+    for clave, codigo in conexion.execute("SELECT clave, codigo FROM bloques WHERE fecha >= ?", (desde.isoformat(),)):
+        cubetas_comunes.setdefault(("bloque", clave), []).append(posicion[codigo])
+    for banda, cubeta, codigo in conexion.execute("SELECT banda, cubeta, codigo FROM lsh WHERE fecha >= ?", (desde.isoformat(),)):
+        cubetas_comunes.setdefault((banda, cubeta), []).append(posicion[codigo])
+    pares = {par for miembros in cubetas_comunes.values() if len(miembros) > 1 for par in combinations(sorted(miembros), 2)}
+    if not pares:
+        return []
+    i, j = np.array(sorted(pares)).T
+
+    # Campos como enteros por columna (-1 = vacío) y firmas en una matriz
+    valores = [json.loads(f[1]) for f in filas]
+    codificados = np.full((len(filas), len(CAMPOS)), -1)
+    for columna in range(len(CAMPOS)):
+        vocabulario = {}
+        for fila, v in enumerate(valores):
+            if v[columna]:
+                codificados[fila, columna] = vocabulario.setdefault(v[columna], len(vocabulario))
+    con_texto = np.array([f[2] is not None for f in filas])
+    firmas_texto = np.zeros((len(filas), PERMUTACIONES), dtype=np.uint64)
+    for fila, f in enumerate(filas):
+        if f[2] is not None:
+            firmas_texto[fila] = _firma_guardada(f[2])
+
+    comparables = ((codificados[i] >= 0) & (codificados[j] >= 0)).sum(axis=1)
+    iguales = ((codificados[i] == codificados[j]) & (codificados[i] >= 0)).sum(axis=1)
+    coincidencias = np.divide(iguales, comparables, out=np.zeros(len(i)), where=comparables > 0)
+    jaccard = (firmas_texto[i] == firmas_texto[j]).mean(axis=1)
+    ambos = con_texto[i] & con_texto[j]
+    puntaje = np.where(ambos, 0.6 * coincidencias + 0.4 * jaccard, coincidencias)
+
+    padre = list(range(len(filas)))
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+    for a, b in zip(i[puntaje >= umbral], j[puntaje >= umbral]):
+        padre[raiz(a)] = raiz(b)
+
+    grupos = {}
+    for fila in range(len(filas)):
+        grupos.setdefault(raiz(fila), []).append(codigos[fila])
+    return sorted((sorted(g) for g in grupos.values() if len(g) > 1), key=len, reverse=True)
@@ -1,11 +1,13 @@
 import streamlit as st
 from PIL import Image
 import datetime
-import random
-import string
-import time
-import os
-from io import BytesIO
+import json
+from html import escape
+from tema import aplicar_tema
+from almacen_solicitudes import ESTADOS, TRANSICIONES, abrir_almacen_solicitudes
+from documentos import LIMITE_ARCHIVO, LIMITE_SOLICITANTE, abrir_almacen_documentos, megas, verificar_limites
+from matriculas import es_valida
+from oferta_educativa import cargar_oferta
 
 # Configuración inicial
 def configurar_pagina():
@@ -17,112 +19,21 @@ def configurar_pagina():
     )
 
 def cargar_estilos():
-    st.markdown("""
-    <style>
-    :root {
-        --color-primario: #003366;
-        --color-secundario: #e74c3c;
-        --color-exito: #28a745;
-        --color-info: #17a2b8;
-    }
-    
-    body {
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        color: #333;
-        line-height: 1.6;
-    }
-    
-    .sidebar .sidebar-content {
-        background-color: #f8f9fa;
-    }
-    
-    .sidebar-header {
-        text-align: center;
-        padding: 1rem;
-        border-bottom: 1px solid #dee2e6;
-    }
-    
-    .main-header {
-        text-align: center;
-        padding: 2rem;
-        background: linear-gradient(135deg, #f5f9ff 0%, #e1ebfa 100%);
-        border-radius: 10px;
-        margin-bottom: 2rem;
-    }
-    
-    .programa-card {
-        background: white;
-        border-radius: 10px;
-        padding: 1.5rem;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        border-left: 4px solid var(--color-primario);
-        transition: all 0.3s;
-    }
-    
-    .programa-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 10px 15px rgba(0,0,0,0.1);
-    }
-    
-    .badge {
-        display: inline-block;
-        padding: 0.35em 0.65em;
-        font-size: 0.75em;
-        font-weight: 700;
-        line-height: 1;
-        text-align: center;
-        white-space: nowrap;
-        vertical-align: baseline;
-        border-radius: 0.25rem;
-    }
-    
-    .badge-primary {
-        color: #fff;
-        background-color: var(--color-primario);
-    }
-    
-    .badge-secondary {
-        color: #fff;
-        background-color: #6c757d;
-    }
-    
-    .badge-success {
-        color: #fff;
-        background-color: var(--color-exito);
-    }
-    
-    .form-section {
-        background-color: #f8f9fa;
-        border-radius: 10px;
-        padding: 1.5rem;
-        margin-bottom: 1.5rem;
-    }
-    
-    .required-field::after {
-        content: " *";
-        color: var(--color-secundario);
-    }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    .animate-fade {
-        animation: fadeIn 0.5s ease-out;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    aplicar_tema("escuela")
 
 # Funciones auxiliares
-def generar_matricula():
-    return 'MAT-' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-
 def validar_email(email):
     return '@' in email and '.' in email.split('@')[-1]
 
 # Funciones principales
+def modo_personal():
+    """Vista del personal activada con SUPERVISOR_MODE en secrets.toml"""
+    try:
+        return bool(st.secrets.get("SUPERVISOR_MODE", False))
+    except Exception:
+        # Sin secrets.toml no hay vista de personal
+        return False
+
 def mostrar_header():
     st.markdown("""
     <div class="main-header animate-fade">
@@ -161,144 +72,115 @@ def mostrar_sidebar():
         if st.button("📱 Contacto"):
             st.session_state.seccion_actual = "Contacto"
             st.rerun()
+        
+        if modo_personal() and st.button("🗂️ Revisión de Solicitudes"):
+            st.session_state.seccion_actual = "Revisión"
+            st.rerun()
 
 def mostrar_oferta_educativa():
-    st.markdown("""
+    oferta = cargar_oferta()
+    st.markdown(f"""
     <div class="animate-fade">
-        <h2>Oferta Educativa 2025-2026</h2>
+        <h2>Oferta Educativa {oferta.version}</h2>
         <p>Explora nuestros programas académicos y encuentra el que mejor se adapte a tus metas profesionales.</p>
     </div>
     """, unsafe_allow_html=True)
     
-    tab1, tab2, tab3, tab4 = st.tabs(["Licenciaturas", "Especialidades", "Maestrías", "Diplomados y Cursos"])
-    
-    with tab1:
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("""
-            <div class="programa-card">
-                <h3>Licenciatura en Enfermería</h3>
-                <div style="display: flex; gap: 10px; flex-wrap: wrap; margin: 10px 0;">
-                    <span class="badge badge-primary">4 años</span>
-                    <span class="badge badge-secondary">Presencial</span>
-                    <span class="badge badge-success">RVOE: ESL-2025-001</span>
-                </div>
-                <p>Formación integral de enfermeros generales con competencias para el cuidado de la salud en diferentes contextos.</p>
-            </div>
-            """, unsafe_allow_html=True)
-            if st.button("Inscribirme", key="insc_lic1"):
-                st.session_state.seccion_actual = "Inscripción"
-                st.session_state.programa_seleccionado = "Licenciatura en Enfermería"
-                st.rerun()
-        
-        with col2:
-            st.markdown("""
-            <div class="programa-card">
-                <h3>Licenciatura en Enfermería Obstétrica</h3>
-                <div style="display: flex; gap: 10px; flex-wrap: wrap; margin: 10px 0;">
-                    <span class="badge badge-primary">4 años</span>
-                    <span class="badge badge-secondary">Presencial</span>
-                    <span class="badge badge-success">RVOE: ESL-2025-002</span>
-                </div>
-                <p>Especialización en el área de ginecología y obstetricia para atención durante el embarazo, parto y puerperio.</p>
-            </div>
-            """, unsafe_allow_html=True)
-            if st.button("Inscribirme", key="insc_lic2"):
-                st.session_state.seccion_actual = "Inscripción"
-                st.session_state.programa_seleccionado = "Licenciatura en Enfermería Obstétrica"
-                st.rerun()
-    
-    with tab2:
-        cols = st.columns(3)
-        especialidades = [
-            {
-                "nombre": "Enfermería Cardiovascular",
-                "duracion": "2 años",
-                "modalidad": "Semipresencial",
-                "desc": "Cuidado de pacientes con patologías cardiovasculares en unidades de terapia intensiva."
-            },
-            {
-                "nombre": "Enfermería Nefrológica",
-                "duracion": "2 años",
-                "modalidad": "Semipresencial",
-                "desc": "Especialización en el cuidado de pacientes con enfermedad renal crónica y aguda."
-            },
-            {
-                "nombre": "Enfermería Pediátrica",
-                "duracion": "2 años",
-                "modalidad": "Presencial",
-                "desc": "Atención especializada para pacientes neonatales, infantiles y adolescentes."
-            }
-        ]
-        
-        for i, esp in enumerate(especialidades):
-            with cols[i]:
-                st.markdown(f"""
-                <div class="programa-card">
-                    <h3>{esp['nombre']}</h3>
-                    <div style="display: flex; gap: 10px; flex-wrap: wrap; margin: 10px 0;">
-                        <span class="badge badge-primary">{esp['duracion']}</span>
-                        <span class="badge badge-secondary">{esp['modalidad']}</span>
-                        <span class="badge badge-success">Certificación CONACYT</span>
-                    </div>
-                    <p>{esp['desc']}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                if st.button(f"Inscribirme {i+1}", key=f"insc_esp{i}"):
-                    st.session_state.seccion_actual = "Inscripción"
-                    st.session_state.programa_seleccionado = f"Especialidad en {esp['nombre']}"
-                    st.rerun()
-    
-    with tab3:
-        st.markdown("""
-        <div class="programa-card">
-            <h3>Maestría en Administración de Servicios de Salud</h3>
-            <div style="display: flex; gap: 10px; flex-wrap: wrap; margin: 10px 0;">
-                <span class="badge badge-primary">2 años</span>
-                <span class="badge badge-secondary">En línea</span>
-                <span class="badge badge-success">Grado académico</span>
-            </div>
-            <p>Formación en gestión y liderazgo para directivos de instituciones y servicios de salud.</p>
-        </div>
-        """, unsafe_allow_html=True)
-        if st.button("Inscribirme", key="insc_maes"):
-            st.session_state.seccion_actual = "Inscripción"
-            st.session_state.programa_seleccionado = "Maestría en Administración de Servicios de Salud"
-            st.rerun()
-    
-    with tab4:
-        cursos = [
-            {
-                "nombre": "Diplomado en Cardiología",
-                "duracion": "6 meses",
-                "modalidad": "En línea",
-                "desc": "Actualización en el manejo de pacientes con patologías cardiovasculares frecuentes."
-            },
-            {
-                "nombre": "Curso de RCP Avanzado",
-                "duracion": "3 meses",
-                "modalidad": "Presencial",
-                "desc": "Certificación en reanimación cardiopulmonar según estándares internacionales."
-            }
-        ]
-        
-        for i, curso in enumerate(cursos):
-            st.markdown(f"""
-            <div class="programa-card">
-                <h3>{curso['nombre']}</h3>
-                <div style="display: flex; gap: 10px; flex-wrap: wrap; margin: 10px 0;">
-                    <span class="badge badge-primary">{curso['duracion']}</span>
-                    <span class="badge badge-secondary">{curso['modalidad']}</span>
-                    <span class="badge badge-success">Certificación</span>
-                </div>
-                <p>{curso['desc']}</p>
-            </div>
-            """, unsafe_allow_html=True)
-            if st.button(f"Inscribirme {i+1}", key=f"insc_curso{i}"):
-                st.session_state.seccion_actual = "Inscripción"
-                st.session_state.programa_seleccionado = curso['nombre']
-                st.rerun()
+    pestanas = st.tabs([titulo for _, titulo, _, _ in oferta.categorias])
+    for pestana, (_, _, columnas, ids) in zip(pestanas, oferta.categorias):
+        with pestana:
+            cols = st.columns(columnas)
+            for i, id_programa in enumerate(ids):
+                programa = oferta.programas[id_programa]
+                with cols[i % columnas]:
+                    st.markdown(programa.tarjeta, unsafe_allow_html=True)
+                    if st.button("Inscribirme", key=f"insc_{programa.id}"):
+                        st.session_state.seccion_actual = "Inscripción"
+                        st.session_state.programa_seleccionado = programa.id
+                        if 'datos_inscripcion' in st.session_state:
+                            st.session_state.datos_inscripcion['programa_id'] = programa.id
+                        st.rerun()
+
+def guardar_documento(nombre, clave):
+    """Callback del cargador: guarda el PDF en disco y deja en sesión solo sus metadatos"""
+    archivo = st.session_state.get(clave)
+    if archivo is None:
+        return
+    documentos = st.session_state.datos_inscripcion['documentos']
+    ocupado = sum(d['tamano'] for n, d in documentos.items() if n != nombre)
+
+    error = verificar_limites(archivo.size, ocupado)
+    if error:
+        st.session_state.error_documento = (nombre, error)
+    else:
+        try:
+            metadatos = st.session_state.almacen_documentos.guardar(archivo)
+        except Exception as e:
+            st.session_state.error_documento = (nombre, f"No se pudo guardar el documento: {str(e)}")
+        else:
+            metadatos['fecha'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            documentos[nombre] = metadatos
+
+    # Un cargador nuevo en el siguiente rerun: Streamlit libera el archivo en memoria
+    st.session_state.versiones_documentos[nombre] = st.session_state.versiones_documentos.get(nombre, 0) + 1
+
+def quitar_documento(nombre):
+    st.session_state.datos_inscripcion['documentos'].pop(nombre, None)
+
+def estado_documento(hash_contenido):
+    """Resultado de la validación en segundo plano; False mientras sigue en curso"""
+    almacen = st.session_state.almacen_documentos
+    resultado = almacen.validacion(hash_contenido)
+    if resultado is None:
+        st.caption("⏳ Validando el PDF...")
+        return False
+    if resultado['valido']:
+        st.caption(f"🟢 PDF {resultado['version']} válido · {resultado['paginas']} página(s)")
+    else:
+        st.warning("; ".join(resultado['problemas']))
+    for aviso in resultado['avisos']:
+        st.caption(f"ℹ️ {aviso}")
+    if resultado.get('miniatura'):
+        st.image(almacen.ruta_miniatura(hash_contenido), width=120, caption="Imagen incluida en el PDF")
+    return True
+
+@st.fragment(run_every=2)
+def estado_documento_pendiente(hash_contenido):
+    """Se refresca solo mientras se valida; al terminar redibuja la página sin el temporizador"""
+    if estado_documento(hash_contenido):
+        st.rerun()
+
+def mostrar_documentos(documentos):
+    """Cargadores de los documentos requeridos; los ya guardados muestran sus metadatos"""
+    guardados = st.session_state.datos_inscripcion['documentos']
+    for i, doc in enumerate(documentos):
+        if doc in guardados:
+            metadatos = guardados[doc]
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"✅ **{doc}**: {metadatos['archivo']} ({megas(metadatos['tamano'])})")
+                if st.session_state.almacen_documentos.validacion(metadatos['hash']) is None:
+                    estado_documento_pendiente(metadatos['hash'])
+                else:
+                    estado_documento(metadatos['hash'])
+            with col2:
+                st.button("Reemplazar", key=f"quitar_doc_{i}", on_click=quitar_documento, args=(doc,))
+        else:
+            clave = f"doc_{i}_{st.session_state.versiones_documentos.get(doc, 0)}"
+            st.file_uploader(
+                f"Subir {doc}",
+                type=['pdf'],
+                key=clave,
+                on_change=guardar_documento,
+                args=(doc, clave)
+            )
+        error = st.session_state.get('error_documento')
+        if error and error[0] == doc:
+            st.error(error[1])
+            del st.session_state.error_documento
+
+    ocupado = sum(d['tamano'] for d in guardados.values())
+    st.caption(f"Espacio usado: {megas(ocupado)} de {megas(LIMITE_SOLICITANTE)} (máximo {megas(LIMITE_ARCHIVO)} por documento)")
 
 def mostrar_inscripcion():
     st.markdown("""
@@ -308,42 +190,52 @@ def mostrar_inscripcion():
     </div>
     """, unsafe_allow_html=True)
     
+    oferta = cargar_oferta()
     if 'datos_inscripcion' not in st.session_state:
         st.session_state.datos_inscripcion = {
-            'matricula': generar_matricula(),
-            'programa': st.session_state.get('programa_seleccionado', ''),
+            'matricula': None,
+            'programa_id': st.session_state.get('programa_seleccionado', oferta.ids[0]),
+            'programa': '',
             'nombre_completo': '',
             'fecha_nacimiento': None,
             'genero': '',
             'email': '',
             'telefono': '',
-            'documentos': []
+            'documentos': {}
         }
+    if 'almacen_documentos' not in st.session_state:
+        st.session_state.almacen_documentos = abrir_almacen_documentos()
+        st.session_state.versiones_documentos = {}
+    if 'almacen_solicitudes' not in st.session_state:
+        st.session_state.almacen_solicitudes = abrir_almacen_solicitudes()
+    
+    # Se llena al final: la matrícula se asigna al enviar la inscripción
+    encabezado_matricula = st.empty()
+    
+    # Fuera del formulario: los documentos requeridos cambian en cuanto cambia el programa
+    datos = st.session_state.datos_inscripcion
+    datos['programa_id'] = st.selectbox(
+        "Programa al que desea inscribirse:",
+        oferta.ids,
+        index=oferta.ids.index(datos['programa_id']) if datos['programa_id'] in oferta.programas else 0,
+        format_func=lambda id_programa: oferta.programas[id_programa].nombre
+    )
+    programa = oferta.programas[datos['programa_id']]
+    datos['programa'] = programa.nombre
+    
+    st.markdown("""
+    <div style="margin: 2rem 0 1rem 0;">
+        <h4>Documentos Requeridos</h4>
+        <p>Sube los siguientes documentos en formato PDF:</p>
+    </div>
+    """, unsafe_allow_html=True)
     
+    documentos = programa.documentos_pdf
+    
+    mostrar_documentos(documentos)
+    
+    comprobante = None
     with st.form("form_inscripcion"):
-        st.markdown(f"""
-        <div style="background-color: #e9f7ff; padding: 1rem; border-radius: 8px; margin-bottom: 1.5rem;">
-            <h4>Número de Matrícula: <strong>{st.session_state.datos_inscripcion['matricula']}</strong></h4>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        programas = [
-            "Licenciatura en Enfermería",
-            "Licenciatura en Enfermería Obstétrica",
-            "Especialidad en Enfermería Cardiovascular",
-            "Especialidad en Enfermería Nefrológica",
-            "Especialidad en Enfermería Pediátrica",
-            "Maestría en Administración de Servicios de Salud",
-            "Diplomado en Cardiología",
-            "Curso de RCP Avanzado"
-        ]
-        
-        st.session_state.datos_inscripcion['programa'] = st.selectbox(
-            "Programa al que desea inscribirse:",
-            programas,
-            index=programas.index(st.session_state.datos_inscripcion['programa']) if st.session_state.datos_inscripcion['programa'] in programas else 0
-        )
-        
         col1, col2 = st.columns(2)
         
         with col1:
@@ -376,63 +268,6 @@ def mostrar_inscripcion():
                 value=st.session_state.datos_inscripcion['telefono']
             )
         
-        st.markdown("""
-        <div style="margin: 2rem 0 1rem 0;">
-            <h4>Documentos Requeridos</h4>
-            <p>Sube los siguientes documentos en formato PDF:</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        documentos_requeridos = {
-            "Licenciatura": [
-                "Acta de nacimiento (PDF)",
-                "Certificado de bachillerato (PDF)",
-                "CURP (PDF)",
-                "Comprobante de domicilio (PDF)"
-            ],
-            "Especialidad": [
-                "Título profesional (PDF)",
-                "Cédula profesional (PDF)",
-                "CV actualizado (PDF)",
-                "Carta de motivos (PDF)"
-            ],
-            "Maestría": [
-                "Título de licenciatura (PDF)",
-                "CV actualizado (PDF)",
-                "Carta de exposición de motivos (PDF)",
-                "2 cartas de recomendación (PDF)"
-            ],
-            "Diplomado": [
-                "Identificación oficial (PDF)",
-                "Comprobante de estudios (PDF)",
-                "Carta de exposición de motivos (PDF)"
-            ]
-        }
-        
-        if "Licenciatura" in st.session_state.datos_inscripcion['programa']:
-            documentos = documentos_requeridos["Licenciatura"]
-        elif "Especialidad" in st.session_state.datos_inscripcion['programa']:
-            documentos = documentos_requeridos["Especialidad"]
-        elif "Maestría" in st.session_state.datos_inscripcion['programa']:
-            documentos = documentos_requeridos["Maestría"]
-        else:
-            documentos = documentos_requeridos["Diplomado"]
-        
-        documentos_subidos = []
-        for i, doc in enumerate(documentos):
-            archivo = st.file_uploader(
-                f"Subir {doc}",
-                type=['pdf'],
-                key=f"doc_{i}"
-            )
-            if archivo:
-                documentos_subidos.append({
-                    "nombre": doc,
-                    "archivo": archivo,
-                    "tamaño": archivo.size,
-                    "fecha": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-        
         col_btn1, col_btn2 = st.columns(2)
         
         with col_btn1:
@@ -452,6 +287,7 @@ def mostrar_inscripcion():
             elif not validar_email(st.session_state.datos_inscripcion['email']):
                 errores.append("Ingrese un correo electrónico válido")
             
+            documentos_subidos = {doc: st.session_state.datos_inscripcion['documentos'][doc] for doc in documentos if doc in st.session_state.datos_inscripcion['documentos']}
             if enviar and len(documentos_subidos) < len(documentos):
                 errores.append(f"Debe subir todos los documentos requeridos ({len(documentos)} en total)")
             
@@ -459,28 +295,55 @@ def mostrar_inscripcion():
                 for error in errores:
                     st.error(error)
             else:
-                st.session_state.datos_inscripcion['documentos'] = documentos_subidos
                 st.session_state.datos_inscripcion['fecha_inscripcion'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 
                 if enviar:
-                    st.success("¡Inscripción enviada con éxito!")
-                    st.balloons()
+                    try:
+                        st.session_state.datos_inscripcion['matricula'] = st.session_state.almacen_solicitudes.registrar(
+                            {**st.session_state.datos_inscripcion, 'documentos': documentos_subidos}
+                        )
+                    except Exception as e:
+                        st.error(f"No se pudo registrar la inscripción: {str(e)}")
+                    else:
+                        st.success("¡Inscripción enviada con éxito!")
+                        st.balloons()
                     
-                    st.markdown("### Resumen de tu inscripción")
-                    st.json({
-                        "Matrícula": st.session_state.datos_inscripcion['matricula'],
-                        "Programa": st.session_state.datos_inscripcion['programa'],
-                        "Nombre": st.session_state.datos_inscripcion['nombre_completo'],
-                        "Documentos_subidos": [doc['nombre'] for doc in st.session_state.datos_inscripcion['documentos']],
-                        "Fecha": st.session_state.datos_inscripcion['fecha_inscripcion']
-                    })
+                        resumen = {
+                            "Matrícula": st.session_state.datos_inscripcion['matricula'],
+                            "Programa": st.session_state.datos_inscripcion['programa'],
+                            "Nombre": st.session_state.datos_inscripcion['nombre_completo'],
+                            "Documentos_subidos": [doc for doc in documentos_subidos],
+                            "Fecha": st.session_state.datos_inscripcion['fecha_inscripcion']
+                        }
+                        st.markdown("### Resumen de tu inscripción")
+                        st.json(resumen)
                     
-                    st.download_button(
-                        label="📥 Descargar Comprobante",
-                        data=BytesIO(str(st.session_state.datos_inscripcion).encode()),
-                        file_name=f"comprobante_inscripcion_{st.session_state.datos_inscripcion['matricula']}.txt",
-                        mime="text/plain"
-                    )
+                        comprobante = {
+                            **resumen,
+                            "Documentos_subidos": [
+                                {
+                                    "documento": doc, "archivo": d['archivo'], "tamaño": d['tamano'], "sha256": d['hash'],
+                                    "pdf_valido": (st.session_state.almacen_documentos.validacion(d['hash']) or {}).get('valido')
+                                }
+                                for doc, d in documentos_subidos.items()
+                            ]
+                        }
+    
+    matricula = st.session_state.datos_inscripcion['matricula'] or "se asignará al enviar la inscripción"
+    encabezado_matricula.markdown(f"""
+    <div style="background-color: #e9f7ff; padding: 1rem; border-radius: 8px; margin-bottom: 1.5rem;">
+        <h4>Número de Matrícula: <strong>{matricula}</strong></h4>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Fuera del formulario: st.download_button no se permite dentro de st.form
+    if comprobante:
+        st.download_button(
+            label="📥 Descargar Comprobante",
+            data=json.dumps(comprobante, ensure_ascii=False, indent=2).encode("utf-8"),
+            file_name=f"comprobante_inscripcion_{st.session_state.datos_inscripcion['matricula']}.json",
+            mime="application/json"
+        )
 
 def mostrar_documentacion():
     st.markdown("""
@@ -490,48 +353,16 @@ def mostrar_documentacion():
     </div>
     """, unsafe_allow_html=True)
     
-    if 'datos_inscripcion' not in st.session_state or not st.session_state.datos_inscripcion['programa']:
+    programa = cargar_oferta().programa(st.session_state.get('datos_inscripcion', {}).get('programa_id'))
+    if programa is None:
         st.warning("Por favor completa primero tus datos personales en la sección de Inscripción")
         return
     
-    programas_docs = {
-        "Licenciatura en Enfermería": [
-            "Acta de nacimiento (original y copia)",
-            "Certificado de bachillerato (original y copia)",
-            "CURP (copia)",
-            "4 fotografías tamaño infantil"
-        ],
-        "Especialidad en Enfermería Cardiovascular": [
-            "Título profesional de licenciatura en enfermería (copia)",
-            "Cédula profesional (copia)",
-            "CV actualizado",
-            "Carta de motivos"
-        ],
-        "Diplomado en Cardiología": [
-            "Identificación oficial (copia)",
-            "Comprobante de estudios",
-            "Carta de exposición de motivos"
-        ]
-    }
-    
-    programa_actual = st.session_state.datos_inscripcion['programa']
-    documentos = programas_docs.get(programa_actual, [
-        "Identificación oficial (copia)",
-        "Comprobante de estudios",
-        "Comprobante de domicilio"
-    ])
-    
+    elementos = "".join(f"<li>{escape(doc)}</li>" for doc in programa.documentacion)
     st.markdown(f"""
     <div style="background-color: #f8f9fa; padding: 1.5rem; border-radius: 10px;">
-        <h4>Documentos requeridos para: <strong>{programa_actual}</strong></h4>
-        <ul style="margin-top: 1rem;">
-    """, unsafe_allow_html=True)
-    
-    for doc in documentos:
-        st.markdown(f"<li>{doc}</li>", unsafe_allow_html=True)
-    
-    st.markdown("""
-        </ul>
+        <h4>Documentos requeridos para: <strong>{escape(programa.nombre)}</strong></h4>
+        <ul style="margin-top: 1rem;">{elementos}</ul>
     </div>
     """, unsafe_allow_html=True)
     
@@ -550,51 +381,20 @@ def mostrar_pagos():
     </div>
     """, unsafe_allow_html=True)
     
-    if 'datos_inscripcion' not in st.session_state or not st.session_state.datos_inscripcion['programa']:
+    programa = cargar_oferta().programa(st.session_state.get('datos_inscripcion', {}).get('programa_id'))
+    if programa is None:
         st.warning("Por favor completa primero tus datos personales en la sección de Inscripción")
         return
     
-    programas_costos = {
-        "Licenciatura en Enfermería": {
-            "inscripción": "$2,500",
-            "mensualidad": "$3,800",
-            "duración": "8 semestres"
-        },
-        "Especialidad en Enfermería Cardiovascular": {
-            "inscripción": "$3,200",
-            "mensualidad": "$4,500",
-            "duración": "4 semestres"
-        },
-        "Diplomado en Cardiología": {
-            "inscripción": "$1,800",
-            "costo_total": "$8,500",
-            "duración": "6 meses"
-        }
-    }
-    
-    programa_actual = st.session_state.datos_inscripcion['programa']
-    costos = programas_costos.get(programa_actual, {
-        "inscripción": "$2,000",
-        "mensualidad": "$3,500",
-        "duración": "Consultar"
-    })
-    
+    filas = "".join(f"""
+        <div style="display: flex; justify-content: space-between; padding: 0.5rem 0; border-bottom: 1px solid #eee;">
+            <span style="font-weight: 500; text-transform: capitalize;">{escape(concepto)}:</span>
+            <span style="font-weight: 700;">{escape(monto)}</span>
+        </div>""" for concepto, monto in programa.costos.items())
     st.markdown(f"""
     <div style="background-color: #f8f9fa; padding: 1.5rem; border-radius: 10px;">
-        <h4>Costos para: <strong>{programa_actual}</strong></h4>
-        <div style="margin-top: 1rem;">
-    """, unsafe_allow_html=True)
-    
-    for key, value in costos.items():
-        st.markdown(f"""
-        <div style="display: flex; justify-content: space-between; padding: 0.5rem 0; border-bottom: 1px solid #eee;">
-            <span style="font-weight: 500; text-transform: capitalize;">{key}:</span>
-            <span style="font-weight: 700;">{value}</span>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown("""
-        </div>
+        <h4>Costos para: <strong>{escape(programa.nombre)}</strong></h4>
+        <div style="margin-top: 1rem;">{filas}</div>
     </div>
     """, unsafe_allow_html=True)
     
@@ -663,10 +463,130 @@ def mostrar_contacto():
             else:
                 st.success("Mensaje enviado correctamente. Nos pondremos en contacto contigo pronto.")
 
+def reiniciar_paginas():
+    st.session_state.cursores_revision = [None]
+
+def pagina_siguiente(cursor):
+    st.session_state.cursores_revision.append(cursor)
+
+def pagina_anterior():
+    st.session_state.cursores_revision.pop()
+
+def cambiar_estado(solicitud, anterior, nuevo):
+    """Callback de los botones de transición de la cola de revisión"""
+    revisor = st.session_state.get('revisor', '').strip()
+    if not revisor:
+        st.session_state.error_revision = "Indica tu nombre como revisor antes de cambiar estados"
+        return
+    try:
+        st.session_state.almacen_solicitudes.cambiar_estado(
+            solicitud, anterior, nuevo, revisor, st.session_state.get(f"nota_{solicitud}", "")
+        )
+    except Exception as e:
+        st.session_state.error_revision = str(e)
+
+def mostrar_solicitud(solicitud):
+    """Detalle de una solicitud con sus documentos, su historial y las transiciones posibles"""
+    almacen = st.session_state.almacen_solicitudes
+    datos = solicitud.get('datos') or almacen.por_matricula(solicitud['matricula'])['datos']
+    st.markdown(f"**{datos['nombre_completo']}** · {datos['programa']} · {datos['email']} · {datos.get('telefono', '')}")
+    for documento, metadatos in datos.get('documentos', {}).items():
+        validacion = abrir_almacen_documentos().validacion(metadatos['hash'])
+        estado = "⏳" if validacion is None else ("🟢" if validacion['valido'] else "⚠️")
+        st.caption(f"{estado} {documento}: {metadatos['archivo']} ({megas(metadatos['tamano'])})")
+    for cambio in almacen.historial(solicitud['id']):
+        st.caption(f"{cambio['fecha']} · {ESTADOS[cambio['nuevo']]} · {cambio['revisor']} {cambio['nota']}")
+
+    siguientes = TRANSICIONES[solicitud['estado']]
+    if siguientes:
+        st.text_input("Nota", key=f"nota_{solicitud['id']}")
+        for col, nuevo in zip(st.columns(len(siguientes)), siguientes):
+            col.button(
+                f"→ {ESTADOS[nuevo]}",
+                key=f"estado_{solicitud['id']}_{nuevo}",
+                on_click=cambiar_estado,
+                args=(solicitud['id'], solicitud['estado'], nuevo)
+            )
+
+def mostrar_revision():
+    """Cola de revisión del personal: filtros, búsqueda por índice y páginas por cursor"""
+    st.markdown("""
+    <div class="animate-fade">
+        <h2>Revisión de Solicitudes</h2>
+        <p>Solicitudes de inscripción recibidas, de la más antigua a la más reciente.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if 'almacen_solicitudes' not in st.session_state:
+        st.session_state.almacen_solicitudes = abrir_almacen_solicitudes()
+    if 'cursores_revision' not in st.session_state:
+        reiniciar_paginas()
+    almacen = st.session_state.almacen_solicitudes
+    
+    try:
+        conteo = almacen.conteo_estados()
+    except Exception as e:
+        st.error(f"No se pudieron leer las solicitudes: {str(e)}")
+        return
+    for col, (estado, etiqueta) in zip(st.columns(len(ESTADOS)), ESTADOS.items()):
+        col.metric(etiqueta, conteo[estado])
+    
+    error = st.session_state.pop('error_revision', None)
+    if error:
+        st.error(error)
+    
+    st.text_input("Revisor:", key="revisor")
+    busqueda = st.text_input("Buscar por matrícula o correo electrónico:").strip()
+    if busqueda:
+        if "@" not in busqueda and not es_valida(busqueda):
+            st.warning("La matrícula no tiene el formato MAT-AAAA-NNNNNN-D o su dígito verificador no cuadra")
+        encontradas = almacen.por_email(busqueda) if "@" in busqueda else [almacen.por_matricula(busqueda.upper())]
+        encontradas = [s for s in encontradas if s]
+        if not encontradas:
+            st.info("No hay solicitudes con ese dato")
+        for solicitud in encontradas:
+            with st.expander(f"{solicitud['matricula']} · {solicitud['nombre']} · {ESTADOS[solicitud['estado']]}", expanded=True):
+                mostrar_solicitud(solicitud)
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        estado = st.selectbox(
+            "Estado:", [""] + list(ESTADOS), format_func=lambda e: ESTADOS.get(e, "Todos"),
+            key="filtro_estado", on_change=reiniciar_paginas
+        )
+    with col2:
+        programa = st.selectbox(
+            "Programa:", [""] + almacen.programas(), format_func=lambda p: p or "Todos",
+            key="filtro_programa", on_change=reiniciar_paginas
+        )
+    
+    cursores = st.session_state.cursores_revision
+    solicitudes, siguiente = almacen.cola(estado, programa, cursores[-1])
+    if not solicitudes:
+        st.info("No hay solicitudes en esta vista")
+    for solicitud in solicitudes:
+        with st.expander(f"{solicitud['fecha']} · {solicitud['matricula']} · {solicitud['nombre']} · {ESTADOS[solicitud['estado']]}"):
+            mostrar_solicitud(solicitud)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Anterior", disabled=len(cursores) == 1, on_click=pagina_anterior)
+    with col2:
+        st.caption(f"Página {len(cursores)}")
+    with col3:
+        st.button("Siguiente ▶", disabled=siguiente is None, on_click=pagina_siguiente, args=(siguiente,))
+
 def main():
     configurar_pagina()
     cargar_estilos()
     
+    try:
+        cargar_oferta()
+    except Exception as e:
+        st.error(f"❌ No se pudo cargar la oferta educativa: {str(e)}")
+        st.stop()
+    
     if 'seccion_actual' not in st.session_state:
         st.session_state.seccion_actual = "Oferta Educativa"
     
@@ -678,9 +598,13 @@ def main():
         "Inscripción": mostrar_inscripcion,
         "Documentación": mostrar_documentacion,
         "Pagos": mostrar_pagos,
-        "Contacto": mostrar_contacto
+        "Contacto": mostrar_contacto,
+        "Revisión": mostrar_revision
     }
     
+    if st.session_state.seccion_actual == "Revisión" and not modo_personal():
+        st.session_state.seccion_actual = "Oferta Educativa"
+    
     opciones[st.session_state.seccion_actual]()
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Estado de cada valor, de menor a mayor severidad
+SIN_DATO = -1
+NORMAL = 0
+ANORMAL = 1
+CRITICO = 2
+IMPLAUSIBLE = 3
+
+NOMBRES_ESTADO = {
+    NORMAL: "normal",
+    ANORMAL: "fuera de referencia",
+    CRITICO: "crítico",
+    IMPLAUSIBLE: "implausible"
+}
+
+def _limite(valor, defecto):
+    return defecto if valor is None else float(valor)
+
+class ReglasLaboratorio:
+    """Rangos de referencia, críticos y de plausibilidad de cada analito como arreglos NumPy.
+
+    Cada analito es una columna; un reporte es una fila. Evaluar un reporte o
+    miles de reportes históricos es la misma operación vectorizada sobre una
+    matriz (reportes × analitos) con NaN donde no hay dato. La plausibilidad
+    usa los límites de captura del formulario (min_value/max_value).
+    """
+
+    def __init__(self, laboratorios):
+        campos = [campo for examen in laboratorios for campo in examen["campos"]]
+        self.claves = tuple(c["clave"] for c in campos)
+        self.etiquetas = tuple(c["etiqueta"] for c in campos)
+        self.indice = {clave: i for i, clave in enumerate(self.claves)}
+
+        def columna(nombre, posicion, defecto):
+            return np.array([_limite(c[nombre][posicion], defecto) for c in campos])
+
+        self.referencia_min = columna("referencia", 0, -np.inf)
+        self.referencia_max = columna("referencia", 1, np.inf)
+        self.critico_min = columna("critico", 0, -np.inf)
+        self.critico_max = columna("critico", 1, np.inf)
+        self.plausible_min = np.array([_limite(c["parametros"].get("min_value"), -np.inf) for c in campos])
+        self.plausible_max = np.array([_limite(c["parametros"].get("max_value"), np.inf) for c in campos])
+
+    def matriz(self, reportes):
+        """Matriz de valores a partir de una secuencia de {clave: valor}"""
+        datos = np.full((len(reportes), len(self.claves)), np.nan)
+        for fila, valores in enumerate(reportes):
+            for clave, valor in valores.items():
+                columna = self.indice.get(clave)
+                if columna is not None and isinstance(valor, (int, float)):
+                    datos[fila, columna] = valor
+        return datos
+
+    def puntuar(self, datos):
+        """Estado de cada celda de la matriz en una sola pasada"""
+        datos = np.asarray(datos, dtype=float)
+        estados = np.full(datos.shape, SIN_DATO, dtype=np.int8)
+        with np.errstate(invalid="ignore"):
+            estados[~np.isnan(datos)] = NORMAL
+            estados[(datos < self.referencia_min) | (datos > self.referencia_max)] = ANORMAL
+            estados[(datos < self.critico_min) | (datos > self.critico_max)] = CRITICO
+            estados[(datos < self.plausible_min) | (datos > self.plausible_max)] = IMPLAUSIBLE
+        return estados
+
+    def evaluar(self, valores):
+        """Hallazgos de un reporte: los valores fuera de referencia, críticos o implausibles"""
+        datos = self.matriz([valores])
+        estados = self.puntuar(datos)[0]
+        hallazgos = []
+        for columna in np.flatnonzero(estados > NORMAL):
+            hallazgos.append({
+                "clave": self.claves[columna],
+                "etiqueta": self.etiquetas[columna],
+                "valor": float(datos[0, columna]),
+                "estado": NOMBRES_ESTADO[int(estados[columna])],
+                "referencia": [float(self.referencia_min[columna]), float(self.referencia_max[columna])]
+            })
+        return hallazgos
+
+    def resumen(self, estados):
+        """Conteo por analito de valores medidos, fuera de referencia, críticos e implausibles"""
+        return {
+            "analito": self.etiquetas,
+            "medidos": (estados >= NORMAL).sum(axis=0),
+            "fuera de referencia": (estados == ANORMAL).sum(axis=0),
+            "críticos": (estados == CRITICO).sum(axis=0),
+            "implausibles": (estados == IMPLAUSIBLE).sum(axis=0),
+            "reportes con crítico": int((estados == CRITICO).any(axis=1).sum())
+        }
+
+if __name__ == "__main__":
+    # Rendimiento de la puntuación por lotes: python evaluacion_lab.py [reportes]
+    import json
+    import os
+    import sys
+    import time
+
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogos", "eventos2.json")
+    with open(ruta, encoding="utf-8") as f:
+        reglas = ReglasLaboratorio(json.load(f)["laboratorios"])
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    generador = np.random.default_rng(0)
+    centro = np.where(np.isfinite(reglas.referencia_max), (reglas.referencia_min + reglas.referencia_max) / 2, reglas.referencia_min)
+    datos = generador.normal(centro, np.abs(centro) * 0.4 + 0.01, size=(n, len(reglas.claves)))
+    datos[generador.random(datos.shape) < 0.6] = np.nan
+
+    reglas.puntuar(datos[:100])
+    inicio = time.perf_counter()
+    estados = reglas.puntuar(datos)
+    resumen = reglas.resumen(estados)
+    segundos = time.perf_counter() - inicio
+    print(f"{n} reportes × {len(reglas.claves)} analitos en {segundos * 1000:.1f} ms "
+          f"({n / segundos:,.0f} reportes/s); {resumen['reportes con crítico']} con algún crítico")
+
+    muestra = [dict(zip(reglas.claves, fila)) for fila in datos[:1000]]
+    inicio = time.perf_counter()
+    for valores in muestra:
+        reglas.evaluar({k: v for k, v in valores.items() if not np.isnan(v)})
+    print(f"Evaluación individual: {(time.perf_counter() - inicio) / len(muestra) * 1e6:.0f} µs por reporte")
@@ -1,9 +1,17 @@
 import streamlit as st
-from datetime import datetime, time
+from datetime import date, datetime, timedelta
 import pandas as pd
-import os
-from PIL import Image
-import tempfile
+import copy
+import functools
+import uuid
+from dataclasses import asdict
+from reporte import BorradorReporte, Medicamento
+from almacen_reportes import abrir_almacen
+import exportacion
+from exportacion import DIRECTORIO_EXPORTACION
+from indicadores import DIMENSIONES, VENTANA_DIAS
+from catalogos import cargar_catalogos
+from evidencia import abrir_almacen_evidencia
 
 def setup_page():
     """Configura la página de Streamlit"""
@@ -14,596 +22,653 @@ def setup_page():
     )
     st.title("❤️‍🩹 Reporte de Eventos Adversos y Graves")
 
+# Prefijos de las claves de los widgets del formulario
+PREFIJOS_WIDGETS = ("ctx_", "cla_", "fac_", "pac_", "lab_", "med_", "man_", "evi_", "def_", "val_", "num_medicamentos")
+
+def initialize_session_state():
+    """Inicializa el borrador del reporte y la sección activa.
+
+    El identificador del borrador viaja en la URL, así que tras recargar la
+    página o perder la sesión el borrador se recupera del almacén local.
+    """
+    try:
+        cargar_catalogos()
+    except Exception as e:
+        st.error(f"❌ No se pudieron cargar los catálogos del formulario: {str(e)}")
+        st.stop()
+
+    if 'almacen' not in st.session_state:
+        st.session_state.almacen = abrir_almacen()
+        st.session_state.almacen_evidencia = abrir_almacen_evidencia()
+
+    if 'borrador' not in st.session_state:
+        id_borrador = st.query_params.get("borrador")
+        campos = st.session_state.almacen.cargar_campos(id_borrador) if id_borrador else {}
+        if campos:
+            st.session_state.id_borrador = id_borrador
+            st.session_state.borrador = BorradorReporte.desde_campos(campos)
+            st.session_state.borrador_guardado = copy.deepcopy(st.session_state.borrador.campos())
+            st.toast("Borrador recuperado", icon="💾")
+        else:
+            nuevo_borrador()
+
+    if 'seccion_activa' not in st.session_state:
+        st.session_state.seccion_activa = list(SECCIONES)[0]
+
+def nuevo_borrador():
+    """Empieza un borrador vacío con un identificador nuevo"""
+    st.session_state.id_borrador = uuid.uuid4().hex
+    st.query_params["borrador"] = st.session_state.id_borrador
+    st.session_state.borrador = BorradorReporte()
+    st.session_state.borrador_guardado = copy.deepcopy(st.session_state.borrador.campos())
+    for clave in list(st.session_state.keys()):
+        if clave.startswith(PREFIJOS_WIDGETS):
+            del st.session_state[clave]
+
+def autoguardar_borrador():
+    """Guarda en el almacén local solo los campos que cambiaron desde el último guardado"""
+    campos = st.session_state.borrador.campos()
+    guardado = st.session_state.borrador_guardado
+    cambios = {clave: valor for clave, valor in campos.items() if guardado.get(clave) != valor}
+    if cambios:
+        try:
+            st.session_state.almacen.guardar_campos(st.session_state.id_borrador, cambios)
+        except Exception as e:
+            st.warning(f"No se pudo autoguardar el borrador: {str(e)}")
+            return
+        guardado.update(copy.deepcopy(cambios))
+
+def seccion(funcion):
+    """Sección del formulario: fragmento que autoguarda el borrador al terminar"""
+    @st.fragment
+    @functools.wraps(funcion)
+    def envoltura():
+        funcion()
+        autoguardar_borrador()
+    return envoltura
+
+def sembrar(clave, valor, opciones=None):
+    """Inicializa un widget con el valor del borrador cuando vuelve a dibujarse.
+
+    Streamlit descarta el estado de los widgets de las secciones que no se
+    dibujan; el borrador conserva los valores y los repone al volver.
+    """
+    if opciones is not None and valor not in opciones:
+        valor = opciones[0]
+    if clave not in st.session_state or (opciones is not None and st.session_state[clave] not in opciones):
+        st.session_state[clave] = valor
+
+@seccion
 def show_event_context():
     """Muestra la sección de contexto del evento"""
-    with st.expander("📌 Contexto del Evento", expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            fecha_evento = st.date_input("📅 Fecha del evento", datetime.today())
-            turno = st.radio("🕒 Turno", [
-                "Matutino (6:00-14:00)", 
-                "Vespertino (14:00-22:00)", 
-                "Nocturno (22:00-6:00)"
-            ], horizontal=True)
-        with col2:
-            ubicacion = st.selectbox("🏥 Área donde ocurrió", [
-                "UCIC (Unidad Coronaria)", 
-                "UCIN (Unidad Cardíaca Intensiva Neonatal)", 
-                "Hemodinamia", 
-                "Quirófano Cardiovascular", 
-                "Hospitalización Cardiológica", 
-                "Urgencias Cardiológicas"
-            ])
-            procedimiento_asociado = st.selectbox("🩺 Procedimiento relacionado (si aplica)", [
-                "",
-                "Cateterismo Cardiaco",
-                "Angioplastia/Stent",
-                "Ablación",
-                "Implante de Marcapasos/DAI",
-                "Cirugía de Bypass",
-                "Valvuloplastía",
-                "ECMO",
-                "Otro"
-            ])
-    return {
-        "fecha_evento": fecha_evento,
-        "turno": turno,
-        "ubicacion": ubicacion,
-        "procedimiento_asociado": procedimiento_asociado
-    }
+    contexto = st.session_state.borrador.contexto
+    catalogo = cargar_catalogos()
+    col1, col2 = st.columns(2)
+    with col1:
+        sembrar("ctx_fecha_evento", contexto.fecha_evento)
+        contexto.fecha_evento = st.date_input("📅 Fecha del evento", key="ctx_fecha_evento")
+        sembrar("ctx_turno", contexto.turno, catalogo.turnos)
+        contexto.turno = st.radio("🕒 Turno", catalogo.turnos, horizontal=True, key="ctx_turno")
+    with col2:
+        sembrar("ctx_ubicacion", contexto.ubicacion, catalogo.ubicaciones)
+        contexto.ubicacion = st.selectbox("🏥 Área donde ocurrió", catalogo.ubicaciones, key="ctx_ubicacion")
+        sembrar("ctx_procedimiento", contexto.procedimiento_asociado, catalogo.procedimientos)
+        contexto.procedimiento_asociado = st.selectbox("🩺 Procedimiento relacionado (si aplica)", catalogo.procedimientos, key="ctx_procedimiento")
 
+@seccion
 def show_event_classification():
     """Muestra la clasificación del evento grave o adverso"""
-    with st.expander("⚠️ Clasificación del Evento Grave o  Adverso", expanded=True):
-        categoria_principal = st.selectbox("🔍 Tipo principal de evento", [
-            "",
-            "Complicación Isquémica",
-            "Arritmia",  
-            "Complicación Hemodinámica",
-            "Complicación Vascular",
-            "Evento Tromboembólico",  
-            "Reacción a Medios de Contraste",
-            "Infección Asociada",
-            "Falla de Equipo Crítico",
-            "Error en Medicación Cardiovascular"
-        ])
+    clasificacion = st.session_state.borrador.clasificacion
+    catalogo = cargar_catalogos()
+    sembrar("cla_categoria", clasificacion.categoria_principal, catalogo.categorias)
+    clasificacion.categoria_principal = st.selectbox("🔍 Tipo principal de evento", catalogo.categorias, key="cla_categoria")
 
-        subcategorias_cardio = {
-            "Complicación Isquémica": [
-                "Reinfarto post-procedimiento",
-                "Oclusión aguda de stent",
-                "Espasmo coronario",
-                "Disección coronaria"
-            ],
-            "Arritmia": [
-                "Fibrilación Ventricular",
-                "Taquicardia Ventricular Sostenida",
-                "Bradiarritmia severa",
-                "Bloqueo AV completo"
-            ],
-            "Complicación Hemodinámica": [
-                "Shock cardiogénico",
-                "Taponamiento cardíaco",
-                "Insuficiencia cardíaca aguda",
-                "Hipotensión refractaria"
-            ],
-            "Complicación Vascular": [
-                "Hematoma acceso vascular",
-                "Pseudoaneurisma",
-                "Fístula arteriovenosa",
-                "Isquemia distal"
-            ],
-            "Evento Tromboembólico": [
-                "Trombosis de stent",
-                "Embolismo coronario",
-                "Accidente cerebrovascular",
-                "Tromboembolismo pulmonar"
-            ],
-            "Reacción a Medios de Contraste": [
-                "Nefropatía por contraste",
-                "Reacción alérgica leve",
-                "Reacción anafiláctica",
-                "Extravasación de contraste"
-            ],
-            "Infección Asociada": [
-                "Infección sitio acceso vascular",
-                "Endocarditis post-procedimiento",
-                "Sepsis relacionada a catéter",
-                "Infección de herida quirúrgica"
-            ],
-            "Falla de Equipo Crítico": [
-                "Falla de balón intra-aórtico",
-                "Malfunción de marcapasos",
-                "Problemas con ECMO",
-                "Falla en equipo de hemodinamia"
-            ],
-            "Error en Medicación Cardiovascular": [
-                "Sobredosis de anticoagulante",
-                "Error en trombolíticos",
-                "Administración incorrecta de antiarrítmicos",
-                "Omisión de medicación crítica"
-            ]
-        }
-
-        subcategoria = ""
-        if categoria_principal in subcategorias_cardio:
-            subcategoria = st.selectbox("📌 Subcategoría específica", [""] + subcategorias_cardio[categoria_principal])
-
-        col1, col2 = st.columns(2)
-        with col1:
-            escala_grace = st.radio("📊 Gravedad (Adaptado a ESC Guidelines)", [
-                "Bajo riesgo (sin repercusión hemodinámica)",
-                "Intermedio (requirió intervención no planificada)",
-                "Alto riesgo (daño orgánico permanente)",
-                "Crítico (muerte o ECMO requerido)"
-            ])
-        with col2:
-            detectado_en = st.radio("🔎 ¿Cuándo se detectó?", [
-                "Antes del procedimiento",
-                "Durante el procedimiento",
-                "Inmediatamente después",
-                "Tardíamente (fuera de área crítica)"
-            ])
-    
-    return {
-        "categoria_principal": categoria_principal,
-        "subcategoria": subcategoria,
-        "escala_grace": escala_grace,
-        "detectado_en": detectado_en
-    }
+    if clasificacion.categoria_principal in catalogo.subcategorias:
+        subcategorias = catalogo.subcategorias[clasificacion.categoria_principal]
+        sembrar("cla_subcategoria", clasificacion.subcategoria, subcategorias)
+        clasificacion.subcategoria = st.selectbox("📌 Subcategoría específica", subcategorias, key="cla_subcategoria")
+    else:
+        clasificacion.subcategoria = ""
 
+    col1, col2 = st.columns(2)
+    with col1:
+        sembrar("cla_escala_grace", clasificacion.escala_grace, catalogo.escalas_grace)
+        clasificacion.escala_grace = st.radio("📊 Gravedad (Adaptado a ESC Guidelines)", catalogo.escalas_grace, key="cla_escala_grace")
+    with col2:
+        sembrar("cla_detectado_en", clasificacion.detectado_en, catalogo.momentos_deteccion)
+        clasificacion.detectado_en = st.radio("🔎 ¿Cuándo se detectó?", catalogo.momentos_deteccion, key="cla_detectado_en")
+
+@seccion
 def show_contributing_factors():
     """Muestra los factores contribuyentes"""
-    with st.expander("🔎 Factores Contribuyentes", expanded=False):
-        cols = st.columns(3)
-        factores = {}
-        with cols[0]:
-            st.markdown("**Factores del Paciente**")
-            factores["comorbilidad"] = st.checkbox("Comorbilidades complejas")
-            factores["anatomia"] = st.checkbox("Anatomía desfavorable")
-            factores["urgencia"] = st.checkbox("Procedimiento urgente")
-        
-        with cols[1]:
-            st.markdown("**Factores Técnicos**")
-            factores["equipo"] = st.checkbox("Falla de equipo")
-            factores["imagen"] = st.checkbox("Imagen intraprocedimiento no óptima")
-            factores["acceso"] = st.checkbox("Dificultad en acceso vascular")
-        
-        with cols[2]:
-            st.markdown("**Factores Humanos**")
-            factores["experiencia"] = st.checkbox("Experiencia insuficiente del operador")
-            factores["comunicacion"] = st.checkbox("Comunicación equipo-paciente")
-            factores["fatiga"] = st.checkbox("Fatiga del personal")
-    
-    return factores
+    factores = st.session_state.borrador.factores
+    grupos = [
+        ("**Factores del Paciente**", [
+            ("comorbilidad", "Comorbilidades complejas"),
+            ("anatomia", "Anatomía desfavorable"),
+            ("urgencia", "Procedimiento urgente")
+        ]),
+        ("**Factores Técnicos**", [
+            ("equipo", "Falla de equipo"),
+            ("imagen", "Imagen intraprocedimiento no óptima"),
+            ("acceso", "Dificultad en acceso vascular")
+        ]),
+        ("**Factores Humanos**", [
+            ("experiencia", "Experiencia insuficiente del operador"),
+            ("comunicacion", "Comunicación equipo-paciente"),
+            ("fatiga", "Fatiga del personal")
+        ])
+    ]
+    cols = st.columns(3)
+    for col, (titulo, campos) in zip(cols, grupos):
+        with col:
+            st.markdown(titulo)
+            for campo, etiqueta in campos:
+                sembrar(f"fac_{campo}", getattr(factores, campo))
+                setattr(factores, campo, st.checkbox(etiqueta, key=f"fac_{campo}"))
 
+@seccion
 def show_patient_data():
     """Muestra los datos del paciente"""
-    with st.expander("👨‍⚕️ Datos del Paciente", expanded=False):
-        cols = st.columns(2)
-        paciente_data = {}
-        with cols[0]:
-            paciente_data["nombre_completo"] = st.text_input("Nombre completo del paciente")
-            paciente_data["edad"] = st.selectbox("Edad", ["", "<40", "40-65", ">65"])
-            paciente_data["imc"] = st.selectbox("IMC", ["", "<25 (Normal)", "25-30 (Sobrepeso)", ">30 (Obeso)"])
-        with cols[1]:
-            paciente_data["numero_cama"] = st.text_input("Número de cama")
-            paciente_data["riesgo_previo"] = st.selectbox("Riesgo pre-procedimiento", [
-                "",
-                "Bajo (0-2%)",
-                "Intermedio (3-5%)",
-                "Alto (>5%)"
-            ])
-    return paciente_data
+    paciente = st.session_state.borrador.paciente
+    catalogo = cargar_catalogos()
+    cols = st.columns(2)
+    with cols[0]:
+        sembrar("pac_nombre_completo", paciente.nombre_completo)
+        paciente.nombre_completo = st.text_input("Nombre completo del paciente", key="pac_nombre_completo")
+        sembrar("pac_edad", paciente.edad, catalogo.edades)
+        paciente.edad = st.selectbox("Edad", catalogo.edades, key="pac_edad")
+        sembrar("pac_imc", paciente.imc, catalogo.imcs)
+        paciente.imc = st.selectbox("IMC", catalogo.imcs, key="pac_imc")
+    with cols[1]:
+        sembrar("pac_numero_cama", paciente.numero_cama)
+        paciente.numero_cama = st.text_input("Número de cama", key="pac_numero_cama")
+        sembrar("pac_riesgo_previo", paciente.riesgo_previo, catalogo.riesgos)
+        paciente.riesgo_previo = st.selectbox("Riesgo pre-procedimiento", catalogo.riesgos, key="pac_riesgo_previo")
 
+@seccion
 def show_lab_results():
     """Muestra los resultados de laboratorio"""
-    with st.expander("🧪 Resultados de Laboratorio", expanded=False):
-        lab_data = {}
-        
-        examenes_solicitados = st.multiselect("Seleccione los exámenes solicitados:", [
-            "Glucosa",
-            "Troponina",
-            "Sodio",
-            "Potasio",
-            "Creatinina",
-            "BNP",
-            "pH arterial",
-            "Lactato",
-            "Gases arteriales",
-            "Hemograma completo",
-            "Pruebas de coagulación"
-        ])
-        
-        lab_data["examenes_solicitados"] = examenes_solicitados
-        
-        if "Glucosa" in examenes_solicitados:
-            lab_data["glucosa"] = st.number_input("Glucosa (mg/dL)", min_value=0, max_value=1000, value=90)
-        
-        if "Troponina" in examenes_solicitados:
-            lab_data["troponina"] = st.number_input("Troponina (ng/mL)", min_value=0.0, max_value=100.0, value=0.01, step=0.01, format="%.2f")
-        
-        if "Sodio" in examenes_solicitados:
-            lab_data["sodio"] = st.number_input("Sodio (mEq/L)", min_value=100, max_value=200, value=140)
-        
-        if "Potasio" in examenes_solicitados:
-            lab_data["potasio"] = st.number_input("Potasio (mEq/L)", min_value=1.0, max_value=10.0, value=4.0, step=0.1, format="%.1f")
-        
-        if "Creatinina" in examenes_solicitados:
-            lab_data["creatinina"] = st.number_input("Creatinina (mg/dL)", min_value=0.1, max_value=20.0, value=0.8, step=0.1, format="%.1f")
-        
-        if "BNP" in examenes_solicitados:
-            lab_data["bnp"] = st.number_input("BNP (pg/mL)", min_value=0, max_value=5000, value=100)
-        
-        if "pH arterial" in examenes_solicitados:
-            lab_data["ph"] = st.number_input("pH arterial", min_value=6.5, max_value=8.0, value=7.4, step=0.01, format="%.2f")
-        
-        if "Lactato" in examenes_solicitados:
-            lab_data["lactato"] = st.number_input("Lactato (mmol/L)", min_value=0.0, max_value=20.0, value=1.0, step=0.1, format="%.1f")
-        
-        if "Gases arteriales" in examenes_solicitados:
-            st.markdown("**Gases Arteriales**")
-            gas_cols = st.columns(3)
-            with gas_cols[0]:
-                lab_data["pao2"] = st.number_input("PaO₂ (mmHg)", min_value=20, max_value=600, value=80)
-            with gas_cols[1]:
-                lab_data["paco2"] = st.number_input("PaCO₂ (mmHg)", min_value=10, max_value=150, value=40)
-            with gas_cols[2]:
-                lab_data["sao2"] = st.number_input("SaO₂ (%)", min_value=50, max_value=100, value=98)
-        
-        if "Hemograma completo" in examenes_solicitados:
-            st.markdown("**Hemograma**")
-            hemo_cols = st.columns(3)
-            with hemo_cols[0]:
-                lab_data["hb"] = st.number_input("Hemoglobina (g/dL)", min_value=3.0, max_value=25.0, value=12.0, step=0.1, format="%.1f")
-            with hemo_cols[1]:
-                lab_data["hto"] = st.number_input("Hematocrito (%)", min_value=10, max_value=80, value=36)
-            with hemo_cols[2]:
-                lab_data["plaquetas"] = st.number_input("Plaquetas (x10³/μL)", min_value=10, max_value=1000, value=200)
-        
-        if "Pruebas de coagulación" in examenes_solicitados:
-            st.markdown("**Coagulación**")
-            coag_cols = st.columns(3)
-            with coag_cols[0]:
-                lab_data["tp"] = st.number_input("TP (seg)", min_value=5, max_value=100, value=12)
-            with coag_cols[1]:
-                lab_data["inr"] = st.number_input("INR", min_value=0.5, max_value=10.0, value=1.0, step=0.1, format="%.1f")
-            with coag_cols[2]:
-                lab_data["ttpa"] = st.number_input("TTPa (seg)", min_value=20, max_value=200, value=30)
-    
-    return lab_data
+    laboratorio = st.session_state.borrador.laboratorio
+    catalogo = cargar_catalogos()
+    sembrar("lab_examenes", laboratorio.examenes_solicitados)
+    laboratorio.examenes_solicitados = st.multiselect("Seleccione los exámenes solicitados:", catalogo.examenes, key="lab_examenes")
+
+    valores = {}
+    for examen in laboratorio.examenes_solicitados:
+        titulo, campos = catalogo.laboratorios[examen]
+        if titulo:
+            st.markdown(titulo)
+        columnas = st.columns(len(campos)) if titulo else [st.container()]
+        for columna, (clave, etiqueta, inicial, parametros) in zip(columnas, campos):
+            with columna:
+                sembrar(f"lab_{clave}", laboratorio.valores.get(clave, inicial))
+                valores[clave] = st.number_input(etiqueta, key=f"lab_{clave}", **parametros)
+    laboratorio.valores = valores
+    show_lab_findings(catalogo.reglas_laboratorio.evaluar(valores))
+
+def show_lab_findings(hallazgos):
+    """Señala los valores críticos, implausibles o fuera de referencia"""
+    for hallazgo in hallazgos:
+        referencia = "–".join(f"{v:g}" for v in hallazgo["referencia"])
+        texto = f"{hallazgo['etiqueta']}: {hallazgo['valor']:g} ({hallazgo['estado']}; referencia {referencia})"
+        if hallazgo["estado"] in ("crítico", "implausible"):
+            st.warning(f"⚠️ {texto}")
+        else:
+            st.caption(f"↕️ {texto}")
 
+def sembrar_con_otro(clave, clave_otro, valor, opciones, otro):
+    """Siembra un selector con opción libre: un valor fuera de catálogo va al campo 'otro'"""
+    if valor and valor not in opciones:
+        sembrar(clave, otro, opciones)
+        sembrar(clave_otro, valor)
+    else:
+        sembrar(clave, valor, opciones)
+
+def show_medication_block(i, medicamento, catalogo):
+    """Widgets de un medicamento; escribe los valores en su entrada del borrador"""
+    st.markdown(f"### Medicamento {i+1}")
+    cols = st.columns([2, 1, 1, 1])
+
+    with cols[0]:
+        sembrar_con_otro(f"med_{i}_nombre", f"med_{i}_otro", medicamento.nombre, catalogo.medicamentos, "Otro")
+        nombre = st.selectbox(f"Nombre del medicamento {i+1}", catalogo.medicamentos, key=f"med_{i}_nombre")
+        if nombre == "Otro":
+            nombre = st.text_input(f"Especificar otro medicamento {i+1}", key=f"med_{i}_otro")
+        medicamento.nombre = nombre
+
+    with cols[1]:
+        opciones_dosis = catalogo.dosis(nombre)
+        sembrar_con_otro(f"med_{i}_dosis", f"med_{i}_otra_dosis", medicamento.dosis, opciones_dosis, "Otra dosis")
+        dosis = st.selectbox(f"Dosis {i+1}", opciones_dosis, key=f"med_{i}_dosis")
+        if dosis == "Otra dosis":
+            dosis = st.text_input(f"Especificar otra dosis {i+1}", key=f"med_{i}_otra_dosis")
+        medicamento.dosis = dosis
+
+    with cols[2]:
+        sembrar(f"med_{i}_unidad", medicamento.unidad, catalogo.unidades)
+        medicamento.unidad = st.selectbox(f"Unidad {i+1}", catalogo.unidades, key=f"med_{i}_unidad")
+
+    with cols[3]:
+        sembrar(f"med_{i}_via", medicamento.via, catalogo.vias)
+        medicamento.via = st.selectbox(f"Vía {i+1}", catalogo.vias, key=f"med_{i}_via")
+
+    sembrar(f"med_{i}_error", medicamento.error)
+    medicamento.error = st.checkbox(f"¿Hubo error en la administración de este medicamento? {i+1}", key=f"med_{i}_error")
+
+    if medicamento.error:
+        sembrar(f"med_{i}_tipo_error", medicamento.tipo_error, catalogo.tipos_error)
+        medicamento.tipo_error = st.selectbox(f"Tipo de error {i+1}", catalogo.tipos_error, key=f"med_{i}_tipo_error")
+
+    st.markdown("---")
+
+@seccion
 def show_medication_section():
     """Muestra la sección de medicamentos y dosis"""
-    with st.expander("💊 Medicamentos Involucrados", expanded=False):
-        medicamentos = []
-        
-        st.markdown("**Añadir medicamentos relacionados con el evento grave o adverso**")
-        
-        num_medicamentos = st.number_input("Número de medicamentos a registrar", min_value=1, max_value=10, value=1)
-        
-        for i in range(num_medicamentos):
-            with st.container():
-                st.markdown(f"### Medicamento {i+1}")
-                cols = st.columns([2, 1, 1, 1])
-                
-                with cols[0]:
-                    nombre = st.selectbox(f"Nombre del medicamento {i+1}", [
-                        "",
-                        "Heparina",
-                        "Aspirina",
-                        "Clopidogrel",
-                        "Ticagrelor",
-                        "Enoxaparina",
-                        "Furosemida",
-                        "Amiodarona",
-                        "Dobutamina",
-                        "Noradrenalina",
-                        "Midazolam",
-                        "Otro"
-                    ], key=f"med_{i}_nombre")
-                    
-                    if nombre == "Otro":
-                        nombre = st.text_input(f"Especificar otro medicamento {i+1}", key=f"med_{i}_otro")
-                
-                with cols[1]:
-                    if nombre == "Heparina":
-                        dosis = st.selectbox(f"Dosis {i+1}", [
-                            "",
-                            "5000 UI",
-                            "2500 UI",
-                            "1000 UI",
-                            "80 UI/kg",
-                            "60 UI/kg",
-                            "Otra dosis"
-                        ], key=f"med_{i}_dosis")
-                    elif nombre == "Enoxaparina":
-                        dosis = st.selectbox(f"Dosis {i+1}", [
-                            "",
-                            "40 mg",
-                            "60 mg",
-                            "80 mg",
-                            "1 mg/kg",
-                            "1.5 mg/kg",
-                            "Otra dosis"
-                        ], key=f"med_{i}_dosis")
-                    elif nombre == "Amiodarona":
-                        dosis = st.selectbox(f"Dosis {i+1}", [
-                            "",
-                            "150 mg",
-                            "300 mg",
-                            "5 mg/kg",
-                            "Otra dosis"
-                        ], key=f"med_{i}_dosis")
-                    elif nombre == "Noradrenalina":
-                        dosis = st.selectbox(f"Dosis {i+1}", [
-                            "",
-                            "0.05 mcg/kg/min",
-                            "0.1 mcg/kg/min",
-                            "0.2 mcg/kg/min",
-                            "0.5 mcg/kg/min",
-                            "Otra dosis"
-                        ], key=f"med_{i}_dosis")
-                    else:
-                        dosis = st.selectbox(f"Dosis {i+1}", [
-                            "",
-                            "5 mg",
-                            "10 mg",
-                            "25 mg",
-                            "50 mg",
-                            "75 mg",
-                            "100 mg",
-                            "Otra dosis"
-                        ], key=f"med_{i}_dosis")
-                    
-                    if dosis == "Otra dosis":
-                        dosis = st.text_input(f"Especificar otra dosis {i+1}", key=f"med_{i}_otra_dosis")
-                
-                with cols[2]:
-                    unidad = st.selectbox(f"Unidad {i+1}", [
-                        "mg",
-                        "UI",
-                        "mcg",
-                        "ml",
-                        "mg/kg",
-                        "UI/kg",
-                        "mcg/kg",
-                        "mcg/kg/min"
-                    ], key=f"med_{i}_unidad")
-                
-                with cols[3]:
-                    via = st.selectbox(f"Vía {i+1}", [
-                        "EV",
-                        "Oral",
-                        "SC",
-                        "Intraarterial",
-                        "Intracoronaria",
-                        "Inhalatoria"
-                    ], key=f"med_{i}_via")
-                
-                error_med = st.checkbox(f"¿Hubo error en la administración de este medicamento? {i+1}", key=f"med_{i}_error")
-                
-                if error_med:
-                    tipo_error = st.selectbox(f"Tipo de error {i+1}", [
-                        "",
-                        "Dosis incorrecta",
-                        "Medicamento equivocado",
-                        "Vía incorrecta",
-                        "Paciente equivocado",
-                        "Omisión de dosis",
-                        "Velocidad de infusión incorrecta"
-                    ], key=f"med_{i}_tipo_error")
-                    
-                    medicamentos.append({
-                        "nombre": nombre,
-                        "dosis": dosis,
-                        "unidad": unidad,
-                        "via": via,
-                        "error": True,
-                        "tipo_error": tipo_error
-                    })
-                else:
-                    medicamentos.append({
-                        "nombre": nombre,
-                        "dosis": dosis,
-                        "unidad": unidad,
-                        "via": via,
-                        "error": False
-                    })
-                
-                st.markdown("---")
-    
-    return medicamentos
+    medicamentos = st.session_state.borrador.medicamentos
+    catalogo = cargar_catalogos()
+    st.markdown("**Añadir medicamentos relacionados con el evento grave o adverso**")
+
+    sembrar("num_medicamentos", len(medicamentos))
+    num_medicamentos = st.number_input("Número de medicamentos a registrar", min_value=1, max_value=10, key="num_medicamentos")
+    del medicamentos[num_medicamentos:]
+    medicamentos.extend(Medicamento() for _ in range(num_medicamentos - len(medicamentos)))
+
+    for i, medicamento in enumerate(medicamentos):
+        with st.container():
+            show_medication_block(i, medicamento, catalogo)
 
+    show_medication_alerts(catalogo.verificador_medicamentos.verificar([asdict(m) for m in medicamentos]))
+
+def show_medication_alerts(alertas):
+    """Muestra dosis máximas superadas, interacciones y dosis con unidad dudosa"""
+    for alerta in alertas:
+        if alerta["severidad"] == "grave":
+            st.error(f"⛔ {alerta['descripcion']}")
+        elif alerta["severidad"] == "moderada":
+            st.warning(f"⚠️ {' + '.join(alerta['medicamentos'])}: {alerta['descripcion']}")
+        else:
+            st.caption(f"ℹ️ {alerta['descripcion']}")
+
+@seccion
 def show_management_section():
     """Muestra la sección de manejo del evento"""
-    with st.expander("🚑 Manejo del Evento", expanded=False):
-        cols = st.columns(2)
-        manejo = {}
-        with cols[0]:
-            manejo["accion_inmediata"] = st.selectbox("✅ Acción inmediata tomada", [
-                "",
-                "Reintervención urgente",
-                "Manejo médico intensivo",
-                "Soporte circulatorio mecánico",
-                "Reversión farmacológica",
-                "Traslado a UCIC/Quirófano"
-            ])
-        with cols[1]:
-            manejo["seguimiento"] = st.multiselect("📋 Seguimiento requerido", [
-                "Monitorización extendida en UCIC",
-                "Estudios de imagen adicionales",
-                "Consulta a especialidad relacionada",
-                "Revisión por comité"
-            ])
-    return manejo
-
-def capture_image():
+    manejo = st.session_state.borrador.manejo
+    catalogo = cargar_catalogos()
+    cols = st.columns(2)
+    with cols[0]:
+        sembrar("man_accion_inmediata", manejo.accion_inmediata, catalogo.acciones)
+        manejo.accion_inmediata = st.selectbox("✅ Acción inmediata tomada", catalogo.acciones, key="man_accion_inmediata")
+    with cols[1]:
+        sembrar("man_seguimiento", manejo.seguimiento)
+        manejo.seguimiento = st.multiselect("📋 Seguimiento requerido", catalogo.seguimiento, key="man_seguimiento")
+
+def capture_image(clave):
     """Captura una imagen usando la cámara de la tablet"""
-    img_file = st.camera_input("📸 Tomar foto del evento grave o adverso")
-    
-    if img_file is not None:
-        img = Image.open(img_file)
-        st.image(img, caption="Foto capturada", use_column_width=True)
-        return img
-    return None
+    return st.camera_input("📸 Tomar foto del evento grave o adverso", key=clave)
 
 
-def record_video():
-    """Graba video usando la cámara de la tablet"""
-    video_bytes = st.camera_input("🎥 Grabar video del evento", key="video_recorder")
-    
-    if video_bytes is not None:
-        st.video(video_bytes)
-        return video_bytes
-    return None
+def record_video(clave):
+    """Adjunta un video grabado con la cámara de la tablet"""
+    return st.file_uploader("🎥 Video del evento", type=["mp4", "mov", "webm"], key=clave)
+
+def quitar_evidencia(hash_contenido):
+    """Quita la referencia del borrador; el archivo queda en el almacén"""
+    evidencia = st.session_state.borrador.evidencia
+    evidencia.elementos = [e for e in evidencia.elementos if e["hash"] != hash_contenido]
 
+@seccion
 def show_evidence_section():
     """Muestra la sección para capturar evidencia multimedia usando la cámara y micrófono"""
-    with st.expander("📸 Evidencia Multimedia del Evento", expanded=False):
-        st.info("""
-        Capture evidencia relevante del evento grave o adverso usando los dispositivos de la tablet:
-        - Fotografías (ECG, heridas, equipos)
-        - Videos cortos (monitorización, procedimientos)
-        """)
-        
-        evidence_data = {}
-        
-        opcion_evidencia = st.radio("Seleccione el tipo de evidencia a capturar:", [
-            "Ninguno",
-            "Tomar fotografía",
-            "Grabar video"
-        ], horizontal=True)
-        
-        if opcion_evidencia == "Tomar fotografía":
-            img = capture_image()
-            if img is not None:
-                evidence_data["imagen"] = {
-                    "tipo": "foto",
-                    "descripcion": st.text_input("Descripción de la foto")
-                }
-        elif opcion_evidencia == "Grabar video":
-            video = record_video()
-            if video is not None:
-                evidence_data["video"] = {
-                    "tipo": "video",
-                    "descripcion": st.text_input("Descripción del video")
-                }
-    
-    return evidence_data
+    evidencia = st.session_state.borrador.evidencia
+    almacen = st.session_state.almacen_evidencia
+    st.info("""
+    Capture evidencia relevante del evento grave o adverso usando los dispositivos de la tablet:
+    - Fotografías (ECG, heridas, equipos)
+    - Videos cortos (monitorización, procedimientos)
+    """)
 
-def show_death_certificate():
-    """Muestra la sección de certificado de defunción"""
-    with st.expander("⚰️ Datos de Defunción (si aplica)", expanded=False):
-        death_data = {}
-        cols = st.columns(3)
-        
+    opciones = [
+        "Ninguno",
+        "Tomar fotografía",
+        "Subir video"
+    ]
+    sembrar("evi_opcion", evidencia.opcion, opciones)
+    evidencia.opcion = st.radio("Seleccione el tipo de evidencia a capturar:", opciones, horizontal=True, key="evi_opcion")
+
+    # Cada captura usa un widget nuevo, así la anterior no se reenvía en cada rerun
+    contador = st.session_state.setdefault("evi_capturas", 0)
+    archivo = None
+    if evidencia.opcion == "Tomar fotografía":
+        archivo, tipo = capture_image(f"evi_camara_{contador}"), "foto"
+    elif evidencia.opcion == "Subir video":
+        archivo, tipo = record_video(f"evi_video_{contador}"), "video"
+
+    if archivo is not None:
+        try:
+            elemento = almacen.guardar(archivo, tipo)
+        except Exception as e:
+            st.error(f"No se pudo guardar la evidencia: {str(e)}")
+        else:
+            if all(e["hash"] != elemento["hash"] for e in evidencia.elementos):
+                evidencia.elementos.append(elemento)
+            st.session_state.evi_capturas = contador + 1
+
+    for elemento in evidencia.elementos:
+        cols = st.columns([1, 3, 1])
         with cols[0]:
-            muerte = st.radio("¿Falleció el paciente?", ["No", "Sí"], horizontal=True)
-            death_data["fallecio"] = muerte == "Sí"
-            
-            if muerte == "Sí":
-                death_data["hora_defuncion"] = st.time_input("Hora de defunción", time(0, 0))
-        
+            if elemento["tipo"] == "foto":
+                miniatura = almacen.miniatura(elemento["hash"])
+                if miniatura:
+                    st.image(miniatura)
+                elif miniatura is None:
+                    st.caption("🖼️ Generando miniatura…")
+                else:
+                    st.error("No se pudo generar la miniatura de la foto")
+            else:
+                st.caption(f"🎥 Video ({elemento['tamano'] / 1e6:.1f} MB)")
         with cols[1]:
-            if muerte == "Sí":
-                death_data["folio_certificado"] = st.text_input("Número de folio del certificado médico")
-                death_data["causa_muerte"] = st.selectbox("Causa principal de muerte", [
-                    "",
-                    "Infarto agudo de miocardio",
-                    "Choque cardiogénico",
-                    "Arritmia fatal",
-                    "Taponamiento cardíaco",
-                    "Embolia pulmonar masiva",
-                    "Accidente cerebrovascular",
-                    "Sepsis",
-                    "Otra causa cardiovascular",
-                    "Causa no cardiovascular"
-                ])
-        
+            clave = f"evi_descripcion_{elemento['hash'][:16]}"
+            sembrar(clave, elemento["descripcion"])
+            elemento["descripcion"] = st.text_input("Descripción", key=clave)
+            st.caption(f"SHA-256 {elemento['hash'][:16]}…")
         with cols[2]:
-            if muerte == "Sí":
-                death_data["autopsia"] = st.radio("¿Se realizó autopsia?", ["No", "Sí"], horizontal=True)
-                death_data["obituario_patologia"] = st.text_input("Folio obituario (Patología)")
-    
-    return death_data
+            st.button("🗑️ Quitar", key=f"evi_quitar_{elemento['hash'][:16]}",
+                      on_click=quitar_evidencia, args=(elemento["hash"],))
+
+@seccion
+def show_death_certificate():
+    """Muestra la sección de certificado de defunción"""
+    defuncion = st.session_state.borrador.defuncion
+    catalogo = cargar_catalogos()
+    cols = st.columns(3)
 
+    with cols[0]:
+        sembrar("def_fallecio", "Sí" if defuncion.fallecio else "No", ["No", "Sí"])
+        defuncion.fallecio = st.radio("¿Falleció el paciente?", ["No", "Sí"], horizontal=True, key="def_fallecio") == "Sí"
+
+        if defuncion.fallecio:
+            sembrar("def_hora_defuncion", defuncion.hora_defuncion)
+            defuncion.hora_defuncion = st.time_input("Hora de defunción", key="def_hora_defuncion")
+
+    with cols[1]:
+        if defuncion.fallecio:
+            sembrar("def_folio_certificado", defuncion.folio_certificado)
+            defuncion.folio_certificado = st.text_input("Número de folio del certificado médico", key="def_folio_certificado")
+            sembrar("def_causa_muerte", defuncion.causa_muerte, catalogo.causas_muerte)
+            defuncion.causa_muerte = st.selectbox("Causa principal de muerte", catalogo.causas_muerte, key="def_causa_muerte")
+
+    with cols[2]:
+        if defuncion.fallecio:
+            sembrar("def_autopsia", defuncion.autopsia, ["No", "Sí"])
+            defuncion.autopsia = st.radio("¿Se realizó autopsia?", ["No", "Sí"], horizontal=True, key="def_autopsia")
+            sembrar("def_obituario_patologia", defuncion.obituario_patologia)
+            defuncion.obituario_patologia = st.text_input("Folio obituario (Patología)", key="def_obituario_patologia")
+
+@seccion
 def show_validation_section():
     """Muestra la sección de validación"""
-    with st.expander("✍️ Validación del Reporte", expanded=False):
-        cols = st.columns(2)
-        validacion = {}
-        with cols[0]:
-            validacion["reporter_name"] = st.text_input("Nombre del profesional que reporta")
-            validacion["reporter_role"] = st.selectbox("Rol", ["", "Médico", "Enfermería", "Técnico"])
-        with cols[1]:
-            validacion["supervisor_review"] = st.checkbox("Confirmo revisión con supervisor")
-            validacion["fecha_reporte"] = datetime.now().strftime("%d/%m/%Y %H:%M")
-    return validacion
+    validacion = st.session_state.borrador.validacion
+    catalogo = cargar_catalogos()
+    cols = st.columns(2)
+    with cols[0]:
+        sembrar("val_reporter_name", validacion.reporter_name)
+        validacion.reporter_name = st.text_input("Nombre del profesional que reporta", key="val_reporter_name")
+        sembrar("val_reporter_role", validacion.reporter_role, catalogo.roles_reporte)
+        validacion.reporter_role = st.selectbox("Rol", catalogo.roles_reporte, key="val_reporter_role")
+    with cols[1]:
+        sembrar("val_supervisor_review", validacion.supervisor_review)
+        validacion.supervisor_review = st.checkbox("Confirmo revisión con supervisor", key="val_supervisor_review")
 
-def submit_report(context, classification, factors, patient, lab_results, medications, management, death_data, validation, evidence):
+SECCIONES = {
+    "📌 Contexto del Evento": show_event_context,
+    "⚠️ Clasificación del Evento Grave o Adverso": show_event_classification,
+    "🔎 Factores Contribuyentes": show_contributing_factors,
+    "👨‍⚕️ Datos del Paciente": show_patient_data,
+    "🧪 Resultados de Laboratorio": show_lab_results,
+    "💊 Medicamentos Involucrados": show_medication_section,
+    "🚑 Manejo del Evento": show_management_section,
+    "📸 Evidencia Multimedia del Evento": show_evidence_section,
+    "⚰️ Datos de Defunción (si aplica)": show_death_certificate,
+    "✍️ Validación del Reporte": show_validation_section
+}
+
+def cambiar_seccion(paso):
+    """Callback de los botones Anterior/Siguiente"""
+    nombres = list(SECCIONES)
+    idx = nombres.index(st.session_state.seccion_activa) + paso
+    st.session_state.seccion_activa = nombres[max(0, min(idx, len(nombres) - 1))]
+
+def show_form_sections():
+    """Dibuja solo la sección activa; las demás no ejecutan ningún widget"""
+    seccion = st.radio("Sección del reporte", list(SECCIONES), horizontal=True, key="seccion_activa")
+    with st.container(border=True):
+        st.subheader(seccion)
+        SECCIONES[seccion]()
+
+    col1, _, col2 = st.columns([1, 4, 1])
+    with col1:
+        st.button("⬅️ Anterior", use_container_width=True, on_click=cambiar_seccion, args=(-1,))
+    with col2:
+        st.button("Siguiente ➡️", use_container_width=True, on_click=cambiar_seccion, args=(1,))
+
+def submit_report(borrador):
     """Procesa el envío del reporte"""
-    if not classification["categoria_principal"]:
+    if not borrador.clasificacion.categoria_principal:
         st.error("❌ Debe seleccionar al menos la categoría principal del evento")
         return False
     
-    if not validation["supervisor_review"]:
+    if not borrador.validacion.supervisor_review:
         st.error("❌ Requiere validación con supervisor de turno")
         return False
     
-    codigo_reporte = f"CARD-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-    
-    report_data = {
-        **context,
-        **classification,
-        "factores_contribuyentes": factors,
-        "datos_paciente": patient,
-        "laboratorio": lab_results,
-        "medicamentos": medications,
-        "manejo": management,
-        "evidencia_multimedia": evidence,
-        "datos_defuncion": death_data if death_data["fallecio"] else None,
-        "validacion": validation
-    }
-    
-    st.success(f"✅ Reporte enviado correctamente! Código: {codigo_reporte}")
-    
-    with st.expander("📄 Resumen del Reporte", expanded=True):
-        st.json(report_data)
-    
-    return True
+    report_data = borrador.a_dict(datetime.now().strftime("%d/%m/%Y %H:%M"))
+    report_data["version_catalogos"] = cargar_catalogos().version
+    report_data["laboratorio"]["hallazgos"] = cargar_catalogos().reglas_laboratorio.evaluar(borrador.laboratorio.valores)
+    report_data["alertas_medicacion"] = cargar_catalogos().verificador_medicamentos.verificar(report_data["medicamentos"])
+
+    # Un posible duplicado se avisa una vez; pulsar Enviar de nuevo lo registra igualmente
+    posibles = st.session_state.almacen.posibles_duplicados(report_data)
+    if posibles and st.session_state.get("duplicados_revisados") != st.session_state.id_borrador:
+        st.session_state.duplicados_revisados = st.session_state.id_borrador
+        st.warning(
+            "⚠️ Este evento se parece a reportes ya registrados: "
+            + ", ".join(f"{codigo} ({similitud:.0%})" for codigo, similitud in posibles)
+            + ". Si no es el mismo evento, pulse Enviar de nuevo."
+        )
+        return False
+
+    # El reporte queda en la cola local; el envío al sistema ocurre en segundo plano
+    try:
+        codigo_reporte = st.session_state.almacen.encolar(report_data, st.session_state.id_borrador)
+    except Exception as e:
+        st.error(f"❌ No se pudo registrar el reporte: {str(e)}")
+        return False
+
+    st.session_state.ultimo_envio = (codigo_reporte, report_data)
+    nuevo_borrador()
+    del st.session_state["seccion_activa"]
+    st.rerun()
+
+def show_ultimo_envio():
+    """Confirma el último reporte registrado y muestra el estado de la cola de envío"""
+    envio = st.session_state.pop("ultimo_envio", None)
+    if envio:
+        codigo_reporte, report_data = envio
+        st.success(f"✅ Reporte registrado correctamente! Código: {codigo_reporte}")
+        criticos = [h for h in report_data["laboratorio"]["hallazgos"] if h["estado"] == "crítico"]
+        if criticos:
+            st.warning("🚨 Valores críticos de laboratorio: " + ", ".join(f"{h['etiqueta']} {h['valor']:g}" for h in criticos))
+        graves = [a["descripcion"] for a in report_data["alertas_medicacion"] if a["severidad"] == "grave"]
+        if graves:
+            st.warning("💊 Alertas de medicación: " + "; ".join(graves))
+        with st.expander("📄 Resumen del Reporte", expanded=True):
+            st.json(report_data)
+
+    pendientes = st.session_state.almacen.pendientes()
+    if pendientes:
+        st.caption(f"📡 {pendientes} reporte(s) en cola de envío; se enviarán automáticamente")
+    con_error = st.session_state.almacen.con_error()
+    if con_error:
+        st.warning(f"⚠️ {con_error} reporte(s) no se pudieron enviar tras varios intentos; avisa a soporte")
+
+def recalcular_indicadores():
+    """Callback del botón de recálculo del panel de supervisores"""
+    historico = exportacion.leer_indicadores(DIRECTORIO_EXPORTACION)
+    st.session_state.reportes_recalculados = st.session_state.almacen.recalcular_indicadores(historico)
+
+def show_lab_panel():
+    """Puntúa en una sola pasada los laboratorios de los reportes de los últimos 30 días"""
+    st.markdown("**🧪 Laboratorio (30d)**")
+    reglas = cargar_catalogos().reglas_laboratorio
+    reportes = st.session_state.almacen.extraer("laboratorio", date.today() - timedelta(days=VENTANA_DIAS - 1))
+    if not reportes:
+        st.info("Sin resultados de laboratorio en los últimos 30 días")
+        return
+
+    resumen = reglas.resumen(reglas.puntuar(reglas.matriz(reportes)))
+    st.metric("Reportes con algún valor crítico", resumen.pop("reportes con crítico"))
+    datos = pd.DataFrame(resumen)
+    st.dataframe(datos[datos["medidos"] > 0], hide_index=True, use_container_width=True)
+
+def show_medication_panel():
+    """Interacciones y dosis máximas superadas en los reportes de los últimos 30 días"""
+    st.markdown("**💊 Seguridad de medicación (30d)**")
+    reportes = st.session_state.almacen.extraer("medicamentos", date.today() - timedelta(days=VENTANA_DIAS - 1))
+    conteo, con_alerta = cargar_catalogos().verificador_medicamentos.verificar_lote(reportes)
+    if not conteo:
+        st.info("Sin interacciones ni dosis máximas superadas en los últimos 30 días")
+        return
+
+    st.metric("Reportes con alguna alerta de medicación", con_alerta)
+    datos = pd.DataFrame(
+        [(tipo, descripcion, casos) for (tipo, descripcion), casos in conteo.most_common()],
+        columns=["Tipo", "Alerta", "Casos"]
+    )
+    st.dataframe(datos, hide_index=True, use_container_width=True)
+
+def agrupar_duplicados():
+    """Callback del botón de agrupación de duplicados"""
+    desde = date.today() - timedelta(days=VENTANA_DIAS - 1)
+    st.session_state.grupos_duplicados = st.session_state.almacen.agrupar_duplicados(desde)
+
+def show_duplicates_panel():
+    """Grupos de reportes de los últimos 30 días que parecen el mismo evento"""
+    st.markdown("**🧩 Posibles duplicados (30d)**")
+    st.button("Buscar grupos de reportes duplicados", on_click=agrupar_duplicados)
+    grupos = st.session_state.get("grupos_duplicados")
+    if grupos is None:
+        return
+    if not grupos:
+        st.info("No se encontraron reportes duplicados")
+        return
+    st.dataframe(
+        pd.DataFrame({"Grupo": range(1, len(grupos) + 1), "Reportes": [", ".join(g) for g in grupos], "Cantidad": [len(g) for g in grupos]}),
+        hide_index=True, use_container_width=True
+    )
+
+def exportar_historico():
+    """Callback: reescribe el histórico Parquet particionado por mes con todos los reportes"""
+    df_hechos, df_medicamentos = exportacion.tablas(st.session_state.almacen.reportes(), cargar_catalogos().reglas_laboratorio.claves)
+    st.session_state.meses_exportados = exportacion.escribir_particiones(df_hechos, df_medicamentos, DIRECTORIO_EXPORTACION)
+
+def show_export_panel():
+    """Extracto mensual para reguladores y actualización del histórico columnar"""
+    st.markdown("**📦 Exportación de reportes**")
+    meses = st.session_state.almacen.meses()
+    if not meses:
+        st.info("Aún no hay reportes registrados")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        mes = st.selectbox("Mes del evento", meses, key="mes_extracto")
+    with col2:
+        formato = st.radio("Formato", exportacion.FORMATOS, horizontal=True, key="formato_extracto")
+
+    # El mes se aplana y se escribe en su partición; el extracto se lee de ella
+    if st.button("📤 Preparar extracto mensual"):
+        try:
+            df_hechos, df_medicamentos = exportacion.tablas(
+                st.session_state.almacen.reportes(mes), cargar_catalogos().reglas_laboratorio.claves
+            )
+            exportacion.escribir_particiones(df_hechos, df_medicamentos, DIRECTORIO_EXPORTACION)
+            st.session_state.extracto = (mes, formato, exportacion.extracto(
+                exportacion.leer_tabla(DIRECTORIO_EXPORTACION, "hechos", mes),
+                exportacion.leer_tabla(DIRECTORIO_EXPORTACION, "medicamentos", mes),
+                formato, f"eventos_{mes}"
+            ))
+        except Exception as e:
+            st.error(f"❌ No se pudo preparar el extracto: {str(e)}")
+
+    extracto = st.session_state.pop("extracto", None)
+    if extracto is not None:
+        mes, formato, datos = extracto
+        st.download_button(
+            f"📥 Descargar extracto {mes} ({formato.upper()})",
+            data=datos,
+            file_name=f"eventos_{mes}_{formato}.zip",
+            mime="application/zip"
+        )
+
+    st.button("🗄️ Actualizar histórico Parquet", on_click=exportar_historico)
+    exportados = st.session_state.pop("meses_exportados", None)
+    if exportados is not None:
+        st.caption(f"Histórico actualizado: {len(exportados)} mes(es)")
 
 def show_supervisor_panel():
-    """Muestra el panel de supervisores"""
+    """Muestra el panel de supervisores con los indicadores de los últimos 30 días"""
     if st.secrets.get("SUPERVISOR_MODE", False):
         st.markdown("---")
         st.subheader("📊 Panel de Análisis Cardiológico (Solo Supervisores)")
-        
-        kpi_data = pd.DataFrame({
-            "Tipo de Evento": ["Isquémico", "Arritmia", "Vascular", "Tromboembólico"],
-            "Casos (30d)": [12, 8, 5, 3],
-            "Gravedad Promedio": [2.7, 3.1, 2.4, 3.8]
-        })
-        
-        st.bar_chart(kpi_data, x="Tipo de Evento", y="Casos (30d)")
+
+        try:
+            resumen, serie, totales = st.session_state.almacen.indicadores()
+        except Exception as e:
+            st.error(f"❌ No se pudieron leer los indicadores: {str(e)}")
+            return
+
+        total = resumen[resumen["dimension"] == "total"]
+        casos = int(total["casos"].sum())
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Casos (30d)", casos)
+        col2.metric("Gravedad promedio (30d)", f"{total['gravedad_promedio'].iloc[0]:.2f}" if casos else "—")
+        col3.metric("Casos históricos", int(totales.loc[totales["dimension"] == "total", "casos"].sum()))
+
+        st.line_chart(serie, x="dia", y="casos")
+
+        pestanas = st.tabs(["Tipo de evento", "Subcategoría", "Área", "Turno", "Gravedad"])
+        for pestana, dimension in zip(pestanas, DIMENSIONES):
+            with pestana:
+                datos = resumen[(resumen["dimension"] == dimension) & (resumen["valor"] != "")]
+                if datos.empty:
+                    st.info("Sin reportes en los últimos 30 días")
+                    continue
+                datos = datos.rename(columns={
+                    "valor": "Valor", "casos": "Casos (30d)", "gravedad_promedio": "Gravedad Promedio"
+                }).sort_values("Casos (30d)", ascending=False)
+                st.bar_chart(datos, x="Valor", y="Casos (30d)")
+                st.dataframe(datos[["Valor", "Casos (30d)", "Gravedad Promedio"]], hide_index=True, use_container_width=True)
+
+        show_lab_panel()
+        show_medication_panel()
+        show_duplicates_panel()
+        show_export_panel()
+
+        st.button("🔁 Recalcular indicadores desde los reportes y el histórico", on_click=recalcular_indicadores)
+        recalculados = st.session_state.pop("reportes_recalculados", None)
+        if recalculados is not None:
+            st.caption(f"Indicadores recalculados a partir de {recalculados} reporte(s)")
 
 def main():
     """Función principal de la aplicación"""
     setup_page()
-    
-    context = show_event_context()
-    classification = show_event_classification()
-    factors = show_contributing_factors()
-    patient_data = show_patient_data()
-    lab_results = show_lab_results()
-    medications = show_medication_section()
-    management = show_management_section()
-    evidence = show_evidence_section()
-    death_data = show_death_certificate()
-    validation = show_validation_section()
+    initialize_session_state()
+    show_ultimo_envio()
+    show_form_sections()
     
     if st.button("📤 Enviar Reporte Cardiológico", type="primary", use_container_width=True):
-        submit_report(context, classification, factors, patient_data, lab_results, medications, management, death_data, validation, evidence)
+        submit_report(st.session_state.borrador)
     
     show_supervisor_panel()
 
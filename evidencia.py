@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from PIL import Image
+
+from almacen_contenido import copiar_bloques, guardar_por_contenido
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_EVIDENCIA = os.environ.get(
+    "EVIDENCIA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "evidencia")
+)
+
+TAMANO_MINIATURA = (320, 320)
+# Intentos de generar una miniatura antes de darla por fallida
+MAX_INTENTOS = 3
+
+# Marcadores JPEG sin campo de longitud
+_MARCADORES_SIN_LONGITUD = {0x01, *range(0xD0, 0xD8)}
+_INICIO_BARRIDO = 0xDA
+_APP1 = 0xE1
+
+def copiar_sin_exif(entrada, escribir):
+    """Copia un JPEG segmento a segmento omitiendo los APP1 (EXIF/XMP).
+
+    No decodifica la imagen: las cabeceras se recorren en streaming y los datos
+    comprimidos se copian en bloques. Otros formatos se copian sin cambios.
+    """
+    cabecera = entrada.read(2)
+    escribir(cabecera)
+    if cabecera != b"\xff\xd8":
+        copiar_bloques(entrada, escribir)
+        return
+
+    while True:
+        marcador = entrada.read(2)
+        if len(marcador) < 2 or marcador[0] != 0xFF:
+            escribir(marcador)
+            break
+        tipo = marcador[1]
+        if tipo in _MARCADORES_SIN_LONGITUD:
+            escribir(marcador)
+            continue
+        if tipo == _INICIO_BARRIDO:
+            escribir(marcador)
+            break
+        longitud = entrada.read(2)
+        datos = entrada.read(int.from_bytes(longitud, "big") - 2)
+        if tipo != _APP1:
+            escribir(marcador + longitud + datos)
+    copiar_bloques(entrada, escribir)
+
+class AlmacenEvidencia:
+    """Almacén de evidencia direccionado por contenido.
+
+    Cada archivo se guarda una sola vez bajo el SHA-256 de su contenido (ya
+    sin EXIF) y el reporte solo guarda ese hash. Las miniaturas se generan una
+    vez, en un hilo aparte, y son lo único que se envía al navegador. Si la
+    generación falla se reintenta hasta MAX_INTENTOS veces y después se deja
+    constancia del fallo junto a la miniatura.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.directorio_miniaturas = os.path.join(directorio, "miniaturas")
+        os.makedirs(self.directorio_miniaturas, exist_ok=True)
+        self.trabajador = ThreadPoolExecutor(max_workers=2, thread_name_prefix="miniaturas")
+        self.miniaturas = {}
+        self.intentos = {}
+        # Las sesiones consultan y encargan miniaturas desde hilos distintos
+        self.lock = threading.Lock()
+
+    def ruta(self, hash_contenido):
+        return os.path.join(self.directorio, hash_contenido[:2], hash_contenido)
+
+    def ruta_miniatura(self, hash_contenido):
+        return os.path.join(self.directorio_miniaturas, f"{hash_contenido}.jpg")
+
+    def ruta_fallo(self, hash_contenido):
+        return os.path.join(self.directorio_miniaturas, f"{hash_contenido}.error")
+
+    def guardar(self, archivo, tipo):
+        """Guarda un archivo subido en bloques; devuelve la referencia para el reporte"""
+        copiar = copiar_sin_exif if tipo == "foto" else copiar_bloques
+        hash_contenido, tamano, _ = guardar_por_contenido(self.directorio, archivo, self.ruta, copiar)
+
+        if tipo == "foto":
+            self.solicitar_miniatura(hash_contenido)
+        return {"hash": hash_contenido, "tipo": tipo, "mime": archivo.type, "tamano": tamano, "descripcion": ""}
+
+    def _generar_miniatura(self, hash_contenido):
+        destino = self.ruta_miniatura(hash_contenido)
+        if not os.path.exists(destino):
+            with Image.open(self.ruta(hash_contenido)) as imagen:
+                imagen.draft("RGB", TAMANO_MINIATURA)
+                imagen = imagen.convert("RGB")
+                imagen.thumbnail(TAMANO_MINIATURA)
+                temporal = destino + ".parte"
+                imagen.save(temporal, format="JPEG", quality=80)
+            os.replace(temporal, destino)
+        return destino
+
+    def solicitar_miniatura(self, hash_contenido):
+        """Encarga la miniatura al hilo de trabajo si aún no existe ni está en curso"""
+        with self.lock:
+            self._solicitar(hash_contenido)
+
+    def _solicitar(self, hash_contenido):
+        if hash_contenido in self.miniaturas or os.path.exists(self.ruta_fallo(hash_contenido)):
+            return
+        self.miniaturas[hash_contenido] = self.trabajador.submit(self._generar_miniatura, hash_contenido)
+        self.intentos[hash_contenido] = self.intentos.get(hash_contenido, 0) + 1
+
+    def miniatura(self, hash_contenido):
+        """Ruta de la miniatura si ya está lista; None mientras se genera y False si no se pudo generar"""
+        destino = self.ruta_miniatura(hash_contenido)
+        if os.path.exists(destino):
+            return destino
+        with self.lock:
+            if os.path.exists(self.ruta_fallo(hash_contenido)):
+                return False
+            self._solicitar(hash_contenido)
+            futuro = self.miniaturas[hash_contenido]
+            if not futuro.done():
+                return None
+            del self.miniaturas[hash_contenido]
+            if futuro.exception() is None:
+                self.intentos.pop(hash_contenido, None)
+                return futuro.result()
+            logger.warning(f"No se pudo generar la miniatura de {hash_contenido}: {futuro.exception()}")
+            if self.intentos[hash_contenido] < MAX_INTENTOS:
+                self._solicitar(hash_contenido)
+                return None
+            with open(self.ruta_fallo(hash_contenido), "w", encoding="utf-8") as f:
+                f.write(str(futuro.exception()))
+            self.intentos.pop(hash_contenido, None)
+            return False
+
+@st.cache_resource(show_spinner=False)
+def abrir_almacen_evidencia():
+    """Almacén de evidencia compartido por todas las sesiones"""
+    return AlmacenEvidencia(DIRECTORIO_EVIDENCIA)
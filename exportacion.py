@@ -0,0 +1,181 @@
+import io
+import os
+import zipfile
+
+import pandas as pd
+
+from almacen_reportes import DIRECTORIO_REPORTES
+from indicadores import COLUMNAS, gravedad
+
+# Histórico columnar: <DIRECTORIO_EXPORTACION>/<tabla>/mes=AAAA-MM/datos.parquet
+DIRECTORIO_EXPORTACION = os.path.join(DIRECTORIO_REPORTES, "exportacion")
+
+FACTORES = ("comorbilidad", "anatomia", "urgencia", "equipo", "imagen", "acceso", "experiencia", "comunicacion", "fatiga")
+
+# Esquema fijo de la tabla de hechos (sin nombre del paciente) y de la de medicamentos
+COLUMNAS_HECHOS = {
+    "codigo": "string",
+    "creado": "datetime64[ns]",
+    "fecha_evento": "datetime64[ns]",
+    "turno": "string",
+    "ubicacion": "string",
+    "procedimiento_asociado": "string",
+    "categoria_principal": "string",
+    "subcategoria": "string",
+    "escala_grace": "string",
+    "gravedad": "int8",
+    "detectado_en": "string",
+    **{f"factor_{f}": "bool" for f in FACTORES},
+    "paciente_edad": "string",
+    "paciente_imc": "string",
+    "paciente_numero_cama": "string",
+    "paciente_riesgo_previo": "string",
+    "examenes_solicitados": "string",
+    "lab_hallazgos": "int16",
+    "lab_criticos": "int16",
+    "accion_inmediata": "string",
+    "seguimiento": "string",
+    "evidencias": "int16",
+    "medicamentos": "int16",
+    "alertas_medicacion": "int16",
+    "fallecio": "bool",
+    "hora_defuncion": "string",
+    "causa_muerte": "string",
+    "autopsia": "string",
+    "reporter_role": "string",
+    "supervisor_review": "bool",
+    "version_catalogos": "string"
+}
+
+COLUMNAS_MEDICAMENTOS = {
+    "codigo": "string",
+    "fecha_evento": "datetime64[ns]",
+    "orden": "int8",
+    "nombre": "string",
+    "dosis": "string",
+    "unidad": "string",
+    "via": "string",
+    "error": "bool",
+    "tipo_error": "string"
+}
+
+FORMATOS = ("parquet", "csv", "jsonl")
+
+def aplanar(codigo, creado, reporte, claves_lab):
+    """Fila de hechos y filas de medicamentos de un reporte anidado"""
+    factores = reporte.get("factores_contribuyentes") or {}
+    paciente = reporte.get("datos_paciente") or {}
+    laboratorio = reporte.get("laboratorio") or {}
+    manejo = reporte.get("manejo") or {}
+    defuncion = reporte.get("datos_defuncion") or {}
+    validacion = reporte.get("validacion") or {}
+    hallazgos = laboratorio.get("hallazgos", [])
+    medicamentos = [m for m in reporte.get("medicamentos", []) if m.get("nombre")]
+
+    hecho = {
+        "codigo": codigo,
+        "creado": creado,
+        "fecha_evento": reporte.get("fecha_evento"),
+        **{c: reporte.get(c, "") for c in (
+            "turno", "ubicacion", "procedimiento_asociado", "categoria_principal",
+            "subcategoria", "escala_grace", "detectado_en"
+        )},
+        "gravedad": gravedad(reporte.get("escala_grace")),
+        **{f"factor_{f}": bool(factores.get(f)) for f in FACTORES},
+        **{f"paciente_{c}": paciente.get(c, "") for c in ("edad", "imc", "numero_cama", "riesgo_previo")},
+        "examenes_solicitados": "; ".join(laboratorio.get("examenes_solicitados", [])),
+        **{f"lab_{c}": laboratorio.get(c) for c in claves_lab},
+        "lab_hallazgos": len(hallazgos),
+        "lab_criticos": sum(h["estado"] == "crítico" for h in hallazgos),
+        "accion_inmediata": manejo.get("accion_inmediata", ""),
+        "seguimiento": "; ".join(manejo.get("seguimiento", [])),
+        "evidencias": len((reporte.get("evidencia_multimedia") or {}).get("elementos", [])),
+        "medicamentos": len(medicamentos),
+        "alertas_medicacion": len(reporte.get("alertas_medicacion", [])),
+        "fallecio": bool(defuncion),
+        "hora_defuncion": str(defuncion.get("hora_defuncion", "")),
+        "causa_muerte": defuncion.get("causa_muerte", ""),
+        "autopsia": defuncion.get("autopsia", ""),
+        "reporter_role": validacion.get("reporter_role", ""),
+        "supervisor_review": bool(validacion.get("supervisor_review")),
+        "version_catalogos": reporte.get("version_catalogos", "")
+    }
+    filas_medicamentos = [
+        {
+            "codigo": codigo,
+            "fecha_evento": reporte.get("fecha_evento"),
+            "orden": orden,
+            **{c: m.get(c, "") for c in ("nombre", "dosis", "unidad", "via", "tipo_error")},
+            "error": bool(m.get("error"))
+        }
+        for orden, m in enumerate(medicamentos, start=1)
+    ]
+    return hecho, filas_medicamentos
+
+def tablas(reportes, claves_lab):
+    """Tabla de hechos y tabla de medicamentos con tipos fijos a partir de (código, creado, reporte)"""
+    hechos, medicamentos = [], []
+    for codigo, creado, reporte in reportes:
+        hecho, filas = aplanar(codigo, creado, reporte, claves_lab)
+        hechos.append(hecho)
+        medicamentos.extend(filas)
+
+    tipos_hechos = {**COLUMNAS_HECHOS, **{f"lab_{c}": "float64" for c in claves_lab}}
+    df_hechos = pd.DataFrame(hechos, columns=list(tipos_hechos))
+    df_medicamentos = pd.DataFrame(medicamentos, columns=list(COLUMNAS_MEDICAMENTOS))
+    for df, tipos in ((df_hechos, tipos_hechos), (df_medicamentos, COLUMNAS_MEDICAMENTOS)):
+        for columna, tipo in tipos.items():
+            if tipo.startswith("datetime"):
+                df[columna] = pd.to_datetime(df[columna], errors="coerce")
+            elif tipo == "string":
+                df[columna] = df[columna].fillna("").astype(str).astype("string")
+            else:
+                df[columna] = df[columna].astype(tipo)
+    return df_hechos, df_medicamentos
+
+def serializar(df, formato):
+    """Contenido de una tabla en parquet, csv o jsonl"""
+    if formato == "parquet":
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    if formato == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    return df.to_json(orient="records", lines=True, force_ascii=False, date_format="iso").encode("utf-8")
+
+def escribir_particiones(df_hechos, df_medicamentos, directorio, formato="parquet"):
+    """Escribe una partición por mes del evento: <directorio>/<tabla>/mes=AAAA-MM/datos.<ext>.
+
+    Solo se reescriben los meses presentes en los datos; los demás quedan intactos.
+    """
+    meses = df_hechos["fecha_evento"].dt.strftime("%Y-%m")
+    meses_medicamentos = df_medicamentos["fecha_evento"].dt.strftime("%Y-%m")
+    for mes in meses.dropna().unique():
+        for tabla, df in (("hechos", df_hechos[meses == mes]), ("medicamentos", df_medicamentos[meses_medicamentos == mes])):
+            carpeta = os.path.join(directorio, tabla, f"mes={mes}")
+            os.makedirs(carpeta, exist_ok=True)
+            destino = os.path.join(carpeta, f"datos.{formato}")
+            with open(destino + ".parte", "wb") as f:
+                f.write(serializar(df, formato))
+            os.replace(destino + ".parte", destino)
+    return sorted(meses.dropna().unique())
+
+def extracto(df_hechos, df_medicamentos, formato, nombre):
+    """ZIP con las dos tablas de un extracto, para descargar"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archivo:
+        for tabla, df in (("hechos", df_hechos), ("medicamentos", df_medicamentos)):
+            archivo.writestr(f"{nombre}_{tabla}.{formato}", serializar(df, formato))
+    return buffer.getvalue()
+
+def leer_tabla(directorio, tabla, mes=None, columnas=None):
+    """Lee una tabla Parquet particionada; con ``mes`` solo se abre esa partición"""
+    filtros = [("mes", "==", mes)] if mes else None
+    df = pd.read_parquet(os.path.join(directorio, tabla), columns=columnas, filters=filtros)
+    return df.drop(columns="mes", errors="ignore")
+
+def leer_indicadores(directorio):
+    """Código y columnas de los indicadores de la tabla de hechos; vacía si aún no se ha exportado"""
+    if not os.path.isdir(os.path.join(directorio, "hechos")):
+        return pd.DataFrame(columns=["codigo", *COLUMNAS])
+    return leer_tabla(directorio, "hechos", columnas=["codigo", *COLUMNAS])
@@ -7,6 +7,8 @@ import time
 import logging
 import socket
 from typing import Optional, Dict, Any
+from plantilla import (normalizar_turno, cargar_plantilla, configuracion_sftp,
+                       escribir_remoto, candado_plantilla)
 
 # Configuración inicial
 logging.basicConfig(level=logging.INFO)
@@ -163,13 +165,7 @@ class HospitalApp:
 
             logger.info(f"Columnas en archivo {tipo}: {df.columns.tolist()}")
 
-            if tipo == 'enfermeras':
-                if 'Presente' in df.columns:
-                    df['Presente'] = df['Presente'].astype(bool)
-                else:
-                    df['Presente'] = True
-
-            elif tipo == 'servicios':
+            if tipo == 'servicios':
                 columnas_reales = df.columns.tolist()
                 logger.info(f"Columnas reales en servicios: {columnas_reales}")
 
@@ -240,12 +236,23 @@ class HospitalApp:
             
             for i, archivo in enumerate(archivos_esenciales):
                 status_text.text(f"Cargando {archivo}...")
+                # La plantilla se lee por la caché compartida con el tablero de supervisión
+                if archivo == 'enfermeras':
+                    config_plantilla = configuracion_sftp()
+                    if config_plantilla is None:
+                        raise ValueError("No se pudo cargar enfermeras: falta la configuración SFTP")
+                    df_enfermeras, _ = cargar_plantilla(config_plantilla)
+                    st.session_state.datos_procesados['enfermeras'] = df_enfermeras
+                    st.session_state.contenidos['enfermeras'] = df_enfermeras.to_csv(index=False)
+                    progress_bar.progress((i + 1) / len(archivos_esenciales))
+                    continue
+
                 contenido = self.leer_contenido_archivo(archivo)
                 if contenido is None:
                     raise ValueError(f"No se pudo cargar {archivo}")
                 
                 st.session_state.contenidos[archivo] = contenido
-                if archivo in ['servicios', 'enfermeras', 'pacientes']:
+                if archivo in ['servicios', 'pacientes']:
                     st.session_state.datos_procesados[archivo] = self.procesar_datos(contenido, archivo)
                 
                 progress_bar.progress((i + 1) / len(archivos_esenciales))
@@ -285,14 +292,7 @@ class HospitalApp:
                 return pd.DataFrame()
 
             enfermeras = enfermeras[enfermeras['Presente'] == True].copy()
-            enfermeras['Turno'] = enfermeras['Turno'].str.strip().str.upper()
-
-            turno_map = {
-                'MAÑANA': 'M', 'MANANA': 'M', 'AM': 'M', 'M': 'M',
-                'TARDE': 'T', 'PM': 'T', 'T': 'T',
-                'NOCHE': 'N', 'NOCTURNO': 'N', 'N': 'N'
-            }
-            enfermeras['Turno'] = enfermeras['Turno'].map(turno_map).fillna('')
+            enfermeras['Turno'] = normalizar_turno(enfermeras['Turno'])
 
             enfermeras_presentes = enfermeras.groupby(
                 ['Servicio', 'Turno']).size().reset_index(name='Presentes')
@@ -331,24 +331,30 @@ class HospitalApp:
     def guardar_archivo_remoto(self, df: pd.DataFrame, nombre_archivo: str) -> bool:
         """Guarda un DataFrame en el servidor remoto"""
         try:
-            sftp = self.conectar_sftp()
-            if not sftp:
-                raise ConnectionError("No se pudo establecer conexión SFTP")
-
-            remote_path = f"{st.session_state.config['sftp']['remote_dir']}/{st.session_state.config['archivos'][nombre_archivo]}"
-
             csv_buffer = io.StringIO()
             df.to_csv(csv_buffer, index=False)
             csv_content = csv_buffer.getvalue()
 
-            with sftp.file(remote_path, 'w') as remote_file:
-                remote_file.write(csv_content)
+            if nombre_archivo == 'enfermeras':
+                # Misma ruta y candado que el tablero de supervisión
+                with candado_plantilla():
+                    escribir_remoto(configuracion_sftp(), csv_content)
+            else:
+                sftp = self.conectar_sftp()
+                if not sftp:
+                    raise ConnectionError("No se pudo establecer conexión SFTP")
+
+                remote_path = f"{st.session_state.config['sftp']['remote_dir']}/{st.session_state.config['archivos'][nombre_archivo]}"
+
+                with sftp.file(remote_path, 'w') as remote_file:
+                    remote_file.write(csv_content)
 
             logger.info(f"Archivo {nombre_archivo} guardado exitosamente")
 
             if nombre_archivo == 'enfermeras':
                 st.session_state.datos_procesados['enfermeras'] = df
                 st.session_state.contenidos['enfermeras'] = csv_content
+                cargar_plantilla.clear()
             elif nombre_archivo == 'transferencias':
                 st.session_state.contenidos['transferencias'] = csv_content
             elif nombre_archivo == 'servicios':
@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+# Dimensiones del reporte que se cuentan; "total" agrupa todos los reportes
+DIMENSIONES = ["categoria_principal", "subcategoria", "ubicacion", "turno", "escala_grace"]
+COLUMNAS = ["fecha_evento", *DIMENSIONES]
+VENTANA_DIAS = 30
+
+# Peso de cada nivel de la escala, por el texto anterior al paréntesis
+GRAVEDAD = {
+    "Bajo riesgo": 1,
+    "Intermedio": 2,
+    "Alto riesgo": 3,
+    "Crítico": 4
+}
+
+def gravedad(escala):
+    return GRAVEDAD.get(str(escala).split(" (")[0], 0)
+
+def crear_tablas(conexion):
+    """Contadores diarios por dimensión y valor, y sus totales históricos"""
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_diario (
+            dia TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            casos INTEGER NOT NULL,
+            suma_gravedad INTEGER NOT NULL,
+            PRIMARY KEY (dia, dimension, valor)
+        )""")
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_total (
+            dimension TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            casos INTEGER NOT NULL,
+            suma_gravedad INTEGER NOT NULL,
+            PRIMARY KEY (dimension, valor)
+        )""")
+
+def _filas(reporte):
+    dia = str(reporte.get("fecha_evento") or date.today())[:10]
+    peso = gravedad(reporte.get("escala_grace"))
+    filas = [(dia, "total", "", peso)]
+    filas += [(dia, d, str(reporte.get(d) or ""), peso) for d in DIMENSIONES]
+    return filas
+
+def sumar(conexion, reporte):
+    """Suma un reporte a los contadores; se llama dentro de la transacción que lo encola"""
+    filas = _filas(reporte)
+    conexion.executemany(
+        "INSERT INTO kpi_diario (dia, dimension, valor, casos, suma_gravedad) VALUES (?, ?, ?, 1, ?) "
+        "ON CONFLICT (dia, dimension, valor) DO UPDATE SET casos = casos + 1, suma_gravedad = suma_gravedad + excluded.suma_gravedad",
+        filas
+    )
+    conexion.executemany(
+        "INSERT INTO kpi_total (dimension, valor, casos, suma_gravedad) VALUES (?, ?, 1, ?) "
+        "ON CONFLICT (dimension, valor) DO UPDATE SET casos = casos + 1, suma_gravedad = suma_gravedad + excluded.suma_gravedad",
+        [f[1:] for f in filas]
+    )
+
+def recalcular(conexion, df):
+    """Reemplaza los contadores por los calculados sobre ``df`` (columnas de COLUMNAS)"""
+    df = df.reindex(columns=COLUMNAS)
+    base = pd.DataFrame({
+        "dia": pd.to_datetime(df["fecha_evento"], errors="coerce").dt.strftime("%Y-%m-%d").fillna(date.today().isoformat()),
+        "peso": df["escala_grace"].map(gravedad)
+    })
+    partes = [base.assign(dimension="total", valor="")]
+    for d in DIMENSIONES:
+        partes.append(base.assign(dimension=d, valor=df[d].fillna("").astype(str)))
+    largo = pd.concat(partes, ignore_index=True)
+
+    diario = largo.groupby(["dia", "dimension", "valor"], as_index=False).agg(casos=("peso", "size"), suma_gravedad=("peso", "sum"))
+    total = diario.groupby(["dimension", "valor"], as_index=False)[["casos", "suma_gravedad"]].sum()
+
+    conexion.execute("DELETE FROM kpi_diario")
+    conexion.execute("DELETE FROM kpi_total")
+    conexion.executemany(
+        "INSERT INTO kpi_diario (dia, dimension, valor, casos, suma_gravedad) VALUES (?, ?, ?, ?, ?)",
+        diario[["dia", "dimension", "valor", "casos", "suma_gravedad"]].astype(object).itertuples(index=False, name=None)
+    )
+    conexion.executemany(
+        "INSERT INTO kpi_total (dimension, valor, casos, suma_gravedad) VALUES (?, ?, ?, ?)",
+        total[["dimension", "valor", "casos", "suma_gravedad"]].astype(object).itertuples(index=False, name=None)
+    )
+    return len(df)
+
+def ventana(conexion, hoy=None, dias=VENTANA_DIAS):
+    """Indicadores de los últimos ``dias`` días.
+
+    Solo lee los contadores de la ventana (a lo sumo ``dias`` filas por valor de
+    cada dimensión), así que el costo no depende de los años de historia.
+    Devuelve el resumen por dimensión y la serie diaria de casos.
+    """
+    hoy = hoy or date.today()
+    desde = (hoy - timedelta(days=dias - 1)).isoformat()
+    resumen = pd.read_sql_query(
+        "SELECT dimension, valor, SUM(casos) AS casos, SUM(suma_gravedad) AS suma_gravedad "
+        "FROM kpi_diario WHERE dia BETWEEN ? AND ? GROUP BY dimension, valor",
+        conexion, params=(desde, hoy.isoformat())
+    )
+    resumen["gravedad_promedio"] = (resumen["suma_gravedad"] / resumen["casos"]).round(2)
+
+    serie = pd.read_sql_query(
+        "SELECT dia, casos FROM kpi_diario WHERE dia BETWEEN ? AND ? AND dimension = 'total' ORDER BY dia",
+        conexion, params=(desde, hoy.isoformat())
+    )
+    dias_ventana = pd.date_range(desde, hoy).strftime("%Y-%m-%d")
+    serie = serie.set_index("dia").reindex(dias_ventana, fill_value=0).rename_axis("dia").reset_index()
+    return resumen, serie
+
+def totales(conexion):
+    """Casos históricos por dimensión y valor"""
+    return pd.read_sql_query("SELECT dimension, valor, casos, suma_gravedad FROM kpi_total", conexion)
@@ -0,0 +1,91 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, para búsquedas insensibles a tildes"""
+    descompuesto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+def _tokens(texto):
+    return re.findall(r"\w+", normalizar(texto))
+
+def _trigramas(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class IndiceBusqueda:
+    """Índice invertido de pacientes y enfermeras por nombre, diagnóstico, estado y rol.
+
+    Los términos de tres o más letras se resuelven por intersección de trigramas
+    (coincidencia por subcadena) y los más cortos por prefijo. Los traslados
+    solo actualizan la habitación de la persona, sin reindexar su texto.
+    """
+
+    CAMPOS = ("nombre", "diagnostico", "estado", "rol")
+
+    def __init__(self):
+        self.trigramas = defaultdict(set)
+        self.prefijos = defaultdict(set)
+        self.textos = {}
+        self.ubicacion = {}
+
+    @classmethod
+    def desde_habitaciones(cls, habitaciones):
+        """Construye el índice a partir de la estructura de habitaciones"""
+        indice = cls()
+        for habitacion, datos in habitaciones.items():
+            for persona in datos["pacientes"] + datos["enfermeras"]:
+                indice.agregar(persona, habitacion)
+        return indice
+
+    def agregar(self, persona, habitacion):
+        """Indexa a una persona en su habitación"""
+        id_persona = persona["id"]
+        texto = " ".join(str(persona[c]) for c in self.CAMPOS if persona.get(c))
+        self.textos[id_persona] = normalizar(texto)
+        self.ubicacion[id_persona] = habitacion
+        for token in _tokens(texto):
+            for trigrama in _trigramas(token):
+                self.trigramas[trigrama].add(id_persona)
+            for n in (1, 2):
+                self.prefijos[token[:n]].add(id_persona)
+
+    def quitar(self, id_persona):
+        """Elimina a una persona del índice"""
+        texto = self.textos.pop(id_persona, None)
+        self.ubicacion.pop(id_persona, None)
+        if texto is None:
+            return
+        for token in _tokens(texto):
+            for trigrama in _trigramas(token):
+                self.trigramas[trigrama].discard(id_persona)
+            for n in (1, 2):
+                self.prefijos[token[:n]].discard(id_persona)
+
+    def mover(self, id_persona, habitacion):
+        """Actualiza la habitación de una persona ya indexada"""
+        if id_persona in self.ubicacion:
+            self.ubicacion[id_persona] = habitacion
+
+    def buscar(self, consulta):
+        """Ids de las personas que contienen todos los términos de la consulta"""
+        resultado = None
+        for termino in _tokens(consulta):
+            if len(termino) < 3:
+                candidatos = set(self.prefijos.get(termino, ()))
+                coincide = lambda texto, t=termino: re.search(rf"\b{re.escape(t)}", texto)
+            else:
+                listas = sorted((self.trigramas.get(t, set()) for t in _trigramas(termino)), key=len)
+                candidatos = set(listas[0]).intersection(*listas[1:])
+                coincide = lambda texto, t=termino: t in texto
+            if resultado is not None:
+                candidatos &= resultado
+            # Los trigramas pueden dar falsos positivos: se verifica sobre el texto
+            resultado = {i for i in candidatos if coincide(self.textos[i])}
+            if not resultado:
+                return set()
+        return resultado if resultado is not None else set(self.textos)
+
+    def habitaciones_coincidentes(self, consulta):
+        """Habitaciones con al menos una persona que coincide con la consulta"""
+        return {self.ubicacion[i] for i in self.buscar(consulta)}
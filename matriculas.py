@@ -0,0 +1,44 @@
+import re
+
+# MAT-AAAA-NNNNNN-D: año del ciclo, consecutivo del año y dígito verificador (Luhn)
+_PATRON = re.compile(r"^MAT-(\d{4})-(\d{6,})-(\d)$")
+
+def digito_verificador(digitos):
+    """Dígito de Luhn: detecta cualquier error en un dígito y casi todas las transposiciones"""
+    suma = 0
+    for posicion, caracter in enumerate(reversed(digitos)):
+        valor = int(caracter)
+        if posicion % 2 == 0:
+            valor *= 2
+            if valor > 9:
+                valor -= 9
+        suma += valor
+    return str((10 - suma % 10) % 10)
+
+def formatear(anio, numero):
+    cuerpo = f"{anio:04d}{numero:06d}"
+    return f"MAT-{anio:04d}-{numero:06d}-{digito_verificador(cuerpo)}"
+
+def es_valida(matricula):
+    """True si tiene el formato y su dígito verificador cuadra"""
+    coincidencia = _PATRON.match(matricula.strip().upper())
+    if not coincidencia:
+        return False
+    anio, numero, digito = coincidencia.groups()
+    return digito_verificador(anio + numero) == digito
+
+def crear_tablas(conexion):
+    conexion.execute("CREATE TABLE IF NOT EXISTS secuencias (nombre TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+
+def asignar(conexion, anio):
+    """Siguiente matrícula del año; se llama dentro de la transacción que registra la solicitud.
+
+    El UPDATE toma el candado de escritura de SQLite antes de leer el valor,
+    así que dos inscripciones simultáneas (aun en procesos distintos) nunca
+    reciben el mismo número.
+    """
+    nombre = f"matriculas-{anio}"
+    conexion.execute("INSERT OR IGNORE INTO secuencias (nombre, valor) VALUES (?, 0)", (nombre,))
+    conexion.execute("UPDATE secuencias SET valor = valor + 1 WHERE nombre = ?", (nombre,))
+    numero = conexion.execute("SELECT valor FROM secuencias WHERE nombre = ?", (nombre,)).fetchone()[0]
+    return formatear(anio, numero)
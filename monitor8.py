@@ -3,40 +3,73 @@ from datetime import datetime
 from PIL import Image
 import os
 import base64
+import uuid
+from html import escape
 from io import BytesIO
+from agregados import AgregadosTablero
+from tema import aplicar_tema
+from diario import abrir_diario
+from plantilla import (COLORES_ROL, COLUMNAS_PLANTILLA, EscritorPlantilla, cargar_plantilla, clave_turno,
+                       configuracion_sftp, plantilla_turno, turno_actual)
+
+def cargar_servicios_turno():
+    """Personal del turno actual desde la plantilla compartida; None si no está configurada o no se puede leer"""
+    config = configuracion_sftp()
+    if config is None:
+        return None
+    try:
+        df, version = cargar_plantilla(config)
+        faltantes = [c for c in COLUMNAS_PLANTILLA if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"faltan las columnas {', '.join(faltantes)}")
+        servicios = plantilla_turno(df, turno_actual())
+    except Exception as e:
+        st.error(f"No se pudo cargar la plantilla de enfermeras: {str(e)}")
+        return None
+    st.session_state.escritor_plantilla = EscritorPlantilla(config, df, version)
+    return servicios
 
 def initialize_session_state():
     """Inicializa el estado de la sesión con los servicios y personal"""
-    if 'servicios' not in st.session_state:
-        st.session_state.servicios = {
+    if 'diario' not in st.session_state:
+        # Un diario por turno: el cambio de turno parte de la plantilla de nuevo
+        st.session_state.diario = abrir_diario(f"monitor8_{clave_turno()}")
+        st.session_state.escritor_plantilla = None
+        servicios_turno = cargar_servicios_turno()
+    else:
+        servicios_turno = None
+
+    # Sin plantilla configurada se usa un tablero de demostración
+    if not len(st.session_state.diario) and servicios_turno is None:
+        servicios_turno = {
             "Urgencias": [
-                {"nombre": "Ana López", "rol": "especialista", "color": "#ff5252"},
-                {"nombre": "Carlos Ruiz", "rol": "general-a", "color": "#4caf50"},
-                {"nombre": "María González", "rol": "general-b", "color": "#2196f3"}
+                {"id": str(uuid.uuid4()), "nombre": "Ana López", "rol": "especialista", "color": "#ff5252"},
+                {"id": str(uuid.uuid4()), "nombre": "Carlos Ruiz", "rol": "general-a", "color": "#4caf50"},
+                {"id": str(uuid.uuid4()), "nombre": "María González", "rol": "general-b", "color": "#2196f3"}
             ],
             "Quirófano": [
-                {"nombre": "Pedro Sánchez", "rol": "especialista", "color": "#ff5252"},
-                {"nombre": "Lucía Martín", "rol": "general-a", "color": "#4caf50"}
+                {"id": str(uuid.uuid4()), "nombre": "Pedro Sánchez", "rol": "especialista", "color": "#ff5252"},
+                {"id": str(uuid.uuid4()), "nombre": "Lucía Martín", "rol": "general-a", "color": "#4caf50"}
             ],
             "Pediatría": [
-                {"nombre": "Sofía Pérez", "rol": "especialista", "color": "#ff5252"},
-                {"nombre": "Javier Díaz", "rol": "general-c", "color": "#9c27b0"}
+                {"id": str(uuid.uuid4()), "nombre": "Sofía Pérez", "rol": "especialista", "color": "#ff5252"},
+                {"id": str(uuid.uuid4()), "nombre": "Javier Díaz", "rol": "general-c", "color": "#9c27b0"}
             ],
             "UCI": [
-                {"nombre": "Elena Castro", "rol": "especialista", "color": "#ff5252"}
+                {"id": str(uuid.uuid4()), "nombre": "Elena Castro", "rol": "especialista", "color": "#ff5252"}
             ],
             "Planta": [
-                {"nombre": "Miguel Ángel Flores", "rol": "general-b", "color": "#2196f3"},
-                {"nombre": "Rosa Jiménez", "rol": "general-a", "color": "#4caf50"},
-                {"nombre": "David Torres", "rol": "camillero", "color": "#ff9800"}
+                {"id": str(uuid.uuid4()), "nombre": "Miguel Ángel Flores", "rol": "general-b", "color": "#2196f3"},
+                {"id": str(uuid.uuid4()), "nombre": "Rosa Jiménez", "rol": "general-a", "color": "#4caf50"},
+                {"id": str(uuid.uuid4()), "nombre": "David Torres", "rol": "camillero", "color": "#ff9800"}
             ]
         }
 
-    if 'seleccion' not in st.session_state:
-        st.session_state.seleccion = {"nombre": None, "servicio": None}
-        
-    if 'log_movimientos' not in st.session_state:
-        st.session_state.log_movimientos = []
+    if servicios_turno is not None:
+        st.session_state.diario.iniciar(servicios_turno)
+
+    if 'servicios' not in st.session_state:
+        materializar_tablero()
 
 def setup_page_config():
     """Configura la página de Streamlit"""
@@ -44,99 +77,7 @@ def setup_page_config():
 
 def load_custom_styles():
     """Carga los estilos CSS personalizados"""
-    st.markdown("""
-        <style>
-        .header-container {
-            display: flex;
-            justify-content: center;
-            margin-bottom: 20px;
-        }
-        .logo-img {
-            max-height: 80px;
-        }
-        .servicio-container {
-            border: 2px solid #4a8cff;
-            border-radius: 10px;
-            padding: 15px;
-            margin-bottom: 20px;
-            background-color: #f8fbff;
-        }
-        .servicio-header {
-            font-size: 1.3em;
-            font-weight: bold;
-            color: #2c5fd1;
-            margin-bottom: 15px;
-            text-align: center;
-        }
-        .profesional-container {
-            display: flex;
-            align-items: center;
-            padding: 10px;
-            margin: 5px 0;
-            background-color: white;
-            border-radius: 5px;
-            border: 1px solid #ddd;
-        }
-        .profesional-container:hover {
-            background-color: #f0f6ff;
-        }
-        .selected {
-            background-color: #fff8e1 !important;
-            border: 2px solid #ffd54f !important;
-        }
-        .role-badge {
-            width: 12px;
-            height: 12px;
-            border-radius: 50%;
-            display: inline-block;
-            margin-left: auto;
-        }
-        .profesional-name {
-            flex-grow: 1;
-        }
-        .historial-item {
-            background-color: #f8f9fa;
-            border-radius: 8px;
-            padding: 10px;
-            margin-bottom: 10px;
-            border-left: 4px solid #4a8cff;
-            font-size: 0.85em;
-        }
-        .leyenda-horizontal {
-            display: flex;
-            gap: 15px;
-            flex-wrap: wrap;
-            margin-bottom: 15px;
-            justify-content: center;
-            padding: 10px;
-            background-color: #f0f8ff;
-            border-radius: 5px;
-        }
-        .leyenda-item {
-            display: flex;
-            align-items: center;
-            gap: 5px;
-            font-size: 0.85em;
-            white-space: nowrap;
-        }
-        .sumario-cambios {
-            margin-top: 30px;
-            padding: 15px;
-            background-color: #f8f9fa;
-            border-radius: 8px;
-            border-left: 4px solid #4a8cff;
-        }
-        .seleccionado-box {
-            background-color: #fff8e1;
-            padding: 10px;
-            border-radius: 5px;
-            margin-bottom: 15px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    aplicar_tema("monitor8")
 
 def image_to_base64(image):
     """Convierte una imagen a base64"""
@@ -144,152 +85,381 @@ def image_to_base64(image):
     image.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode()
 
+@st.cache_data(show_spinner=False)
+def cargar_logo_base64(logo_path):
+    """Codifica el logo una sola vez por proceso; None si no se puede leer"""
+    if not os.path.exists(logo_path):
+        return None
+    try:
+        return image_to_base64(Image.open(logo_path))
+    except Exception:
+        return None
+
 def show_logo():
     """Muestra el logo en la parte superior"""
-    logo_path = "escudo_COLOR.jpg"
-    if os.path.exists(logo_path):
-        try:
-            logo = Image.open(logo_path)
-            st.markdown(
-                """
-                <div class="header-container">
-                    <img src="data:image/png;base64,{}" class="logo-img">
-                </div>
-                """.format(image_to_base64(logo)),
-                unsafe_allow_html=True
-            )
-        except Exception as e:
-            st.markdown('<div class="header-container"><h2>Supervisión de Enfermería por Turno</h2></div>', unsafe_allow_html=True)
+    logo_b64 = cargar_logo_base64("escudo_COLOR.jpg")
+    if logo_b64:
+        st.markdown(
+            """
+            <div class="header-container">
+                <img src="data:image/png;base64,{}" class="logo-img">
+            </div>
+            """.format(logo_b64),
+            unsafe_allow_html=True
+        )
     else:
         st.markdown('<div class="header-container"><h2>Supervisión de Enfermería por Turno</h2></div>', unsafe_allow_html=True)
 
+def entrada_log(evento):
+    """Entrada del historial a partir de un evento de traslado"""
+    return {
+        "fecha": datetime.fromisoformat(evento["marca"]).strftime("%d/%m %H:%M:%S"),
+        "nombre": evento["nombre"],
+        "desde": evento["origen"],
+        "hacia": evento["destino"],
+        "rol": evento["rol"],
+        "lote": evento.get("lote")
+    }
+
+def evento_traslado(profesional, origen, destino, lote=None):
+    """Evento inmutable de traslado; identifica a la persona por id y guarda su nombre"""
+    return {
+        "evento": "traslado",
+        "id": profesional["id"],
+        "nombre": profesional["nombre"],
+        "rol": profesional["rol"],
+        "origen": origen,
+        "destino": destino,
+        "lote": lote
+    }
+
+def materializar_tablero():
+    """Reconstruye el tablero de la sesión desde la proyección del diario"""
+    diario = st.session_state.diario
+    estado, seq = diario.estado_actual()
+    st.session_state.servicios = {s: list(ps.values()) for s, ps in estado["columnas"].items()}
+    st.session_state.agregados = AgregadosTablero.desde_columnas(st.session_state.servicios)
+    st.session_state.html_columnas = {}
+    st.session_state.seleccion = {"id": None, "servicio": None}
+    st.session_state.log_movimientos = [
+        entrada_log(e) for e in reversed(diario.eventos_desde(0)[:seq]) if e["evento"] == "traslado"
+    ]
+    st.session_state.seq_diario = seq
+
+def aplicar_evento(evento):
+    """Aplica un evento del diario al tablero de la sesión de forma incremental"""
+    servicios = st.session_state.servicios
+    if evento["evento"] == "alta":
+        servicios.setdefault(evento["columna"], []).append(evento["persona"])
+        st.session_state.agregados.agregar(evento["columna"], evento["persona"])
+    elif evento["evento"] == "traslado":
+        origen, destino = evento["origen"], evento["destino"]
+        idx = next((i for i, p in enumerate(servicios.get(origen, [])) if p["id"] == evento["id"]), None)
+        if idx is None or destino not in servicios:
+            return
+        profesional = servicios[origen].pop(idx)
+        servicios[destino].append(profesional)
+        st.session_state.agregados.mover(profesional, origen, destino)
+        st.session_state.log_movimientos.insert(0, entrada_log(evento))
+
+def sincronizar_tablero():
+    """Aplica a la sesión los eventos del diario que todavía no refleja"""
+    eventos = st.session_state.diario.eventos_desde(st.session_state.seq_diario)
+    if any(e["evento"] == "inicio" for e in eventos):
+        materializar_tablero()
+        return
+    for evento in eventos:
+        aplicar_evento(evento)
+    st.session_state.seq_diario += len(eventos)
+
+def registrar_eventos(eventos):
+    """Anexa los eventos al diario y los refleja en el tablero de la sesión"""
+    st.session_state.diario.registrar(eventos)
+    sincronizar_tablero()
+
 def mover_personal(servicio_destino):
     """Mueve el personal seleccionado al servicio destino"""
     origen = st.session_state.seleccion["servicio"]
-    nombre = st.session_state.seleccion["nombre"]
+    id_persona = st.session_state.seleccion["id"]
     
     if origen and servicio_destino != origen:
-        for idx, p in enumerate(st.session_state.servicios[origen]):
-            if p["nombre"] == nombre:
-                profesional = st.session_state.servicios[origen].pop(idx)
-                st.session_state.servicios[servicio_destino].append(profesional)
-                
-                st.session_state.log_movimientos.insert(0, {
-                    "fecha": datetime.now().strftime("%H:%M:%S"),
-                    "nombre": nombre,
-                    "desde": origen,
-                    "hacia": servicio_destino,
-                    "rol": profesional["rol"]
-                })
-                break
+        profesional = next((p for p in st.session_state.servicios[origen] if p["id"] == id_persona), None)
+        if profesional is not None:
+            registrar_eventos([evento_traslado(profesional, origen, servicio_destino)])
+            registrar_en_plantilla(profesional, servicio_destino)
         
-        st.session_state.seleccion = {"nombre": None, "servicio": None}
-        st.rerun()
+        st.session_state.seleccion = {"id": None, "servicio": None}
+        # Origen y destino cambian: un fragmento no puede refrescar a otro
+        st.session_state.refrescar_tablero = True
+
+def registrar_en_plantilla(profesional, servicio):
+    """Anota el cambio para escribirlo en la plantilla compartida con el siguiente guardado"""
+    escritor = st.session_state.escritor_plantilla
+    if escritor is not None and "id" in profesional:
+        escritor.registrar(profesional["id"], servicio)
+
+def guardar_plantilla():
+    """Escribe en bloque los movimientos pendientes en la plantilla compartida"""
+    try:
+        conflictos = st.session_state.escritor_plantilla.guardar()
+    except Exception as e:
+        st.error(f"No se pudo guardar la plantilla: {str(e)}")
+        return
+    if conflictos:
+        st.warning(f"{len(conflictos)} movimiento(s) no se guardaron: la plantilla cambió entretanto para esas personas")
+    else:
+        st.success("✅ Plantilla actualizada")
+
+def mover_lote(movimientos):
+    """Aplica varios movimientos (id, origen, destino) en una sola operación.
+
+    Todos los movimientos se validan antes de escribir; si alguno ya no es
+    posible no se registra ninguno. Los eventos comparten un mismo lote y se
+    anexan al diario en una sola escritura.
+    """
+    servicios = st.session_state.servicios
+    lote = uuid.uuid4().hex[:8]
+    eventos = []
+    movidos = []
+
+    for id_persona, origen, destino in movimientos:
+        if origen == destino or destino not in servicios:
+            continue
+        profesional = next((p for p in servicios.get(origen, []) if p["id"] == id_persona), None)
+        if profesional is None:
+            return 0
+        eventos.append(evento_traslado(profesional, origen, destino, lote))
+        movidos.append((profesional, destino))
+
+    if eventos:
+        registrar_eventos(eventos)
+        for profesional, destino in movidos:
+            registrar_en_plantilla(profesional, destino)
+        st.session_state.seleccion = {"id": None, "servicio": None}
+    return len(eventos)
 
 def show_role_legend():
-    """Muestra la leyenda de roles en la parte superior"""
-    st.markdown("""
+    """Muestra la leyenda de roles con sus totales en la parte superior"""
+    roles = st.session_state.agregados.total_rol
+    st.markdown(f"""
     <div class="leyenda-horizontal">
         <div class="leyenda-item">
             <div class="role-badge" style="background-color: #ff5252;"></div>
-            <span>Especialista</span>
+            <span>Especialista ({roles["especialista"]})</span>
         </div>
         <div class="leyenda-item">
             <div class="role-badge" style="background-color: #4caf50;"></div>
-            <span>General-A</span>
+            <span>General-A ({roles["general-a"]})</span>
         </div>
         <div class="leyenda-item">
             <div class="role-badge" style="background-color: #2196f3;"></div>
-            <span>General-B</span>
+            <span>General-B ({roles["general-b"]})</span>
         </div>
         <div class="leyenda-item">
             <div class="role-badge" style="background-color: #9c27b0;"></div>
-            <span>General-C</span>
+            <span>General-C ({roles["general-c"]})</span>
         </div>
         <div class="leyenda-item">
             <div class="role-badge" style="background-color: #ff9800;"></div>
-            <span>Camillero</span>
+            <span>Camillero ({roles["camillero"]})</span>
         </div>
     </div>
     """, unsafe_allow_html=True)
 
+def seleccionar_profesional(servicio, id_persona):
+    """Alterna la selección; solo se refrescan las columnas afectadas"""
+    origen_previo = st.session_state.seleccion["servicio"]
+    if st.session_state.seleccion == {"id": id_persona, "servicio": servicio}:
+        st.session_state.seleccion = {"id": None, "servicio": None}
+    else:
+        st.session_state.seleccion = {"id": id_persona, "servicio": servicio}
+
+    # Si la selección previa estaba en otra columna hay que refrescarla también
+    if origen_previo not in (None, servicio):
+        st.session_state.refrescar_tablero = True
+
+def cancelar_seleccion():
+    """Limpia la selección actual"""
+    st.session_state.seleccion = {"id": None, "servicio": None}
+
+def solicitar_movimiento(servicio):
+    """Mueve la selección al servicio si procede desde otro"""
+    seleccion = st.session_state.seleccion
+    if seleccion["id"] and seleccion["servicio"] and servicio != seleccion["servicio"]:
+        mover_personal(servicio)
+    else:
+        st.toast("Selecciona primero un profesional de otro servicio", icon="ℹ️")
+
 def show_main_content():
     """Muestra el contenido principal de la aplicación"""
     
     # Mostrar leyenda de roles en la parte superior
     show_role_legend()
     
-    # Mostrar selección actual si hay alguna
-    if st.session_state.seleccion["nombre"]:
-        col1, col2 = st.columns([4, 1])
-        with col1:
-            st.markdown(f"""
-                <div class="seleccionado-box">
-                    <b>Profesional seleccionado:</b> {st.session_state.seleccion["nombre"]}
-                </div>
-            """, unsafe_allow_html=True)
-        with col2:
-            if st.button("❌ Cancelar selección", use_container_width=True):
-                st.session_state.seleccion = {"nombre": None, "servicio": None}
-                st.rerun()
-    
     st.markdown("""
         <div style="background-color: #f0f8ff; padding: 10px; border-radius: 5px; margin-bottom: 20px; font-size: 0.9em;">
             <b>Instrucciones:</b><br>
-            1. Haz clic en un profesional para seleccionarlo<br>
+            1. Elige un profesional en el selector de su servicio<br>
             2. Haz clic en "Mover aquí" del servicio destino
         </div>
     """, unsafe_allow_html=True)
 
-    # Mostrar servicios en columnas
+    # Mostrar servicios en columnas, cada una como fragmento independiente
     cols = st.columns(3)
-    for i, (servicio, profesionales) in enumerate(st.session_state.servicios.items()):
+    for i, servicio in enumerate(st.session_state.servicios):
         with cols[i % 3]:
-            st.markdown(f"### {servicio}")
-            for p in profesionales:
-                selected = (st.session_state.seleccion["nombre"] == p["nombre"] and 
-                          st.session_state.seleccion["servicio"] == servicio)
-                
-                # Contenedor clickeable para cada profesional
-                container = st.container()
-                with container:
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f'<div class="profesional-name">{p["nombre"]}</div>', unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f'<div class="role-badge" style="background-color: {p["color"]};"></div>', unsafe_allow_html=True)
-                
-                # Manejar el clic en el contenedor
-                if container.button("", key=f"btn_{servicio}_{p['nombre']}", help=p['nombre']):
-                    if selected:
-                        st.session_state.seleccion = {"nombre": None, "servicio": None}
-                    else:
-                        st.session_state.seleccion = {"nombre": p["nombre"], "servicio": servicio}
-                    st.rerun()
-                
-                # Aplicar estilo de selección
-                if selected:
-                    st.markdown(
-                        f"""
-                        <style>
-                            div[data-testid="stHorizontalBlock"] > div[data-testid="stVerticalBlock"] > div[data-testid="element-container"] > div[data-testid="stMarkdown"] > div[data-testid="stMarkdownContainer"] > div {{
-                                background-color: #fff8e1 !important;
-                                border: 2px solid #ffd54f !important;
-                            }}
-                        </style>
-                        """,
-                        unsafe_allow_html=True
-                    )
-            
-            # Botón para mover al servicio actual
-            if (st.session_state.seleccion["nombre"] and 
-                st.session_state.seleccion["servicio"] and 
-                servicio != st.session_state.seleccion["servicio"]):
-                
-                if st.button(f"Mover {st.session_state.seleccion['nombre'].split()[0]} aquí", 
-                           key=f"mover_{servicio}", use_container_width=True):
-                    mover_personal(servicio)
+            show_servicio_column(servicio)
+
+def html_columna(servicio, seleccionado):
+    """Construye la columna completa de un servicio como un único bloque HTML"""
+    partes = [
+        '<div class="servicio-container">',
+        f'<div class="servicio-header">{escape(servicio)}</div>',
+        f'<div class="profesional-name">{st.session_state.agregados.enfermeras[servicio]} profesional(es)</div>'
+    ]
+    for p in st.session_state.servicios[servicio]:
+        partes.append(f"""
+            <div class="profesional-container{' selected' if p["id"] == seleccionado else ''}">
+                <div class="profesional-name">{escape(p["nombre"])}</div>
+                <div class="role-badge" style="background-color: {p["color"]};"></div>
+            </div>""")
+    partes.append('</div>')
+    return "".join(partes)
+
+def html_columna_cacheado(servicio):
+    """Devuelve el HTML de la columna, regenerándolo solo si cambió su versión o su selección"""
+    seleccion = st.session_state.seleccion
+    seleccionado = seleccion["id"] if seleccion["servicio"] == servicio else None
+    clave = (st.session_state.agregados.version[servicio], seleccionado)
+
+    cacheado = st.session_state.html_columnas.get(servicio)
+    if cacheado is None or cacheado[0] != clave:
+        cacheado = (clave, html_columna(servicio, seleccionado))
+        st.session_state.html_columnas[servicio] = cacheado
+    return cacheado[1]
+
+def cambiar_seleccion(servicio):
+    """Callback del selector de la columna"""
+    id_persona = st.session_state[f"sel_{servicio}"]
+    if id_persona is None:
+        cancelar_seleccion()
+    elif st.session_state.seleccion != {"id": id_persona, "servicio": servicio}:
+        seleccionar_profesional(servicio, id_persona)
+
+@st.fragment
+def show_servicio_column(servicio):
+    """Muestra la columna de un servicio; un clic solo re-ejecuta este fragmento"""
+    # Un movimiento o un cambio de columna exige refrescar el tablero completo
+    if st.session_state.pop("refrescar_tablero", False):
+        st.rerun()
 
+    seleccion = st.session_state.seleccion
+    st.markdown(html_columna_cacheado(servicio), unsafe_allow_html=True)
+
+    # Un único selector por columna en lugar de un botón por profesional; las
+    # opciones son ids porque dos personas pueden llamarse igual
+    clave_selector = f"sel_{servicio}"
+    nombres = {p["id"]: p["nombre"] for p in st.session_state.servicios[servicio]}
+    st.session_state[clave_selector] = seleccion["id"] if seleccion["servicio"] == servicio else None
+    st.selectbox(
+        "Seleccionar",
+        list(nombres),
+        format_func=nombres.get,
+        key=clave_selector,
+        placeholder="Seleccionar profesional…",
+        label_visibility="collapsed",
+        on_change=cambiar_seleccion,
+        args=(servicio,)
+    )
+
+    if seleccion["servicio"] == servicio and seleccion["id"]:
+        st.button("❌ Cancelar selección", key=f"cancelar_{servicio}", use_container_width=True,
+                  on_click=cancelar_seleccion)
+
+    # Botón para mover al servicio actual; siempre presente para que las demás
+    # columnas no tengan que re-ejecutarse cuando cambia la selección
+    st.button("⇨ Mover aquí", key=f"mover_{servicio}", use_container_width=True,
+              on_click=solicitar_movimiento, args=(servicio,))
+
+@st.fragment
+def show_movimiento_lote():
+    """Panel para reasignar varios profesionales a la vez (cambio de turno)"""
+    with st.expander("🔀 Movimiento por lotes", expanded=False):
+        st.caption("Cambia el destino de varios profesionales, revisa la vista previa y confirma en un solo paso.")
+        servicios = list(st.session_state.servicios)
+        filas = [
+            {"id": p["id"], "Profesional": p["nombre"], "Rol": p["rol"], "Servicio actual": servicio, "Destino": servicio}
+            for servicio, profesionales in st.session_state.servicios.items()
+            for p in profesionales
+        ]
+
+        editadas = st.data_editor(
+            filas,
+            column_config={
+                "Destino": st.column_config.SelectboxColumn("Destino", options=servicios, required=True)
+            },
+            disabled=["id", "Profesional", "Rol", "Servicio actual"],
+            column_order=["Profesional", "Rol", "Servicio actual", "Destino"],
+            hide_index=True,
+            use_container_width=True,
+            key="editor_lote"
+        )
+
+        movimientos = [
+            (f["id"], f["Servicio actual"], f["Destino"])
+            for f in editadas if f["Destino"] != f["Servicio actual"]
+        ]
+        if not movimientos:
+            st.info("Sin cambios pendientes", icon="ℹ️")
+            return
+
+        # Vista previa de la plantilla resultante por servicio
+        propuesto = {s: len(ps) for s, ps in st.session_state.servicios.items()}
+        for _, origen, destino in movimientos:
+            propuesto[origen] -= 1
+            propuesto[destino] += 1
+        st.dataframe(
+            [
+                {"Servicio": s, "Actual": len(ps), "Propuesto": propuesto[s], "Cambio": propuesto[s] - len(ps)}
+                for s, ps in st.session_state.servicios.items()
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+        if st.button(f"✅ Confirmar lote ({len(movimientos)} movimientos)", type="primary", use_container_width=True):
+            if mover_lote(movimientos):
+                del st.session_state["editor_lote"]
+                st.rerun()
+            st.error("El tablero cambió mientras editabas el lote; revisa los destinos")
+
+@st.fragment
+def show_tablero_historico():
+    """Reconstruye el tablero del turno en un instante anterior para la entrega de turno"""
+    with st.expander("🕒 Tablero en un instante anterior", expanded=False):
+        if "fecha_historico" not in st.session_state:
+            ahora = datetime.now()
+            st.session_state.fecha_historico = ahora.date()
+            st.session_state.hora_historico = ahora.time().replace(second=0, microsecond=0)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fecha = st.date_input("Fecha", key="fecha_historico")
+        with col2:
+            hora = st.time_input("Hora", key="hora_historico", step=60)
+
+        estado = st.session_state.diario.estado_en(datetime.combine(fecha, hora))
+        filas = [
+            {"Servicio": servicio, "Profesional": p["nombre"], "Rol": p["rol"]}
+            for servicio, profesionales in estado["columnas"].items()
+            for p in profesionales.values()
+        ]
+        if filas:
+            st.dataframe(filas, hide_index=True, use_container_width=True)
+        else:
+            st.info("No hay registros del turno antes de ese instante", icon="ℹ️")
+
+@st.fragment
 def show_summary():
     """Muestra el resumen de movimientos al final de la página"""
     st.markdown("""
@@ -300,13 +470,7 @@ def show_summary():
     if st.session_state.log_movimientos:
         # Mostrar los últimos 5 movimientos
         for mov in st.session_state.log_movimientos[:5]:
-            color_rol = {
-                "especialista": "#ff5252",
-                "general-a": "#4caf50",
-                "general-b": "#2196f3",
-                "general-c": "#9c27b0",
-                "camillero": "#ff9800"
-            }.get(mov["rol"], "#000000")
+            color_rol = COLORES_ROL.get(mov["rol"], "#000000")
             
             st.markdown(f"""
                 <div class="historial-item">
@@ -332,6 +496,19 @@ def show_summary():
         """, unsafe_allow_html=True)
     else:
         st.info("No hay movimientos registrados", icon="ℹ️")
+
+    st.markdown(f"""
+        <div style="margin-top: 15px; font-size: 0.9em;">
+            <b>Personal en turno:</b> {st.session_state.agregados.total_enfermeras}
+        </div>
+    """, unsafe_allow_html=True)
+
+    escritor = st.session_state.escritor_plantilla
+    if escritor is not None:
+        st.caption(f"Plantilla versión {escritor.version} · turno {turno_actual()}")
+        if len(escritor):
+            if st.button(f"💾 Guardar en plantilla ({len(escritor)} cambios)", use_container_width=True):
+                guardar_plantilla()
     
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -340,8 +517,11 @@ def main():
     setup_page_config()
     load_custom_styles()
     initialize_session_state()
+    sincronizar_tablero()
     show_logo()  # Mostrar logo primero
     show_main_content()
+    show_movimiento_lote()
+    show_tablero_historico()
     show_summary()
 
 if __name__ == "__main__":
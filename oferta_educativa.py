@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from html import escape
+from types import MappingProxyType
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+RUTA_OFERTA = os.environ.get(
+    "CATALOGO_ESCUELA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogos", "escuela.json")
+)
+
+@dataclass(frozen=True)
+class Programa:
+    id: str
+    nombre: str
+    categoria: str
+    duracion: str
+    modalidad: str
+    distintivo: str
+    descripcion: str
+    documentos_pdf: tuple
+    documentacion: tuple
+    costos: MappingProxyType
+    tarjeta: str
+
+def _tarjeta(programa):
+    """HTML de la tarjeta de la oferta educativa"""
+    return f"""
+    <div class="programa-card">
+        <h3>{escape(programa['nombre'])}</h3>
+        <div style="display: flex; gap: 10px; flex-wrap: wrap; margin: 10px 0;">
+            <span class="badge badge-primary">{escape(programa['duracion'])}</span>
+            <span class="badge badge-secondary">{escape(programa['modalidad'])}</span>
+            <span class="badge badge-success">{escape(programa['distintivo'])}</span>
+        </div>
+        <p>{escape(programa['descripcion'])}</p>
+    </div>
+    """
+
+class OfertaEducativa:
+    """Programas de la escuela con sus documentos, costos y tarjeta ya armada.
+
+    Se construye una vez por proceso a partir del archivo del catálogo: los
+    programas se buscan por id en un mapa de solo lectura y el HTML de cada
+    tarjeta se genera aquí, no en cada rerun. Una referencia a una lista de
+    documentos o de costos que no existe falla al cargar, no al mostrarla.
+    """
+
+    def __init__(self, datos):
+        self.version = datos["version"]
+        programas = {}
+        for p in datos["programas"]:
+            programas[p["id"]] = Programa(
+                id=p["id"],
+                nombre=p["nombre"],
+                categoria=p["categoria"],
+                duracion=p["duracion"],
+                modalidad=p["modalidad"],
+                distintivo=p["distintivo"],
+                descripcion=p["descripcion"],
+                documentos_pdf=tuple(datos["documentos_pdf"][p["documentos_pdf"]]),
+                documentacion=tuple(datos["documentacion"][p["documentacion"]]),
+                costos=MappingProxyType(dict(datos["costos"][p["costos"]])),
+                tarjeta=_tarjeta(p)
+            )
+        self.programas = MappingProxyType(programas)
+        self.ids = tuple(programas)
+        self.por_nombre = MappingProxyType({p.nombre: p.id for p in programas.values()})
+        # (id, título, columnas, ids de sus programas) en el orden de las pestañas
+        self.categorias = tuple(
+            (c["id"], c["titulo"], c["columnas"], tuple(i for i, p in programas.items() if p.categoria == c["id"]))
+            for c in datos["categorias"]
+        )
+
+    def programa(self, id_programa):
+        """Programa por id; None si no existe"""
+        return self.programas.get(id_programa)
+
+@st.cache_resource(show_spinner=False)
+def cargar_oferta(ruta=RUTA_OFERTA):
+    """Oferta educativa compartida por todas las sesiones"""
+    with open(ruta, encoding="utf-8") as f:
+        oferta = OfertaEducativa(json.load(f))
+    logger.info(f"Oferta educativa {oferta.version} cargada de {ruta}")
+    return oferta
@@ -0,0 +1,232 @@
+import hashlib
+import io
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import paramiko
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+TURNOS = {
+    'MAÑANA': 'M', 'MANANA': 'M', 'AM': 'M', 'M': 'M',
+    'TARDE': 'T', 'PM': 'T', 'T': 'T',
+    'NOCHE': 'N', 'NOCTURNO': 'N', 'N': 'N'
+}
+
+# Hora de inicio de cada turno; la noche cruza la medianoche
+INICIO_TURNO = {'M': 7, 'T': 15, 'N': 21}
+
+ROLES = {
+    'ESPECIALISTA': 'especialista',
+    'GENERAL A': 'general-a', 'GENERAL-A': 'general-a', 'A': 'general-a',
+    'GENERAL B': 'general-b', 'GENERAL-B': 'general-b', 'B': 'general-b',
+    'GENERAL C': 'general-c', 'GENERAL-C': 'general-c', 'C': 'general-c',
+    'CAMILLERO': 'camillero'
+}
+
+COLORES_ROL = {
+    "especialista": "#ff5252",
+    "general-a": "#4caf50",
+    "general-b": "#2196f3",
+    "general-c": "#9c27b0",
+    "camillero": "#ff9800"
+}
+
+VALORES_VERDADEROS = ['true', '1', 'si', 'sí', 'x', 'yes']
+
+# Columnas sin las que no se puede armar el tablero
+COLUMNAS_PLANTILLA = ['ID', 'Nombre', 'Servicio', 'Turno']
+
+def normalizar_turno(serie: pd.Series) -> pd.Series:
+    """Convierte los nombres de turno del archivo a su código M/T/N"""
+    return serie.astype(str).str.strip().str.upper().map(TURNOS).fillna('')
+
+def turno_actual(ahora: datetime = None) -> str:
+    """Código del turno en curso según la hora"""
+    hora = (ahora or datetime.now()).hour
+    if INICIO_TURNO['M'] <= hora < INICIO_TURNO['T']:
+        return 'M'
+    if INICIO_TURNO['T'] <= hora < INICIO_TURNO['N']:
+        return 'T'
+    return 'N'
+
+def clave_turno(ahora: datetime = None) -> str:
+    """Fecha de inicio y código del turno en curso; la noche pertenece al día en que empieza"""
+    ahora = ahora or datetime.now()
+    turno = turno_actual(ahora)
+    fecha = ahora.date()
+    if turno == 'N' and ahora.hour < INICIO_TURNO['M']:
+        fecha -= timedelta(days=1)
+    return f"{fecha.isoformat()}_{turno}"
+
+def version_contenido(contenido: str) -> str:
+    """Versión de un archivo de plantilla: hash de su contenido"""
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:12]
+
+@st.cache_data(show_spinner=False)
+def procesar_enfermeras(contenido: str) -> pd.DataFrame:
+    """Plantilla de enfermeras tipada; se procesa una vez por contenido.
+
+    Conserva las columnas del archivo para que pueda volver a guardarse tal cual.
+    """
+    if not contenido.strip():
+        return pd.DataFrame()
+
+    df = pd.read_csv(io.StringIO(contenido), sep=',')
+    df.columns = df.columns.str.strip().str.replace(' ', '_')
+    logger.info(f"Columnas en archivo enfermeras: {df.columns.tolist()}")
+
+    for col in ['Servicio', 'Turno', 'Nombre']:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+
+    if 'Presente' in df.columns:
+        df['Presente'] = df['Presente'].astype(str).str.strip().str.lower().isin(VALORES_VERDADEROS)
+    else:
+        df['Presente'] = True
+    return df
+
+def configuracion_sftp():
+    """Conexión y ruta de la plantilla desde secrets.toml; None si no está configurada"""
+    try:
+        return {
+            'host': st.secrets["sftp"]["host"],
+            'user': st.secrets["sftp"]["user"],
+            'password': st.secrets["sftp"]["password"],
+            'port': int(st.secrets["sftp"]["port"]),
+            'ruta': f'{st.secrets["sftp"]["dir"]}/{st.secrets["archivos"]["enfermeras"]}'
+        }
+    except Exception:
+        return None
+
+def _abrir_sftp(config):
+    transport = paramiko.Transport((config['host'], config['port']))
+    transport.connect(username=config['user'], password=config['password'])
+    transport.sock.settimeout(10)
+    return transport, paramiko.SFTPClient.from_transport(transport)
+
+def leer_remoto(config) -> str:
+    """Lee el archivo de plantilla del servidor"""
+    transport, sftp = _abrir_sftp(config)
+    try:
+        with sftp.file(config['ruta'], 'r') as remote_file:
+            return remote_file.read().decode('utf-8-sig')
+    finally:
+        sftp.close()
+        transport.close()
+
+def escribir_remoto(config, contenido: str):
+    """Sobrescribe el archivo de plantilla en el servidor"""
+    transport, sftp = _abrir_sftp(config)
+    try:
+        with sftp.file(config['ruta'], 'w') as remote_file:
+            remote_file.write(contenido)
+    finally:
+        sftp.close()
+        transport.close()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def cargar_plantilla(config):
+    """Plantilla remota y su versión, compartida por todas las sesiones durante 5 minutos"""
+    contenido = leer_remoto(config)
+    return procesar_enfermeras(contenido), version_contenido(contenido)
+
+def plantilla_turno(df: pd.DataFrame, turno: str) -> dict:
+    """Personal presente en el turno agrupado por servicio, en el formato del tablero.
+
+    Los servicios sin nadie en el turno aparecen vacíos para poder recibir movimientos.
+    """
+    servicios = {s: [] for s in df['Servicio'].unique()}
+    en_turno = df[df['Presente'] & (normalizar_turno(df['Turno']) == turno)]
+
+    if 'Rol' in en_turno.columns:
+        roles = en_turno['Rol'].astype(str).str.strip().str.upper().map(ROLES).fillna('general-a')
+    else:
+        roles = pd.Series('general-a', index=en_turno.index)
+
+    for id_enfermera, nombre, servicio, rol in zip(en_turno['ID'].tolist(), en_turno['Nombre'], en_turno['Servicio'], roles):
+        servicios[servicio].append({"id": id_enfermera, "nombre": nombre, "rol": rol, "color": COLORES_ROL[rol]})
+    return servicios
+
+class EscritorPlantilla:
+    """Acumula los cambios de servicio del tablero y los escribe en bloque.
+
+    Los movimientos de una misma persona se fusionan (solo cuenta el último
+    destino). Al guardar se relee el archivo: si su versión ya no es la que se
+    cargó, se aplican igualmente los cambios de las filas que nadie más tocó y
+    se devuelven como conflictos las que cambiaron de servicio entretanto.
+    """
+
+    def __init__(self, config, base: pd.DataFrame, version: str):
+        self.config = config
+        self.version = version
+        self.servicio_base = dict(zip(base['ID'], base['Servicio']))
+        self.pendientes = {}
+
+    def __len__(self):
+        return len(self.pendientes)
+
+    def registrar(self, id_enfermera, servicio):
+        """Anota el nuevo servicio de una persona"""
+        if self.servicio_base.get(id_enfermera) == servicio:
+            self.pendientes.pop(id_enfermera, None)
+        else:
+            self.pendientes[id_enfermera] = servicio
+
+    def guardar(self):
+        """Escribe los cambios pendientes; devuelve los ids en conflicto.
+
+        Solo una sesión del proceso escribe a la vez, y la versión del archivo
+        se vuelve a comprobar justo antes de sobrescribirlo: si otro la cambió
+        mientras se preparaba el contenido, se repite con la nueva.
+        """
+        if not self.pendientes:
+            return []
+
+        with candado_plantilla():
+            contenido = leer_remoto(self.config)
+            while True:
+                actual = procesar_enfermeras(contenido)
+                conflictos = []
+                if version_contenido(contenido) != self.version:
+                    servicio_actual = dict(zip(actual['ID'], actual['Servicio']))
+                    conflictos = [
+                        i for i in self.pendientes
+                        if servicio_actual.get(i) != self.servicio_base.get(i)
+                    ]
+
+                cambios = {i: s for i, s in self.pendientes.items() if i not in conflictos}
+                if not cambios:
+                    break
+                nuevo = _cambiar_servicios(contenido, actual['ID'].map(cambios))
+                releido = leer_remoto(self.config)
+                if version_contenido(releido) != version_contenido(contenido):
+                    contenido = releido
+                    continue
+                escribir_remoto(self.config, nuevo)
+                actual = procesar_enfermeras(nuevo)
+                self.version = version_contenido(nuevo)
+                cargar_plantilla.clear()
+                break
+
+        self.servicio_base = dict(zip(actual['ID'], actual['Servicio']))
+        self.pendientes = {}
+        return conflictos
+
+def _cambiar_servicios(contenido: str, nuevos: pd.Series) -> str:
+    """El archivo con el servicio nuevo en las filas indicadas; el resto de valores se copia como se leyó"""
+    crudo = pd.read_csv(io.StringIO(contenido), sep=',', dtype=str, keep_default_na=False)
+    columna = crudo.columns[crudo.columns.str.strip().str.replace(' ', '_') == 'Servicio'][0]
+    cambiar = nuevos.notna().to_numpy()
+    crudo.loc[cambiar, columna] = nuevos[cambiar].to_numpy()
+    buffer = io.StringIO()
+    crudo.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def candado_plantilla():
+    """Candado compartido por las sesiones que escriben la plantilla"""
+    return threading.Lock()
@@ -0,0 +1,142 @@
+from dataclasses import asdict, dataclass, field, fields
+from datetime import date, time
+
+@dataclass
+class Contexto:
+    fecha_evento: date = field(default_factory=date.today)
+    turno: str = "Matutino (6:00-14:00)"
+    ubicacion: str = "UCIC (Unidad Coronaria)"
+    procedimiento_asociado: str = ""
+
+@dataclass
+class Clasificacion:
+    categoria_principal: str = ""
+    subcategoria: str = ""
+    escala_grace: str = "Bajo riesgo (sin repercusión hemodinámica)"
+    detectado_en: str = "Antes del procedimiento"
+
+@dataclass
+class Factores:
+    comorbilidad: bool = False
+    anatomia: bool = False
+    urgencia: bool = False
+    equipo: bool = False
+    imagen: bool = False
+    acceso: bool = False
+    experiencia: bool = False
+    comunicacion: bool = False
+    fatiga: bool = False
+
+@dataclass
+class Paciente:
+    nombre_completo: str = ""
+    edad: str = ""
+    imc: str = ""
+    numero_cama: str = ""
+    riesgo_previo: str = ""
+
+@dataclass
+class Laboratorio:
+    examenes_solicitados: list = field(default_factory=list)
+    valores: dict = field(default_factory=dict)
+
+    def a_dict(self):
+        return {"examenes_solicitados": list(self.examenes_solicitados), **self.valores}
+
+@dataclass
+class Medicamento:
+    nombre: str = ""
+    dosis: str = ""
+    unidad: str = "mg"
+    via: str = "EV"
+    error: bool = False
+    tipo_error: str = ""
+
+    def a_dict(self):
+        datos = asdict(self)
+        if not self.error:
+            del datos["tipo_error"]
+        return datos
+
+@dataclass
+class Manejo:
+    accion_inmediata: str = ""
+    seguimiento: list = field(default_factory=list)
+
+@dataclass
+class Evidencia:
+    """Referencias a la evidencia guardada; los archivos viven en el almacén por hash"""
+    opcion: str = "Ninguno"
+    elementos: list = field(default_factory=list)
+
+    def a_dict(self):
+        return {"elementos": [dict(e) for e in self.elementos]}
+
+@dataclass
+class Defuncion:
+    fallecio: bool = False
+    hora_defuncion: time = time(0, 0)
+    folio_certificado: str = ""
+    causa_muerte: str = ""
+    autopsia: str = "No"
+    obituario_patologia: str = ""
+
+@dataclass
+class Validacion:
+    reporter_name: str = ""
+    reporter_role: str = ""
+    supervisor_review: bool = False
+
+@dataclass
+class BorradorReporte:
+    """Borrador tipado del reporte; cada sección del formulario escribe solo en la suya"""
+    contexto: Contexto = field(default_factory=Contexto)
+    clasificacion: Clasificacion = field(default_factory=Clasificacion)
+    factores: Factores = field(default_factory=Factores)
+    paciente: Paciente = field(default_factory=Paciente)
+    laboratorio: Laboratorio = field(default_factory=Laboratorio)
+    medicamentos: list = field(default_factory=lambda: [Medicamento()])
+    manejo: Manejo = field(default_factory=Manejo)
+    evidencia: Evidencia = field(default_factory=Evidencia)
+    defuncion: Defuncion = field(default_factory=Defuncion)
+    validacion: Validacion = field(default_factory=Validacion)
+
+    def campos(self):
+        """Valores planos {"seccion.campo": valor}, para guardar solo los que cambian"""
+        campos = {"medicamentos": [asdict(m) for m in self.medicamentos]}
+        for seccion in fields(self):
+            if seccion.name == "medicamentos":
+                continue
+            valores = getattr(self, seccion.name)
+            for campo in fields(valores):
+                campos[f"{seccion.name}.{campo.name}"] = getattr(valores, campo.name)
+        return campos
+
+    @classmethod
+    def desde_campos(cls, campos):
+        """Reconstruye un borrador a partir de sus campos guardados"""
+        borrador = cls()
+        for clave, valor in campos.items():
+            if clave == "medicamentos":
+                borrador.medicamentos = [Medicamento(**m) for m in valor] or [Medicamento()]
+            else:
+                seccion, campo = clave.split(".", 1)
+                # Campos de versiones anteriores del borrador se ignoran
+                if hasattr(getattr(borrador, seccion, None), campo):
+                    setattr(getattr(borrador, seccion), campo, valor)
+        return borrador
+
+    def a_dict(self, fecha_reporte):
+        """Reporte con la misma estructura que se envía y se muestra al usuario"""
+        return {
+            **asdict(self.contexto),
+            **asdict(self.clasificacion),
+            "factores_contribuyentes": asdict(self.factores),
+            "datos_paciente": asdict(self.paciente),
+            "laboratorio": self.laboratorio.a_dict(),
+            "medicamentos": [m.a_dict() for m in self.medicamentos],
+            "manejo": asdict(self.manejo),
+            "evidencia_multimedia": self.evidencia.a_dict(),
+            "datos_defuncion": asdict(self.defuncion) if self.defuncion.fallecio else None,
+            "validacion": {**asdict(self.validacion), "fecha_reporte": fecha_reporte}
+        }
@@ -5,11 +5,23 @@ import os
 import base64
 from io import BytesIO
 import uuid
+from html import escape
+from balanceo import proponer_reasignaciones
+from agregados import AgregadosTablero
+from indice import IndiceBusqueda
+from atenciones import RegistroAtenciones
+from censo import COLORES_ROL, leer_censo, validar_censo, construir_habitaciones, exportar_censo
+from tema import aplicar_tema
+from diario import ULTIMOS_TRASLADOS, abrir_diario
 
 def initialize_session_state():
     """Inicializa el estado de la sesión con las habitaciones, pacientes y enfermeras"""
-    if 'habitaciones' not in st.session_state:
-        st.session_state.habitaciones = {
+    if 'diario' not in st.session_state:
+        st.session_state.diario = abrir_diario("servicios6")
+
+    # El tablero de demostración solo se registra si el diario está vacío
+    if not len(st.session_state.diario):
+        habitaciones_iniciales = {
             "Habitación 101": {
                 "pacientes": [
                     {"id": str(uuid.uuid4()), "tipo": "paciente", "nombre": "Pas: Juan Pérez", "diagnostico": "Infarto agudo de miocardio", "estado": "crítico", "color": "#ff5252"},
@@ -48,15 +60,12 @@ def initialize_session_state():
                 ]
             }
         }
+        st.session_state.diario.iniciar({
+            h: d["pacientes"] + d["enfermeras"] for h, d in habitaciones_iniciales.items()
+        })
 
-    if 'seleccion' not in st.session_state:
-        st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
-        
-    if 'log_movimientos' not in st.session_state:
-        st.session_state.log_movimientos = []
-        
-    if 'log_atenciones' not in st.session_state:
-        st.session_state.log_atenciones = []
+    if 'habitaciones' not in st.session_state:
+        materializar_tablero()
     
     if 'nuevo_nombre' not in st.session_state:
         st.session_state.nuevo_nombre = ""
@@ -86,136 +95,7 @@ def setup_page_config():
 
 def load_custom_styles():
     """Carga los estilos CSS personalizados"""
-    st.markdown("""
-        <style>
-        .header-container {
-            display: flex;
-            justify-content: center;
-            margin-bottom: 20px;
-        }
-        .logo-img {
-            max-height: 80px;
-        }
-        .habitacion-container {
-            border: 2px solid #4a8cff;
-            border-radius: 10px;
-            padding: 15px;
-            margin-bottom: 20px;
-            background-color: #f8fbff;
-        }
-        .habitacion-header {
-            font-size: 1.3em;
-            font-weight: bold;
-            color: #2c5fd1;
-            margin-bottom: 15px;
-            text-align: center;
-        }
-        .persona-container {
-            display: flex;
-            flex-direction: column;
-            padding: 12px;
-            margin: 8px 0;
-            background-color: white;
-            border-radius: 8px;
-            border: 1px solid #ddd;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-        }
-        .persona-container:hover {
-            background-color: #f0f6ff;
-        }
-        .selected {
-            background-color: #fff8e1 !important;
-            border: 2px solid #ffd54f !important;
-        }
-        .estado-badge {
-            width: 14px;
-            height: 14px;
-            border-radius: 50%;
-            display: inline-block;
-            margin-left: 8px;
-        }
-        .persona-name {
-            font-weight: bold;
-            font-size: 1.05em;
-            margin-bottom: 4px;
-        }
-        .persona-info {
-            font-size: 0.85em;
-            color: #555;
-            margin-bottom: 6px;
-        }
-        .historial-item {
-            background-color: #f8f9fa;
-            border-radius: 8px;
-            padding: 12px;
-            margin-bottom: 12px;
-            border-left: 4px solid #4a8cff;
-            font-size: 0.85em;
-        }
-        .leyenda-horizontal {
-            display: flex;
-            gap: 15px;
-            flex-wrap: wrap;
-            margin-bottom: 15px;
-            justify-content: center;
-            padding: 10px;
-            background-color: #f0f8ff;
-            border-radius: 5px;
-        }
-        .leyenda-item {
-            display: flex;
-            align-items: center;
-            gap: 5px;
-            font-size: 0.85em;
-            white-space: nowrap;
-        }
-        .sumario-cambios {
-            margin-top: 30px;
-            padding: 15px;
-            background-color: #f8f9fa;
-            border-radius: 8px;
-            border-left: 4px solid #4a8cff;
-        }
-        .seleccionado-box {
-            background-color: #fff8e1;
-            padding: 12px;
-            border-radius: 8px;
-            margin-bottom: 15px;
-            border: 1px solid #ffd54f;
-        }
-        .boton-accion {
-            margin: 5px 0;
-            width: 100%;
-        }
-        .badge-container {
-            display: flex;
-            justify-content: flex-end;
-            align-items: center;
-            margin-top: 4px;
-        }
-        .seccion-enfermeras {
-            margin-top: 15px;
-            padding-top: 15px;
-            border-top: 1px dashed #ccc;
-        }
-        .seccion-enfermeras-title {
-            font-size: 0.9em;
-            font-weight: bold;
-            color: #555;
-            margin-bottom: 10px;
-        }
-        .boton-agregar {
-            margin-top: 10px;
-        }
-        .formulario-alta {
-            background-color: #f8f9fa;
-            padding: 15px;
-            border-radius: 8px;
-            margin-top: 20px;
-            border-left: 4px solid #4a8cff;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    aplicar_tema("servicios6")
 
 def image_to_base64(image):
     """Convierte una imagen a base64"""
@@ -223,22 +103,28 @@ def image_to_base64(image):
     image.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode()
 
+@st.cache_data(show_spinner=False)
+def cargar_logo_base64(logo_path):
+    """Codifica el logo una sola vez por proceso; None si no se puede leer"""
+    if not os.path.exists(logo_path):
+        return None
+    try:
+        return image_to_base64(Image.open(logo_path))
+    except Exception:
+        return None
+
 def show_logo():
     """Muestra el logo en la parte superior"""
-    logo_path = "escudo_COLOR.jpg"
-    if os.path.exists(logo_path):
-        try:
-            logo = Image.open(logo_path)
-            st.markdown(
-                """
-                <div class="header-container">
-                    <img src="data:image/png;base64,{}" class="logo-img">
-                </div>
-                """.format(image_to_base64(logo)),
-                unsafe_allow_html=True
-            )
-        except Exception as e:
-            st.markdown('<div class="header-container"><h2>Asignación de Pacientes y Enfermeras en el Servicio de Urgencias</h2></div>', unsafe_allow_html=True)
+    logo_b64 = cargar_logo_base64("escudo_COLOR.jpg")
+    if logo_b64:
+        st.markdown(
+            """
+            <div class="header-container">
+                <img src="data:image/png;base64,{}" class="logo-img">
+            </div>
+            """.format(logo_b64),
+            unsafe_allow_html=True
+        )
     else:
         st.markdown('<div class="header-container"><h2>Asignación de Pacientes y Enfermeras en el Servicio de Urgencias</h2></div>', unsafe_allow_html=True)
 
@@ -258,25 +144,15 @@ def agregar_persona():
             }
         else:
             # Asignar color según el rol de la enfermera
-            colores_roles = {
-                "Especialista": "#9c27b0",
-                "General A": "#2196f3",
-                "General B": "#ff9800",
-                "General C": "#4caf50",
-                "Camillero": "#607d8b"
-            }
-            
             nuevo_item = {
                 "id": nuevo_id,
                 "tipo": "enfermera",
                 "nombre": f"Enf: {st.session_state.nuevo_nombre}",
                 "rol": st.session_state.nuevo_rol,
-                "color": colores_roles.get(st.session_state.nuevo_rol, "#9c27b0")
+                "color": COLORES_ROL.get(st.session_state.nuevo_rol, "#9c27b0")
             }
         
-        st.session_state.habitaciones[st.session_state.habitacion_nuevo][
-            "pacientes" if st.session_state.tipo_nuevo == "paciente" else "enfermeras"
-        ].append(nuevo_item)
+        registrar_eventos([{"evento": "alta", "columna": st.session_state.habitacion_nuevo, "persona": nuevo_item}])
         
         # Resetear valores
         st.session_state.nuevo_nombre = ""
@@ -286,6 +162,145 @@ def agregar_persona():
     else:
         st.warning("Por favor ingrese un nombre válido")
 
+def reconstruir_estado_derivado():
+    """Recalcula agregados, índice y caché de columnas tras reemplazar las habitaciones"""
+    habitaciones = st.session_state.habitaciones
+    st.session_state.agregados = AgregadosTablero.desde_columnas({
+        h: d["pacientes"] + d["enfermeras"] for h, d in habitaciones.items()
+    })
+    st.session_state.indice = IndiceBusqueda.desde_habitaciones(habitaciones)
+    st.session_state.html_columnas = {}
+    st.session_state.balanceo = None
+    st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
+
+def habitaciones_desde_estado(estado):
+    """Estructura de habitaciones a partir de la proyección del diario"""
+    habitaciones = {}
+    for habitacion, personas in estado["columnas"].items():
+        personas = list(personas.values())
+        habitaciones[habitacion] = {
+            "pacientes": [p for p in personas if p["tipo"] == "paciente"],
+            "enfermeras": [p for p in personas if p["tipo"] != "paciente"]
+        }
+    return habitaciones
+
+def entrada_log(evento):
+    """Entrada del historial a partir de un evento de traslado"""
+    return {
+        "fecha": datetime.fromisoformat(evento["marca"]).strftime("%d/%m %H:%M:%S"),
+        "tipo": evento["tipo"],
+        "nombre": evento["nombre"],
+        "info": evento["info"],
+        "desde": evento["origen"],
+        "hacia": evento["destino"],
+        "color": evento["color"],
+        "lote": evento.get("lote")
+    }
+
+def evento_traslado(persona, origen, destino, lote=None):
+    """Evento inmutable con los datos de la persona en el momento del traslado"""
+    return {
+        "evento": "traslado",
+        "id": persona["id"],
+        "tipo": persona["tipo"],
+        "nombre": persona["nombre"],
+        "info": persona["diagnostico"] if persona["tipo"] == "paciente" else persona["rol"],
+        "color": persona["color"],
+        "origen": origen,
+        "destino": destino,
+        "lote": lote
+    }
+
+def materializar_tablero():
+    """Reconstruye el tablero de la sesión desde la proyección del diario"""
+    diario = st.session_state.diario
+    estado, seq = diario.estado_actual()
+    st.session_state.habitaciones = habitaciones_desde_estado(estado)
+    reconstruir_estado_derivado()
+
+    agregados = st.session_state.agregados
+    for habitacion, n in estado["atenciones"].items():
+        agregados.atenciones[habitacion] = n
+        agregados.total_atenciones += n
+
+    # Historial y atenciones salen de los acumulados de la proyección, no de reproducir el diario
+    st.session_state.registro_atenciones = RegistroAtenciones.desde_acumulados(
+        estado["ultima_atencion"], estado["atenciones_hora"], estado["diagnosticos"]
+    )
+    st.session_state.log_movimientos = [entrada_log(e) for e in reversed(estado["ultimos_traslados"])]
+    st.session_state.total_movimientos = estado["traslados"]
+    st.session_state.seq_diario = seq
+
+def atenciones_del_diario():
+    """Registro con todas las atenciones del diario; solo para exportarlas"""
+    registro = RegistroAtenciones()
+    for e in st.session_state.diario.eventos_desde(0):
+        if e["evento"] == "atencion":
+            registro.anexar(e["id"], e["paciente"], e["columna"], e["diagnostico"], e["tipo_atencion"],
+                            e["realizado_por"], marca=datetime.fromisoformat(e["marca"]))
+    return registro
+
+def aplicar_evento(evento):
+    """Aplica un evento del diario al tablero de la sesión de forma incremental"""
+    habitaciones = st.session_state.habitaciones
+    tipo = evento["evento"]
+    if tipo == "apertura":
+        habitaciones.setdefault(evento["columna"], {"pacientes": [], "enfermeras": []})
+    elif tipo == "alta":
+        persona = evento["persona"]
+        destino = habitaciones.setdefault(evento["columna"], {"pacientes": [], "enfermeras": []})
+        destino["pacientes" if persona["tipo"] == "paciente" else "enfermeras"].append(persona)
+        st.session_state.agregados.agregar(evento["columna"], persona)
+        st.session_state.indice.agregar(persona, evento["columna"])
+    elif tipo == "traslado":
+        clave = "pacientes" if evento["tipo"] == "paciente" else "enfermeras"
+        lista_origen = habitaciones.get(evento["origen"], {}).get(clave, [])
+        idx = next((i for i, p in enumerate(lista_origen) if p["id"] == evento["id"]), None)
+        if idx is None or evento["destino"] not in habitaciones:
+            return
+        persona = lista_origen.pop(idx)
+        habitaciones[evento["destino"]][clave].append(persona)
+        st.session_state.agregados.mover(persona, evento["origen"], evento["destino"])
+        st.session_state.indice.mover(persona["id"], evento["destino"])
+        st.session_state.log_movimientos.insert(0, entrada_log(evento))
+        del st.session_state.log_movimientos[ULTIMOS_TRASLADOS:]
+        st.session_state.total_movimientos += 1
+    elif tipo == "atencion":
+        st.session_state.registro_atenciones.anexar(
+            evento["id"], evento["paciente"], evento["columna"], evento["diagnostico"],
+            evento["tipo_atencion"], evento["realizado_por"], marca=datetime.fromisoformat(evento["marca"])
+        )
+        st.session_state.agregados.registrar_atencion(evento["columna"])
+
+def sincronizar_tablero():
+    """Aplica a la sesión los eventos del diario que todavía no refleja"""
+    eventos = st.session_state.diario.eventos_desde(st.session_state.seq_diario)
+    if any(e["evento"] == "inicio" for e in eventos):
+        materializar_tablero()
+        return
+    for evento in eventos:
+        aplicar_evento(evento)
+    st.session_state.seq_diario += len(eventos)
+
+def registrar_eventos(eventos):
+    """Anexa los eventos al diario y los refleja en el tablero de la sesión"""
+    st.session_state.diario.registrar(eventos)
+    sincronizar_tablero()
+
+def importar_censo(habitaciones_censo, reemplazar):
+    """Incorpora un censo completo al tablero con una única escritura en el diario"""
+    if reemplazar:
+        eventos = [{
+            "evento": "inicio",
+            "columnas": {h: d["pacientes"] + d["enfermeras"] for h, d in habitaciones_censo.items()}
+        }]
+    else:
+        eventos = []
+        for h, d in habitaciones_censo.items():
+            eventos.append({"evento": "apertura", "columna": h})
+            eventos.extend({"evento": "alta", "columna": h, "persona": p} for p in d["pacientes"] + d["enfermeras"])
+    registrar_eventos(eventos)
+
 def mover_persona(habitacion_destino):
     """Mueve la persona seleccionada (paciente o enfermera) a la habitación destino"""
     origen = st.session_state.seleccion["habitacion"]
@@ -293,238 +308,473 @@ def mover_persona(habitacion_destino):
     tipo = st.session_state.seleccion["tipo"]
     
     if origen and habitacion_destino != origen:
-        # Buscar y mover al paciente o enfermera
-        lista_origen = st.session_state.habitaciones[origen]["pacientes"] if tipo == "paciente" else st.session_state.habitaciones[origen]["enfermeras"]
-        lista_destino = st.session_state.habitaciones[habitacion_destino]["pacientes"] if tipo == "paciente" else st.session_state.habitaciones[habitacion_destino]["enfermeras"]
-        
-        for idx, p in enumerate(lista_origen):
-            if p["id"] == id_persona:
-                persona = lista_origen.pop(idx)
-                lista_destino.append(persona)
-                
-                st.session_state.log_movimientos.insert(0, {
-                    "fecha": datetime.now().strftime("%H:%M:%S"),
-                    "tipo": tipo,
-                    "nombre": persona["nombre"],
-                    "info": persona["diagnostico"] if tipo == "paciente" else persona["rol"],
-                    "desde": origen,
-                    "hacia": habitacion_destino,
-                    "color": persona["color"]
-                })
-                break
+        lista_origen = st.session_state.habitaciones[origen]["pacientes" if tipo == "paciente" else "enfermeras"]
+        persona = next((p for p in lista_origen if p["id"] == id_persona), None)
+        if persona is not None:
+            registrar_eventos([evento_traslado(persona, origen, habitacion_destino)])
         
         st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
-        st.rerun()
+        # Origen y destino cambian: un fragmento no puede refrescar a otro
+        st.session_state.refrescar_tablero = True
+
+def mover_lote(movimientos):
+    """Aplica varios movimientos (id, tipo, origen, destino) en una sola operación.
+
+    Todos los movimientos se validan antes de escribir; si alguno ya no es
+    posible no se registra ninguno. Los eventos comparten un mismo lote y se
+    anexan al diario en una sola escritura.
+    """
+    habitaciones = st.session_state.habitaciones
+    lote = str(uuid.uuid4())[:8]
+    eventos = []
+
+    for id_persona, tipo, origen, destino in movimientos:
+        if origen == destino or destino not in habitaciones:
+            continue
+        clave = "pacientes" if tipo == "paciente" else "enfermeras"
+        lista_origen = habitaciones.get(origen, {}).get(clave, [])
+        persona = next((p for p in lista_origen if p["id"] == id_persona), None)
+        if persona is None:
+            return 0
+        eventos.append(evento_traslado(persona, origen, destino, lote))
+
+    if eventos:
+        registrar_eventos(eventos)
+        st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
+    return len(eventos)
 
 def registrar_atencion(tipo):
     """Registra una atención médica para el paciente seleccionado"""
     if st.session_state.seleccion["nombre"] and st.session_state.seleccion["tipo"] == "paciente":
-        st.session_state.log_atenciones.insert(0, {
-            "fecha": datetime.now().strftime("%H:%M:%S"),
-            "nombre": st.session_state.seleccion["nombre"],
-            "habitacion": st.session_state.seleccion["habitacion"],
+        registrar_eventos([{
+            "evento": "atencion",
+            "id": st.session_state.seleccion["id"],
+            "paciente": st.session_state.seleccion["nombre"],
+            "columna": st.session_state.seleccion["habitacion"],
             "diagnostico": st.session_state.seleccion["diagnostico"],
-            "tipo": tipo,
+            "tipo_atencion": tipo,
             "realizado_por": "Cardiólogo"
-        })
-        st.rerun()
+        }])
+        st.toast(f"{tipo}: {st.session_state.seleccion['nombre']}", icon="💊")
 
 def main():
     """Función principal que ejecuta la aplicación"""
     setup_page_config()
     load_custom_styles()
     initialize_session_state()
+    sincronizar_tablero()
     show_logo()
     show_main_content()
+    show_movimiento_lote()
+    show_balanceo_sugerido()
+    show_pacientes_pendientes()
+    show_tablero_historico()
     show_forms()
     show_summary()
 
+def seleccionar_persona(habitacion, persona):
+    """Alterna la selección; solo se refrescan las columnas afectadas"""
+    origen_previo = st.session_state.seleccion["habitacion"]
+    if st.session_state.seleccion["id"] == persona["id"]:
+        st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
+    else:
+        st.session_state.seleccion = {
+            "id": persona["id"],
+            "tipo": persona["tipo"],
+            "nombre": persona["nombre"],
+            "habitacion": habitacion,
+            "diagnostico": persona.get("diagnostico"),
+            "rol": persona.get("rol")
+        }
+
+    # Si la selección previa estaba en otra columna hay que refrescarla también
+    if origen_previo not in (None, habitacion):
+        st.session_state.refrescar_tablero = True
+
+def cancelar_seleccion():
+    """Limpia la selección actual"""
+    st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
+
+def solicitar_movimiento(habitacion):
+    """Mueve la selección a la habitación si procede desde otra"""
+    seleccion = st.session_state.seleccion
+    if seleccion["nombre"] and seleccion["habitacion"] and habitacion != seleccion["habitacion"]:
+        mover_persona(habitacion)
+    else:
+        st.toast("Selecciona primero un paciente o enfermera de otra habitación", icon="ℹ️")
+
+def show_seleccion_box():
+    """Muestra la persona seleccionada y sus acciones dentro de su columna"""
+    seleccion = st.session_state.seleccion
+    if seleccion["tipo"] == "paciente":
+        st.markdown(f"""
+            <div class="seleccionado-box">
+                <div style="font-weight: bold; font-size: 1.1em;">{seleccion["nombre"]}</div>
+                <div style="margin: 8px 0;"><b>Diagnóstico:</b> {seleccion["diagnostico"]}</div>
+                <div><b>Habitación:</b> {seleccion["habitacion"]}</div>
+            </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+            <div class="seleccionado-box">
+                <div style="font-weight: bold; font-size: 1.1em;">{seleccion["nombre"]}</div>
+                <div style="margin: 8px 0;"><b>Rol:</b> {seleccion["rol"]}</div>
+                <div><b>Habitación:</b> {seleccion["habitacion"]}</div>
+            </div>
+        """, unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if seleccion["tipo"] == "paciente":
+            st.button("💊 Administrar medicación",
+                      key=f"med_{seleccion['id']}",
+                      use_container_width=True,
+                      help="Registrar medicación administrada",
+                      on_click=registrar_atencion,
+                      args=("Medicación administrada",))
+
+    with col2:
+        st.button("❌ Cancelar selección",
+                  key=f"cancel_{seleccion['id']}",
+                  use_container_width=True,
+                  on_click=cancelar_seleccion)
+
 def show_main_content():
     """Muestra el contenido principal de la aplicación"""
 
     # Mostrar leyenda de estados
     show_estado_legend()
 
-    # Mostrar selección actual si hay alguna
-    if st.session_state.seleccion["nombre"]:
-        col1, col2, col3 = st.columns([3, 1, 1])
-        with col1:
-            if st.session_state.seleccion["tipo"] == "paciente":
-                st.markdown(f"""
-                    <div class="seleccionado-box">
-                        <div style="font-weight: bold; font-size: 1.1em;">{st.session_state.seleccion["nombre"]}</div>
-                        <div style="margin: 8px 0;"><b>Diagnóstico:</b> {st.session_state.seleccion["diagnostico"]}</div>
-                        <div><b>Habitación:</b> {st.session_state.seleccion["habitacion"]}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                    <div class="seleccionado-box">
-                        <div style="font-weight: bold; font-size: 1.1em;">{st.session_state.seleccion["nombre"]}</div>
-                        <div style="margin: 8px 0;"><b>Rol:</b> {st.session_state.seleccion["rol"]}</div>
-                        <div><b>Habitación:</b> {st.session_state.seleccion["habitacion"]}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-
-        with col2:
-            if st.session_state.seleccion["tipo"] == "paciente":
-                if st.button("💊 Administrar medicación",
-                           key=f"med_{st.session_state.seleccion['id']}",
-                           use_container_width=True,
-                           help="Registrar medicación administrada"):
-                    registrar_atencion("Medicación administrada")
-
-        with col3:
-            if st.button("❌ Cancelar selección",
-                        key=f"cancel_{st.session_state.seleccion['id']}",
-                        use_container_width=True):
-                st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
-                st.rerun()
-
     st.markdown("""
         <div style="background-color: #f0f8ff; padding: 12px; border-radius: 8px; margin-bottom: 20px; font-size: 0.9em;">
             <b>Instrucciones:</b><br>
-            1. Haz clic en un paciente o enfermera para seleccionarlo<br>
+            1. Elige un paciente o enfermera en el selector de su habitación<br>
             2. Haz clic en "Mover aquí" de la habitación destino para trasladarlo<br>
             3. Para pacientes: usa el botón para registrar atenciones médicas<br>
             4. Usa los formularios abajo para dar de alta nuevos pacientes o enfermeras
         </div>
     """, unsafe_allow_html=True)
 
-    # Mostrar habitaciones en columnas
+    consulta = st.text_input(
+        "🔍 Buscar",
+        placeholder="Paciente, diagnóstico, estado o rol de enfermería",
+        key="consulta_busqueda"
+    )
+    habitaciones = list(st.session_state.habitaciones)
+    if consulta.strip():
+        coincidentes = st.session_state.indice.habitaciones_coincidentes(consulta)
+        habitaciones = [h for h in habitaciones if h in coincidentes]
+        st.caption(f"{len(habitaciones)} habitación(es) con coincidencias")
+
+    # Mostrar habitaciones en columnas, cada una como fragmento independiente
     cols = st.columns(3)
-    for i, (habitacion, datos) in enumerate(st.session_state.habitaciones.items()):
+    for i, habitacion in enumerate(habitaciones):
         with cols[i % 3]:
-            st.markdown(f"### {habitacion}")
-
-            # Mostrar número de pacientes y enfermeras
-            st.caption(f"{len(datos['pacientes'])} paciente(s) • {len(datos['enfermeras'])} enfermera(s)")
-
-            # Mostrar pacientes
-            for p in datos["pacientes"]:
-                selected = (st.session_state.seleccion["id"] == p["id"])
-
-                container = st.container()
-                with container:
-                    st.markdown(f"""
-                        <div class="persona-container" style="{'border: 2px solid #ffd54f; background-color: #fff8e1;' if selected else ''}">
-                            <div class="persona-name">{p["nombre"]}</div>
-                            <div class="persona-info">{p["diagnostico"]}</div>
-                            <div class="badge-container">
-                                <div style="width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-bottom: 14px solid {p["color"]};"></div>
-                            </div>
-                        </div>
-                    """, unsafe_allow_html=True)
-
-                if container.button("",
-                                 key=f"btn_p_{p['id']}",
-                                 help=f"Seleccionar {p['nombre']}"):
-                    if selected:
-                        st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
-                    else:
-                        st.session_state.seleccion = {
-                            "id": p["id"],
-                            "tipo": "paciente",
-                            "nombre": p["nombre"],
-                            "habitacion": habitacion,
-                            "diagnostico": p["diagnostico"],
-                            "rol": None
-                        }
-                    st.rerun()
-
-            # Mostrar enfermeras
-            if datos["enfermeras"]:
-                st.markdown('<div class="seccion-enfermeras"><div class="seccion-enfermeras-title">Enfermeras asignadas</div></div>', unsafe_allow_html=True)
-
-                for e in datos["enfermeras"]:
-                    selected = (st.session_state.seleccion["id"] == e["id"])
-
-                    container = st.container()
-                    with container:
-                        st.markdown(f"""
-                            <div class="persona-container" style="{'border: 2px solid #ffd54f; background-color: #fff8e1;' if selected else ''}">
-                                <div class="persona-name">{e["nombre"]}</div>
-                                <div class="persona-info">{e["rol"]}</div>
-                                <div class="badge-container">
-                                    <div style="width: 14px; height: 14px; background-color: {e["color"]}; border-radius: 3px;"></div>
-                                </div>
-                            </div>
-                        """, unsafe_allow_html=True)
-
-                    if container.button("",
-                                     key=f"btn_e_{e['id']}",
-                                     help=f"Seleccionar {e['nombre']}"):
-                        if selected:
-                            st.session_state.seleccion = {"id": None, "tipo": None, "nombre": None, "habitacion": None, "diagnostico": None, "rol": None}
-                        else:
-                            st.session_state.seleccion = {
-                                "id": e["id"],
-                                "tipo": "enfermera",
-                                "nombre": e["nombre"],
-                                "habitacion": habitacion,
-                                "diagnostico": None,
-                                "rol": e["rol"]
-                            }
-                        st.rerun()
+            show_habitacion_column(habitacion)
 
-            # Botón para mover a la habitación actual
-            if (st.session_state.seleccion["nombre"] and
-                st.session_state.seleccion["habitacion"] and
-                habitacion != st.session_state.seleccion["habitacion"]):
+def html_tarjeta(persona, selected):
+    """Marcado de la tarjeta de un paciente o enfermera"""
+    if persona["tipo"] == "paciente":
+        info = persona["diagnostico"]
+        badge = f'<div style="width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-bottom: 14px solid {persona["color"]};"></div>'
+    else:
+        info = persona["rol"]
+        badge = f'<div style="width: 14px; height: 14px; background-color: {persona["color"]}; border-radius: 3px;"></div>'
+    return f"""
+        <div class="persona-container{' selected' if selected else ''}">
+            <div class="persona-name">{escape(persona["nombre"])}</div>
+            <div class="persona-info">{escape(info)}</div>
+            <div class="badge-container">{badge}</div>
+        </div>"""
+
+def html_columna(habitacion, id_seleccionado):
+    """Construye la columna completa de una habitación como un único bloque HTML"""
+    datos = st.session_state.habitaciones[habitacion]
+    agregados = st.session_state.agregados
+    ratio = agregados.ratio_enfermera_paciente(habitacion)
+    resumen = (
+        f"{agregados.pacientes[habitacion]} paciente(s) • {agregados.enfermeras[habitacion]} enfermera(s)"
+        + (f" • {ratio:.2f} enf/pac" if ratio is not None else "")
+    )
+
+    partes = [
+        '<div class="habitacion-container">',
+        f'<div class="habitacion-header">{escape(habitacion)}</div>',
+        f'<div class="persona-info">{resumen}</div>'
+    ]
+    partes.extend(html_tarjeta(p, p["id"] == id_seleccionado) for p in datos["pacientes"])
+    if datos["enfermeras"]:
+        partes.append('<div class="seccion-enfermeras"><div class="seccion-enfermeras-title">Enfermeras asignadas</div>')
+        partes.extend(html_tarjeta(e, e["id"] == id_seleccionado) for e in datos["enfermeras"])
+        partes.append('</div>')
+    partes.append('</div>')
+    return "".join(partes)
+
+def html_columna_cacheado(habitacion):
+    """Devuelve el HTML de la columna, regenerándolo solo si cambió su versión o su selección"""
+    seleccion = st.session_state.seleccion
+    id_seleccionado = seleccion["id"] if seleccion["habitacion"] == habitacion else None
+    clave = (st.session_state.agregados.version[habitacion], id_seleccionado)
+
+    cacheado = st.session_state.html_columnas.get(habitacion)
+    if cacheado is None or cacheado[0] != clave:
+        cacheado = (clave, html_columna(habitacion, id_seleccionado))
+        st.session_state.html_columnas[habitacion] = cacheado
+    return cacheado[1]
+
+def cambiar_seleccion(habitacion):
+    """Callback del selector de la columna"""
+    id_persona = st.session_state[f"sel_{habitacion}"]
+    if id_persona is None:
+        cancelar_seleccion()
+        return
+    datos = st.session_state.habitaciones[habitacion]
+    persona = next((p for p in datos["pacientes"] + datos["enfermeras"] if p["id"] == id_persona), None)
+    if persona is not None and st.session_state.seleccion["id"] != id_persona:
+        seleccionar_persona(habitacion, persona)
+
+@st.fragment
+def show_habitacion_column(habitacion):
+    """Muestra la columna de una habitación; un clic solo re-ejecuta este fragmento"""
+    # Un movimiento o un cambio de columna exige refrescar el tablero completo
+    if st.session_state.pop("refrescar_tablero", False):
+        st.rerun()
+
+    datos = st.session_state.habitaciones[habitacion]
+    seleccion = st.session_state.seleccion
+
+    st.markdown(html_columna_cacheado(habitacion), unsafe_allow_html=True)
+
+    # Un único selector por columna en lugar de un botón por tarjeta
+    nombres = {p["id"]: p["nombre"] for p in datos["pacientes"] + datos["enfermeras"]}
+    clave_selector = f"sel_{habitacion}"
+    st.session_state[clave_selector] = seleccion["id"] if seleccion["habitacion"] == habitacion else None
+    st.selectbox(
+        "Seleccionar",
+        list(nombres),
+        format_func=nombres.get,
+        key=clave_selector,
+        placeholder="Seleccionar paciente o enfermera…",
+        label_visibility="collapsed",
+        on_change=cambiar_seleccion,
+        args=(habitacion,)
+    )
 
-                tipo_seleccionado = "paciente" if st.session_state.seleccion["tipo"] == "paciente" else "enfermera"
-                nombre_corto = st.session_state.seleccion["nombre"].split(": ")[1].split()[0]
+    if seleccion["habitacion"] == habitacion and seleccion["id"] in nombres:
+        show_seleccion_box()
 
-                if st.button(f"⇨ Mover {tipo_seleccionado} {nombre_corto} aquí",
-                           key=f"mover_{habitacion}_{st.session_state.seleccion['id']}",
-                           use_container_width=True):
-                    mover_persona(habitacion)
+    # Botón para mover a la habitación actual; siempre presente para que las
+    # demás columnas no tengan que re-ejecutarse cuando cambia la selección
+    st.button("⇨ Mover aquí", key=f"mover_{habitacion}", use_container_width=True,
+              on_click=solicitar_movimiento, args=(habitacion,))
 
 def show_estado_legend():
-    """Muestra la leyenda de estados y roles en la parte superior"""
-    st.markdown("""
+    """Muestra la leyenda de estados y roles con sus totales en la parte superior"""
+    estados = st.session_state.agregados.total_estado
+    roles = st.session_state.agregados.total_rol
+    st.markdown(f"""
     <div class="leyenda-horizontal">
         <div class="leyenda-item">
             <div style="width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-bottom: 14px solid #ff0000;"></div>
-            <span>Crítico</span>
+            <span>Crítico ({estados["crítico"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-bottom: 14px solid #ff6600;"></div>
-            <span>Observación</span>
+            <span>Observación ({estados["observación"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-bottom: 14px solid #0066ff;"></div>
-            <span>Mejorando</span>
+            <span>Mejorando ({estados["mejorando"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-bottom: 14px solid #00aa00;"></div>
-            <span>Estable</span>
+            <span>Estable ({estados["estable"]})</span>
         </div>
     </div>
     <div class="leyenda-horizontal" style="margin-top: 10px;">
         <div class="leyenda-item">
             <div style="width: 14px; height: 14px; background-color: #9c27b0; border-radius: 3px;"></div>
-            <span>Especialista</span>
+            <span>Especialista ({roles["Especialista"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 14px; height: 14px; background-color: #2196f3; border-radius: 3px;"></div>
-            <span>General A</span>
+            <span>General A ({roles["General A"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 14px; height: 14px; background-color: #ff9800; border-radius: 3px;"></div>
-            <span>General B</span>
+            <span>General B ({roles["General B"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 14px; height: 14px; background-color: #4caf50; border-radius: 3px;"></div>
-            <span>General C</span>
+            <span>General C ({roles["General C"]})</span>
         </div>
         <div class="leyenda-item">
             <div style="width: 14px; height: 14px; background-color: #607d8b; border-radius: 3px;"></div>
-            <span>Camillero</span>
+            <span>Camillero ({roles["Camillero"]})</span>
         </div>
     </div>
     """, unsafe_allow_html=True)
 
+@st.fragment
+def show_movimiento_lote():
+    """Panel para reasignar varios pacientes y enfermeras a la vez (cambio de turno)"""
+    with st.expander("🔀 Movimiento por lotes", expanded=False):
+        st.caption("Cambia la habitación destino de varias personas, revisa la vista previa y confirma en un solo paso.")
+        habitaciones = list(st.session_state.habitaciones)
+        filas = [
+            {
+                "id": p["id"],
+                "tipo": p["tipo"],
+                "Nombre": p["nombre"],
+                "Información": p["diagnostico"] if p["tipo"] == "paciente" else p["rol"],
+                "Habitación actual": habitacion,
+                "Destino": habitacion
+            }
+            for habitacion, datos in st.session_state.habitaciones.items()
+            for p in datos["pacientes"] + datos["enfermeras"]
+        ]
+
+        editadas = st.data_editor(
+            filas,
+            column_config={
+                "id": None,
+                "tipo": None,
+                "Destino": st.column_config.SelectboxColumn("Destino", options=habitaciones, required=True)
+            },
+            disabled=["Nombre", "Información", "Habitación actual"],
+            hide_index=True,
+            use_container_width=True,
+            key="editor_lote"
+        )
+
+        movimientos = [
+            (f["id"], f["tipo"], f["Habitación actual"], f["Destino"])
+            for f in editadas if f["Destino"] != f["Habitación actual"]
+        ]
+        if not movimientos:
+            st.info("Sin cambios pendientes", icon="ℹ️")
+            return
+
+        # Vista previa de la ocupación resultante por habitación
+        propuesto = {
+            h: {"paciente": len(d["pacientes"]), "enfermera": len(d["enfermeras"])}
+            for h, d in st.session_state.habitaciones.items()
+        }
+        for _, tipo, origen, destino in movimientos:
+            propuesto[origen][tipo] -= 1
+            propuesto[destino][tipo] += 1
+        st.dataframe(
+            [
+                {
+                    "Habitación": h,
+                    "Pacientes": f"{len(d['pacientes'])} → {propuesto[h]['paciente']}",
+                    "Enfermeras": f"{len(d['enfermeras'])} → {propuesto[h]['enfermera']}"
+                }
+                for h, d in st.session_state.habitaciones.items()
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+        if st.button(f"✅ Confirmar lote ({len(movimientos)} movimientos)", type="primary", use_container_width=True):
+            if mover_lote(movimientos):
+                del st.session_state["editor_lote"]
+                st.rerun()
+            st.error("El tablero cambió mientras editabas el lote; revisa los destinos")
+
+@st.fragment
+def show_balanceo_sugerido():
+    """Muestra los traslados de enfermeras que equilibran la carga por habitación"""
+    # Se recalcula solo si cambió alguna habitación; la suma de versiones solo crece
+    clave = sum(st.session_state.agregados.version.values())
+    if st.session_state.balanceo is None or st.session_state.balanceo[0] != clave:
+        st.session_state.balanceo = (clave, proponer_reasignaciones(st.session_state.habitaciones))
+    sugerencias = st.session_state.balanceo[1]
+    titulo = f"⚖️ Balanceo sugerido ({len(sugerencias)})" if sugerencias else "⚖️ Balanceo sugerido"
+    with st.expander(titulo, expanded=False):
+        if not sugerencias:
+            st.success("La carga de enfermería está equilibrada entre habitaciones", icon="✅")
+            return
+
+        st.caption("Los traslados de enfermeras que más reducen la carga sin cubrir, según la gravedad de los pacientes y el rol de cada enfermera.")
+        st.dataframe(
+            [
+                {"Enfermera": s["nombre"], "Rol": s["rol"], "Desde": s["desde"], "Hacia": s["hacia"]}
+                for s in sugerencias
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+        if st.button("✅ Aplicar sugerencias", type="primary", use_container_width=True):
+            if mover_lote([(s["id"], "enfermera", s["desde"], s["hacia"]) for s in sugerencias]):
+                st.rerun()
+            st.error("El tablero cambió; vuelve a revisar las sugerencias")
+
+@st.fragment
+def show_pacientes_pendientes():
+    """Muestra los pacientes sin atención reciente y los acumulados de atenciones"""
+    registro = st.session_state.registro_atenciones
+    with st.expander("⏰ Pacientes pendientes de revisión", expanded=False):
+        umbral = st.number_input("Minutos sin atención", min_value=5, max_value=720, value=60, step=5)
+        pacientes = [
+            (p["id"], p["nombre"], habitacion)
+            for habitacion, datos in st.session_state.habitaciones.items()
+            for p in datos["pacientes"]
+        ]
+        pendientes = registro.pendientes(pacientes, umbral)
+        if pendientes.empty:
+            st.success("Todos los pacientes han sido atendidos dentro del umbral", icon="✅")
+        else:
+            st.dataframe(
+                pendientes.rename(columns={"paciente": "Paciente", "habitacion": "Habitación", "minutos": "Minutos"}),
+                column_config={"Minutos": st.column_config.NumberColumn("Minutos", format="%.0f")},
+                hide_index=True,
+                use_container_width=True
+            )
+            st.caption("Sin valor en minutos: el paciente no tiene atenciones registradas.")
+
+        if len(registro):
+            st.markdown("**Atenciones por habitación y hora**")
+            st.bar_chart(registro.rollup_habitacion_hora(), x="hora", y="atenciones", color="habitacion")
+            if st.button("📤 Preparar exportación de atenciones"):
+                st.download_button(
+                    "📥 Descargar atenciones (Parquet)",
+                    data=atenciones_del_diario().a_parquet(),
+                    file_name=f"atenciones_{datetime.now().strftime('%Y%m%d_%H%M')}.parquet",
+                    mime="application/octet-stream"
+                )
+
+@st.fragment
+def show_tablero_historico():
+    """Reconstruye el tablero en un instante anterior para revisar la entrega de turno"""
+    with st.expander("🕒 Tablero en un instante anterior", expanded=False):
+        if "fecha_historico" not in st.session_state:
+            ahora = datetime.now()
+            st.session_state.fecha_historico = ahora.date()
+            st.session_state.hora_historico = ahora.time().replace(second=0, microsecond=0)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fecha = st.date_input("Fecha", key="fecha_historico")
+        with col2:
+            hora = st.time_input("Hora", key="hora_historico", step=60)
+
+        estado = st.session_state.diario.estado_en(datetime.combine(fecha, hora))
+        filas = [
+            {
+                "Habitación": habitacion,
+                "Persona": p["nombre"],
+                "Detalle": p.get("estado") or p.get("rol", "")
+            }
+            for habitacion, personas in estado["columnas"].items()
+            for p in personas.values()
+        ]
+        if filas:
+            st.dataframe(filas, hide_index=True, use_container_width=True)
+        else:
+            st.info("El tablero estaba vacío en ese instante", icon="ℹ️")
+
 def show_forms():
     """Muestra los formularios para dar de alta nuevos pacientes y enfermeras"""
     st.markdown("---")
@@ -554,6 +804,58 @@ def show_forms():
             st.session_state.tipo_nuevo = "paciente"
             agregar_persona()
 
+    show_censo()
+
+def show_censo():
+    """Importa un censo completo desde CSV/Parquet y lo exporta para la entrega de turno"""
+    with st.expander("📥 Importar / exportar censo", expanded=False):
+        st.caption("Columnas: habitacion, tipo (paciente/enfermera), nombre, diagnostico, estado, rol. "
+                   "Una fila sin tipo declara una habitación vacía.")
+        archivo = st.file_uploader("Censo de ingreso", type=["csv", "parquet"], key="archivo_censo")
+        if archivo is not None:
+            try:
+                censo = leer_censo(archivo, archivo.name)
+            except Exception as e:
+                st.error(f"No se pudo leer el censo: {str(e)}")
+                censo = None
+
+            if censo is not None:
+                errores = validar_censo(censo)
+                if errores:
+                    for error in errores:
+                        st.error(error)
+                else:
+                    tipos = censo["tipo"].value_counts()
+                    st.info(
+                        f"{censo['habitacion'].nunique()} habitación(es) • "
+                        f"{tipos.get('paciente', 0)} paciente(s) • {tipos.get('enfermera', 0)} enfermera(s)",
+                        icon="📋"
+                    )
+                    reemplazar = st.radio(
+                        "Modo de carga",
+                        ["Reemplazar tablero", "Añadir al tablero"],
+                        horizontal=True
+                    ) == "Reemplazar tablero"
+                    if st.button("📥 Importar censo", type="primary"):
+                        importar_censo(construir_habitaciones(censo), reemplazar)
+                        st.rerun()
+
+        # La exportación se genera a demanda para no serializar el tablero en cada rerun
+        formato = st.radio("Formato de exportación", ["csv", "parquet"], horizontal=True, key="formato_censo")
+        if st.button("📤 Preparar exportación del censo"):
+            st.session_state.exportacion_censo = (formato, exportar_censo(st.session_state.habitaciones, formato))
+
+        exportacion = st.session_state.pop("exportacion_censo", None)
+        if exportacion is not None:
+            formato, datos = exportacion
+            st.download_button(
+                f"📥 Descargar censo ({formato.upper()})",
+                data=datos,
+                file_name=f"censo_{datetime.now().strftime('%Y%m%d_%H%M')}.{formato}",
+                mime="text/csv" if formato == "csv" else "application/octet-stream"
+            )
+
+@st.fragment
 def show_summary():
     """Muestra el resumen de movimientos al final de la página"""
     st.markdown("""
@@ -581,13 +883,23 @@ def show_summary():
 
         st.markdown(f"""
             <div style="margin-top: 15px; font-size: 0.9em;">
-                <b>Total movimientos:</b> {len(st.session_state.log_movimientos)}<br>
+                <b>Total movimientos:</b> {st.session_state.total_movimientos}<br>
                 <b>Último movimiento:</b> {st.session_state.log_movimientos[0]["fecha"]}
             </div>
         """, unsafe_allow_html=True)
     else:
         st.info("No hay movimientos registrados", icon="ℹ️")
 
+    agregados = st.session_state.agregados
+    st.markdown(f"""
+        <div style="margin-top: 15px; font-size: 0.9em;">
+            <b>Pacientes:</b> {agregados.total_pacientes}
+            (críticos: {agregados.total_estado["crítico"]})<br>
+            <b>Enfermeras:</b> {agregados.total_enfermeras}<br>
+            <b>Atenciones registradas:</b> {agregados.total_atenciones}
+        </div>
+    """, unsafe_allow_html=True)
+
     st.markdown("</div>", unsafe_allow_html=True)
 
 if __name__ == "__main__":
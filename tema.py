@@ -0,0 +1,28 @@
+import hashlib
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+DIRECTORIO_ESTILOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "estilos")
+
+# Registrar el directorio como componente hace que Streamlit sirva sus archivos
+# con su tipo MIME real (text/css), cosa que no ocurre con la carpeta static/
+_ESTILOS = components.declare_component("estilos", path=DIRECTORIO_ESTILOS)
+
+@st.cache_data(show_spinner=False)
+def url_hoja_estilos(nombre):
+    """URL de la hoja de estilos versionada por el hash de su contenido"""
+    with open(os.path.join(DIRECTORIO_ESTILOS, f"{nombre}.css"), "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+    base = (st.get_option("server.baseUrlPath") or "").strip("/")
+    prefijo = f"/{base}" if base else ""
+    return f"{prefijo}/component/{_ESTILOS.name}/{nombre}.css?v={version}"
+
+def aplicar_tema(nombre):
+    """Enlaza la hoja de estilos de la aplicación.
+
+    En cada rerun solo viaja la etiqueta <link>; el navegador descarga y cachea
+    la hoja una vez por sesión y la URL cambia únicamente si cambia el CSS.
+    """
+    st.markdown(f'<link rel="stylesheet" href="{url_hoja_estilos(nombre)}">', unsafe_allow_html=True)
@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import re
+import zlib
+
+from PIL import Image
+
+# Sin dependencias de Streamlit: se ejecuta en procesos aparte
+LIMITE_PAGINAS = 30
+TAMANO_MINIATURA = (240, 320)
+
+_CABECERA = re.compile(rb"%PDF-(\d\.\d)")
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_INICIO_XREF = re.compile(rb"xref|\d+\s+\d+\s+obj")
+_CONTEO_PAGINAS = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b")
+_PAGINA = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+_CIFRADO = re.compile(rb"/Encrypt\s*(?:\d+\s+\d+\s+R|<<)")
+_FLUJO_OBJETOS = re.compile(rb"/Type\s*/ObjStm\b")
+_IMAGEN = re.compile(rb"/Subtype\s*/Image\b")
+_INICIO_FLUJO = re.compile(rb"stream\r?\n")
+
+def _flujo(datos, desde):
+    """Contenido crudo del primer stream después de ``desde``"""
+    inicio = _INICIO_FLUJO.search(datos, desde)
+    if not inicio:
+        return None
+    fin = datos.find(b"endstream", inicio.end())
+    return datos[inicio.end():fin] if fin != -1 else None
+
+def _objetos_comprimidos(datos):
+    """Texto de los flujos de objetos (PDF 1.5+), donde pueden ir los nodos de páginas"""
+    partes = []
+    for coincidencia in _FLUJO_OBJETOS.finditer(datos):
+        contenido = _flujo(datos, coincidencia.end())
+        try:
+            partes.append(zlib.decompress(contenido))
+        except (TypeError, zlib.error):
+            continue
+    return b"\n".join(partes)
+
+def contar_paginas(datos):
+    """Páginas según el /Count del árbol de páginas; si no hay, se cuentan los nodos /Page"""
+    for texto in (datos, _objetos_comprimidos(datos)):
+        conteos = [int(a or b) for a, b in _CONTEO_PAGINAS.findall(texto)]
+        if conteos:
+            return max(conteos)
+        paginas = len(_PAGINA.findall(texto))
+        if paginas:
+            return paginas
+    return 0
+
+def miniatura_imagen_incrustada(datos, destino):
+    """Miniatura de la primera imagen JPEG (DCTDecode) que aparece en el archivo.
+
+    No hay rasterizador de PDF entre las dependencias, así que esto no es una
+    vista de la primera página: la imagen puede ser de cualquier página (en un
+    escaneo suele ser una hoja escaneada; en otros PDF, un logotipo) y los
+    documentos sin imágenes JPEG no tienen miniatura.
+    """
+    for coincidencia in _IMAGEN.finditer(datos):
+        inicio_objeto = datos.rfind(b"obj", 0, coincidencia.start())
+        inicio_flujo = _INICIO_FLUJO.search(datos, coincidencia.end())
+        if inicio_flujo is None or b"/DCTDecode" not in datos[inicio_objeto:inicio_flujo.start()]:
+            continue
+        try:
+            with Image.open(io.BytesIO(_flujo(datos, coincidencia.end()))) as imagen:
+                imagen.draft("RGB", TAMANO_MINIATURA)
+                imagen = imagen.convert("RGB")
+                imagen.thumbnail(TAMANO_MINIATURA)
+                imagen.save(destino + ".parte", format="JPEG", quality=80)
+            os.replace(destino + ".parte", destino)
+            return True
+        except Exception:
+            continue
+    return False
+
+def validar_pdf(datos, limite_tamano, limite_paginas=LIMITE_PAGINAS):
+    """Revisión estructural de un PDF sin interpretarlo completo.
+
+    Devuelve {"valido", "version", "paginas", "cifrado", "tamano", "problemas",
+    "avisos"}: los problemas invalidan el documento, los avisos (p. ej. una
+    tabla xref desplazada, que los lectores reparan) solo se informan.
+    """
+    tamano = len(datos)
+    resultado = {"version": None, "paginas": 0, "cifrado": False, "tamano": tamano, "problemas": [], "avisos": []}
+    problemas, avisos = resultado["problemas"], resultado["avisos"]
+
+    cabecera = _CABECERA.search(datos, 0, 1024)
+    if cabecera is None:
+        problemas.append("El archivo no es un PDF")
+        resultado["valido"] = False
+        return resultado
+    resultado["version"] = cabecera.group(1).decode()
+
+    if tamano > limite_tamano:
+        problemas.append(f"Pesa {tamano / (1024 * 1024):.1f} MB; el máximo es {limite_tamano / (1024 * 1024):.1f} MB")
+
+    cola = datos[-2048:]
+    if b"%%EOF" not in cola:
+        problemas.append("El archivo está incompleto (falta el final del PDF)")
+    posiciones = _STARTXREF.findall(cola)
+    if not posiciones:
+        avisos.append("No tiene referencia a la tabla xref")
+    elif not _INICIO_XREF.match(datos, int(posiciones[-1])):
+        avisos.append("La tabla xref no está donde indica el archivo")
+
+    if _CIFRADO.search(datos):
+        resultado["cifrado"] = True
+        problemas.append("El PDF está protegido con contraseña")
+
+    resultado["paginas"] = contar_paginas(datos)
+    if resultado["paginas"] == 0:
+        problemas.append("No se encontraron páginas")
+    elif resultado["paginas"] > limite_paginas:
+        problemas.append(f"Tiene {resultado['paginas']} páginas; el máximo es {limite_paginas}")
+
+    resultado["valido"] = not problemas
+    return resultado
+
+def analizar(ruta, ruta_resultado, ruta_miniatura, limite_tamano):
+    """Tarea del proceso de trabajo: valida, genera la miniatura y guarda el resultado junto al hash"""
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    resultado = validar_pdf(datos, limite_tamano)
+    resultado["miniatura"] = bool(resultado["version"]) and not resultado["cifrado"] and miniatura_imagen_incrustada(datos, ruta_miniatura)
+
+    with open(ruta_resultado + ".parte", "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False)
+    os.replace(ruta_resultado + ".parte", ruta_resultado)
+    return resultado
@@ -0,0 +1,142 @@
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import combinations
+
+# Número y unidad opcional: "80 UI/kg", "0.05 mcg/kg/min", "2,5 mg", "5000"
+_PATRON_DOSIS = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*([A-Za-zµμ/]+)?\s*$")
+
+def _nombre(medicamento):
+    return str(medicamento).strip().casefold()
+
+@lru_cache(maxsize=1024)
+def interpretar_dosis(dosis):
+    """(cantidad, unidad escrita o None) de un texto de dosis; None si no es interpretable"""
+    coincidencia = _PATRON_DOSIS.match(dosis)
+    if not coincidencia:
+        return None
+    cantidad, unidad = coincidencia.groups()
+    return float(cantidad.replace(",", ".")), unidad.replace("μ", "µ") if unidad else None
+
+class VerificadorMedicamentos:
+    """Verificación de seguridad de los medicamentos de un reporte con tablas precalculadas.
+
+    Las unidades se llevan a su forma canónica con un diccionario, la dosis
+    máxima se busca por (medicamento, unidad canónica) y las interacciones por
+    el par de medicamentos sin orden, así que verificar un reporte son unas
+    pocas búsquedas en diccionarios por medicamento y por par.
+    """
+
+    def __init__(self, unidades_canonicas, dosis_maximas, interacciones):
+        self.unidades = {
+            unidad.casefold(): (canonica, float(factor))
+            for unidad, (canonica, factor) in unidades_canonicas.items()
+        }
+        self.maximas = {
+            (_nombre(medicamento), unidad): float(maxima)
+            for medicamento, limites in dosis_maximas.items()
+            for unidad, maxima in limites.items()
+        }
+        self.interacciones = {
+            frozenset(map(_nombre, i["medicamentos"])): (i["severidad"], i["descripcion"])
+            for i in interacciones
+        }
+
+    def normalizar(self, dosis, unidad):
+        """Dosis en unidad canónica: (cantidad, unidad, unidad usada); None si no se reconoce.
+
+        Si el texto de la dosis trae su propia unidad ("80 UI/kg") esa manda
+        sobre la del selector.
+        """
+        interpretada = interpretar_dosis(dosis)
+        if interpretada is None:
+            return None
+        cantidad, escrita = interpretada
+        usada = escrita or unidad
+        conversion = self.unidades.get(str(usada).casefold())
+        if conversion is None:
+            return None
+        canonica, factor = conversion
+        return cantidad * factor, canonica, usada
+
+    def verificar(self, medicamentos):
+        """Alertas de una lista de medicamentos [{nombre, dosis, unidad, ...}]"""
+        alertas = []
+        nombres = []
+        for medicamento in medicamentos:
+            nombre, dosis = medicamento.get("nombre", ""), medicamento.get("dosis", "")
+            if not nombre:
+                continue
+            nombres.append(nombre)
+            if not dosis:
+                continue
+
+            normalizada = self.normalizar(dosis, medicamento.get("unidad"))
+            if normalizada is None:
+                alertas.append({
+                    "tipo": "dosis", "severidad": "aviso", "medicamentos": [nombre],
+                    "descripcion": f"Dosis no interpretable: {dosis} {medicamento.get('unidad', '')}".strip()
+                })
+                continue
+
+            cantidad, canonica, usada = normalizada
+            seleccionada = self.unidades.get(str(medicamento.get("unidad")).casefold())
+            if usada != medicamento.get("unidad") and (seleccionada is None or seleccionada[0] != canonica):
+                alertas.append({
+                    "tipo": "unidad", "severidad": "aviso", "medicamentos": [nombre],
+                    "descripcion": f"La dosis {dosis} no coincide con la unidad seleccionada ({medicamento.get('unidad')})"
+                })
+
+            maxima = self.maximas.get((_nombre(nombre), canonica))
+            if maxima is not None and cantidad > maxima:
+                alertas.append({
+                    "tipo": "dosis_maxima", "severidad": "grave", "medicamentos": [nombre],
+                    "descripcion": f"{nombre} {cantidad:g} {canonica} supera la dosis máxima de {maxima:g} {canonica}"
+                })
+
+        unicos = list(dict.fromkeys(nombres))
+        for a, b in combinations(unicos, 2):
+            interaccion = self.interacciones.get(frozenset((_nombre(a), _nombre(b))))
+            if interaccion is not None:
+                severidad, descripcion = interaccion
+                alertas.append({"tipo": "interaccion", "severidad": severidad, "medicamentos": [a, b], "descripcion": descripcion})
+        return alertas
+
+    def verificar_lote(self, reportes):
+        """Conteo de alertas por tipo y descripción sobre muchas listas de medicamentos"""
+        conteo = Counter()
+        con_alerta = 0
+        for medicamentos in reportes:
+            alertas = self.verificar(medicamentos)
+            con_alerta += bool(alertas)
+            conteo.update((a["tipo"], a["descripcion"]) for a in alertas if a["tipo"] in ("interaccion", "dosis_maxima"))
+        return conteo, con_alerta
+
+if __name__ == "__main__":
+    # Tiempo por reporte: python verificacion_medicamentos.py [reportes]
+    import json
+    import os
+    import random
+    import sys
+    import time
+
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogos", "eventos2.json")
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    verificador = VerificadorMedicamentos(datos["unidades_canonicas"], datos["dosis_maximas"], datos["interacciones"])
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    azar = random.Random(0)
+    nombres = [m for m in datos["medicamentos"] if m and m != "Otro"]
+    reportes = []
+    for _ in range(n):
+        reporte = []
+        for nombre in azar.sample(nombres, azar.randint(1, 4)):
+            dosis = [d for d in datos["dosis_por_medicamento"].get(nombre, datos["dosis_genericas"]) if d and d != "Otra dosis"]
+            reporte.append({"nombre": nombre, "dosis": azar.choice(dosis), "unidad": azar.choice(datos["unidades"])})
+        reportes.append(reporte)
+
+    inicio = time.perf_counter()
+    conteo, con_alerta = verificador.verificar_lote(reportes)
+    segundos = time.perf_counter() - inicio
+    print(f"{n} reportes en {segundos * 1000:.0f} ms ({segundos / n * 1e6:.1f} µs por reporte); {con_alerta} con alguna alerta")